@@ -4,17 +4,25 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from flask_migrate import Migrate
 from flask_mail import Mail
+from werkzeug.middleware.proxy_fix import ProxyFix
 from dotenv import load_dotenv
+from .engine import configure as configure_engine
 
 # Load environment variables from .env (local dev)
 load_dotenv()
 
+# Module globals are shared by every thread of a gunicorn worker; see
+# "Thread safety" in DEPLOYMENT.md before adding one.
 app = Flask(__name__)
 app.config.from_object('config.Config')
+if app.config['TRUSTED_PROXIES']:
+    # Take the client address from X-Forwarded-For, as set by that many proxies
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['TRUSTED_PROXIES'], x_proto=app.config['TRUSTED_PROXIES'])
+configure_engine(app.config)
 db = SQLAlchemy(app)
 login_manager = LoginManager(app)
 migrate = Migrate(app, db)
 mail = Mail(app)
 
-from . import routes, models, auth, api
+from . import routes, models, auth, api, search, images, storage, assets, cache, commands, instrumentation, ratelimit, archive, stats
 app.register_blueprint(api.api)
@@ -1,12 +1,23 @@
-from flask import Blueprint, request, jsonify
-from .models import User, Item
-from . import db
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask import Blueprint, Response, current_app, render_template, request, jsonify, stream_with_context
+from .models import ITEM_STATUSES, ITEM_TYPES, User, Item
+from . import db, feed
 from datetime import datetime
 from sqlalchemy.exc import SQLAlchemyError
+from .pagination import RECENT_FIRST, paginate, parse_limit
+from .cache import get_or_set
+from .conditional import conditional, item_list_validator
+from .matching import DEFAULT_K, MAX_K, find_matches
+from .passwords import hash_password, verify
+from .ratelimit import field, rate_limit
+from .stats import DEFAULT_DAYS, MAX_DAYS, summary
 
 api = Blueprint('api', __name__)
+
+NDJSON = 'application/x-ndjson'
+# Rows fetched per round trip when streaming; memory stays bounded by this.
+STREAM_BATCH_SIZE = 500
 @api.route('/api/verify_email', methods=['POST'])
+@rate_limit('otp_verify', key=field('email'))
 def api_verify_email():
     data = request.get_json()
     email = data.get('email')
@@ -26,6 +37,7 @@ def api_verify_email():
     return jsonify({'error': 'Invalid verification code'}), 400
 
 @api.route('/api/verify_phone', methods=['POST'])
+@rate_limit('otp_verify', key=field('phone'))
 def api_verify_phone():
     data = request.get_json()
     phone = data.get('phone')
@@ -53,26 +65,26 @@ def api_register():
     password = data.get('password')
     if User.query.filter_by(email=email).first():
         return jsonify({'error': 'Email already registered'}), 400
-    password_hash = generate_password_hash(password)
+    password_hash = hash_password(password)
     user = User(name=name, campus_id=campus_id, email=email, password_hash=password_hash)
     db.session.add(user)
     db.session.commit()
     return jsonify({'message': 'User registered successfully'})
 
 @api.route('/api/login', methods=['POST'])
+@rate_limit('login_ip')
+@rate_limit('login_account', key=field('email'))
 def api_login():
     data = request.get_json()
     email = data.get('email')
     password = data.get('password')
     user = User.query.filter_by(email=email).first()
-    if user and check_password_hash(user.password_hash, password):
+    if user and verify(user, password):
         return jsonify({'message': 'Login successful', 'user_id': user.id})
     return jsonify({'error': 'Invalid credentials'}), 401
 
-@api.route('/api/items', methods=['GET'])
-def api_get_items():
-    items = Item.query.order_by(Item.date_reported.desc()).all()
-    return jsonify([{
+def serialize_item(item):
+    return {
         'id': item.id,
         'title': item.title,
         'description': item.description,
@@ -80,7 +92,115 @@ def api_get_items():
         'date_reported': item.date_reported.strftime('%Y-%m-%d %H:%M:%S'),
         'status': item.status,
         'user_id': item.user_id
-    } for item in items])
+    }
+
+def wants_stream():
+    return request.args.get('stream') == '1' or request.accept_mimetypes.best == NDJSON
+
+def stream_items(ndjson):
+    """Yield every item, newest first, as NDJSON lines or one JSON document.
+
+    Rows are read ``STREAM_BATCH_SIZE`` at a time as plain tuples (no ORM
+    identity map), so memory does not grow with the table. The JSON form
+    keeps the paged response shape, ``{"items": [...], "next_cursor": null}``.
+    """
+    columns = (Item.id, Item.title, Item.description, Item.item_type,
+               Item.date_reported, Item.status, Item.user_id)
+    statement = db.select(*columns).order_by(Item.date_reported.desc(), Item.id.desc())
+    rows = db.session.execute(statement.execution_options(yield_per=STREAM_BATCH_SIZE))
+    dumps = current_app.json.dumps
+    if ndjson:
+        for row in rows:
+            yield dumps(serialize_item(row)) + '\n'
+        return
+    separator = ''
+    yield '{"items": ['
+    for row in rows:
+        yield separator + dumps(serialize_item(row))
+        separator = ', '
+    yield '], "next_cursor": null}\n'
+
+@api.route('/api/items', methods=['GET'])
+@conditional(item_list_validator)
+def api_get_items():
+    if wants_stream():
+        ndjson = request.accept_mimetypes.best == NDJSON
+        response = Response(stream_with_context(stream_items(ndjson)),
+                            mimetype=NDJSON if ndjson else 'application/json')
+        response.vary.add('Accept')
+        return response
+    try:
+        limit = parse_limit(request.args.get('limit'))
+        cursor = request.args.get('cursor')
+
+        def load_page():
+            page = paginate(Item.query, RECENT_FIRST, limit=limit, cursor=cursor)
+            return {
+                'items': [serialize_item(item) for item in page],
+                'next_cursor': page.next_cursor
+            }
+
+        payload = get_or_set('query', ('api-items', limit, cursor), load_page, tables=('item',))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(payload)
+
+@api.route('/api/items/feed', methods=['GET'])
+def api_item_feed():
+    """New items as Server-Sent Events (see app/feed.py).
+
+    ``type``, ``status`` and ``search`` filter as on /search; ``cards=1``
+    adds each item's rendered card as ``html``.
+    """
+    item_type = request.args.get('type', '').lower() or None
+    status = request.args.get('status', '').lower() or None
+    if item_type not in (None, *ITEM_TYPES) or status not in (None, *ITEM_STATUSES):
+        return jsonify({'error': 'Unknown type or status'}), 400
+    last_id = request.headers.get('Last-Event-ID', request.args.get('last_event_id', ''))
+    if last_id and not last_id.isdigit():
+        return jsonify({'error': 'Last-Event-ID must be an item id'}), 400
+
+    subscription = feed.broker.subscribe(feed.Filter(item_type, status, request.args.get('search')))
+    if subscription is None:
+        response = jsonify({'error': 'Too many open feeds, try again later'})
+        response.headers['Retry-After'] = str(feed.RETRY_MS // 1000)
+        return response, 503
+
+    cards = request.args.get('cards') == '1'
+
+    def encode(item):
+        payload = serialize_item(item)
+        if cards:
+            payload['html'] = render_template('_item_cards.html', items=[item])
+        return current_app.json.dumps(payload)
+
+    response = Response(
+        stream_with_context(feed.stream(subscription, int(last_id or 0), encode, 'cards' if cards else 'json')),
+        mimetype='text/event-stream',
+    )
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # nginx: pass events through unbuffered
+    return response
+
+@api.route('/api/items/<int:item_id>/matches', methods=['GET'])
+def api_item_matches(item_id):
+    item = db.session.get(Item, item_id)
+    if item is None:
+        return jsonify({'error': 'Item not found'}), 404
+    k = request.args.get('k', DEFAULT_K, type=int)
+    if not 1 <= k <= MAX_K:
+        return jsonify({'error': f'k must be between 1 and {MAX_K}'}), 400
+    return jsonify({
+        'item_id': item.id,
+        'matches': [dict(serialize_item(match.item), score=match.score) for match in find_matches(item, k)]
+    })
+
+@api.route('/api/stats', methods=['GET'])
+def api_stats():
+    days = request.args.get('days', DEFAULT_DAYS, type=int)
+    if not 1 <= days <= MAX_DAYS:
+        return jsonify({'error': f'days must be between 1 and {MAX_DAYS}'}), 400
+    return jsonify(summary(days))
 
 @api.route('/api/report', methods=['POST'])
 def api_report_item():
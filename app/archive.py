@@ -0,0 +1,148 @@
+"""Moving old items out of the hot ``item`` table.
+
+Dashboards, search and matching only ever read ``item``, so it should hold
+the items people are still looking for. The ``archive_items`` job (every
+``ARCHIVE_INTERVAL`` seconds, or ``flask items archive``) moves to
+``item_archive``:
+
+- resolved items reported more than ``ARCHIVE_RESOLVED_AFTER_DAYS`` ago;
+- any item reported more than ``ARCHIVE_STALE_AFTER_DAYS`` ago.
+
+Items move ``ARCHIVE_BATCH_SIZE`` at a time, each batch with one
+``INSERT ... SELECT`` and one ``DELETE`` in a transaction, and keep their
+id: ``/item/<id>`` falls back to the archive, so links keep working.
+
+Photos go to cold storage first: a gzipped copy of the original, named as
+in the upload store, under ``ARCHIVE_PHOTO_DIR``. Archived items are shown
+with the original only, so no variants are kept. Once no item in the hot
+table uses a photo any more, its upload and variants are removed.
+"""
+import gzip
+import os
+import shutil
+import tempfile
+from collections import Counter
+from datetime import datetime, timedelta
+
+from . import app, db, stats
+from .jobs import handler, periodic
+from .models import Blob, Item, ItemArchive
+from .storage import adjust_refs, delete_upload, is_blob_name, upload_dir
+
+# Copied from item to item_archive, in this order
+ARCHIVED_COLUMNS = ('id', 'title', 'description', 'item_type', 'contact_phone', 'photo_filename',
+                    'date_reported', 'status', 'user_id')
+
+
+def photo_dir():
+    return app.config.get('ARCHIVE_PHOTO_DIR') or os.path.join(app.instance_path, 'archive-photos')
+
+
+def cold_path(filename):
+    return os.path.join(photo_dir(), filename + '.gz')
+
+
+def freeze_photo(filename):
+    """Write a gzipped copy of an upload to cold storage; ``False`` if the upload is missing."""
+    target = cold_path(filename)
+    if os.path.exists(target):
+        return True
+    source = os.path.join(upload_dir(), filename)
+    if not os.path.exists(source):
+        return False
+    os.makedirs(photo_dir(), exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=photo_dir(), prefix='.archive-')
+    try:
+        with open(source, 'rb') as original, os.fdopen(fd, 'wb') as raw:
+            with gzip.GzipFile(filename=filename, mode='wb', fileobj=raw, compresslevel=9) as packed:
+                shutil.copyfileobj(original, packed)
+        os.replace(temp_path, target)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return True
+
+
+def due(now):
+    """Filter for the items to archive at ``now``."""
+    resolved_before = now - timedelta(days=app.config['ARCHIVE_RESOLVED_AFTER_DAYS'])
+    stale_before = now - timedelta(days=app.config['ARCHIVE_STALE_AFTER_DAYS'])
+    # SQLite hands out max(id) + 1 to new rows: keep the newest item so an
+    # archived id is never reused.
+    newest = db.select(db.func.max(Item.id)).scalar_subquery()
+    return db.and_(
+        db.or_(db.and_(Item.status == 'resolved', Item.date_reported < resolved_before),
+               Item.date_reported < stale_before),
+        Item.id < newest,
+    )
+
+
+def archive_batch(now, batch_size):
+    """Move up to ``batch_size`` due items to the archive; return how many moved."""
+    rows = db.session.execute(
+        db.select(Item.id, Item.photo_filename, Item.item_type, Item.status)
+        .where(due(now)).order_by(Item.id).limit(batch_size)
+    ).all()
+    if not rows:
+        return 0
+    ids = [row.id for row in rows]
+    photos = Counter(row.photo_filename for row in rows if row.photo_filename)
+    for filename in photos:
+        if not freeze_photo(filename):
+            app.logger.warning('Photo %s of an archived item is missing', filename)
+
+    columns = [getattr(Item, name) for name in ARCHIVED_COLUMNS]
+    db.session.execute(
+        db.insert(ItemArchive).from_select(
+            ARCHIVED_COLUMNS + ('archived_at',),
+            db.select(*columns, db.literal(now, db.DateTime)).where(Item.id.in_(ids)),
+        )
+    )
+    db.session.execute(db.delete(Item).where(Item.id.in_(ids)),
+                       execution_options={'synchronize_session': False})
+    # A bulk DELETE skips the before_flush hooks that count photo references
+    # and items.
+    adjust_refs(db.session, {filename: -count for filename, count in photos.items()})
+    stats.add(db.session, Counter(stats.archived_key(row.item_type, row.status) for row in rows))
+    db.session.commit()
+
+    # Old-style (uuid) uploads have no reference count; "flask uploads gc" gets those.
+    for filename in photos:
+        blob = db.session.get(Blob, filename.split('.', 1)[0]) if is_blob_name(filename) else None
+        if blob is not None and blob.ref_count == 0:
+            delete_upload(filename)
+    db.session.commit()
+    return len(ids)
+
+
+@handler('archive_items')
+def archive_items(now=None, batch_size=None):
+    """Archive every due item, a batch per transaction; return how many moved."""
+    now = now or datetime.now()
+    batch_size = batch_size or app.config['ARCHIVE_BATCH_SIZE']
+    total = 0
+    while True:
+        moved = archive_batch(now, batch_size)
+        total += moved
+        if moved < batch_size:
+            break
+    if total:
+        app.logger.info('Archived %s items', total)
+    return total
+
+
+periodic('archive_items', 'ARCHIVE_INTERVAL')
+
+
+def open_photo(filename):
+    """``(path, gzipped)`` of an archived item's photo, or ``None``.
+
+    Serves the hot upload while another item still uses it.
+    """
+    hot = os.path.join(upload_dir(), filename)
+    if os.path.exists(hot):
+        return hot, False
+    if os.path.exists(cold_path(filename)):
+        return cold_path(filename), True
+    return None
@@ -0,0 +1,160 @@
+"""Fingerprinted static assets with far-future caching.
+
+``flask assets build`` copies every file under ``app/static`` (except
+uploads, which are already content-addressed) to
+``app/static/dist/<path>.<hash>.<ext>``. It also writes ``.gz`` (and ``.br``
+when the ``brotli`` package is installed) next to text assets, and records
+the mapping in ``dist/manifest.json``. Stylesheets are minified on the way (see
+:mod:`app.cssmin`), and page sheets under ``css/pages/`` lose the rules
+they repeat from the shared ``css/base.css``.
+
+At runtime ``url_for('static', filename='css/global.css')`` resolves to
+the fingerprinted path when a manifest exists. Paths whose name changes
+with their content are served with ``Cache-Control: immutable`` and a
+one-year max-age, picking the precompressed copy the client accepts.
+Without a build, everything behaves as plain Flask static serving.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import shutil
+
+from flask import request, send_from_directory
+
+from . import app
+from .cssmin import minify
+from .storage import is_blob_name
+
+try:
+    import brotli
+except ImportError:  # optional; gzip alone is fine
+    brotli = None
+
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+SKIP_DIRS = {DIST_DIR, 'uploads'}
+COMPRESSIBLE = {'.css', '.js', '.svg', '.json', '.txt', '.html', '.map'}
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+# Linked from base.html ahead of every page stylesheet.
+SHARED_CSS = 'css/base.css'
+PAGE_CSS_DIR = 'css/pages/'
+
+FINGERPRINT_RE = re.compile(r'^dist/.+\.[0-9a-f]{12}\.[A-Za-z0-9]+$')
+VARIANT_RE = re.compile(r'^uploads/variants/[0-9a-f]{64}-[a-z]+\.[a-z]+$')
+
+# Encodings in order of preference, with the suffix of the precompressed file.
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+_manifest = {}
+
+
+def static_dir():
+    return app.static_folder
+
+
+def _precompress(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    with gzip.open(path + '.gz', 'wb', compresslevel=9) as f:
+        f.write(data)
+    if brotli is not None:
+        with open(path + '.br', 'wb') as f:
+            f.write(brotli.compress(data, quality=11))
+
+
+def _read_asset(root, logical):
+    with open(os.path.join(root, logical), 'rb') as f:
+        data = f.read()
+    if not logical.endswith('.css'):
+        return data
+    shared = None
+    if logical.startswith(PAGE_CSS_DIR) and os.path.isfile(os.path.join(root, SHARED_CSS)):
+        with open(os.path.join(root, SHARED_CSS), encoding='utf-8') as f:
+            shared = f.read()
+    return minify(data.decode('utf-8'), shared).encode('utf-8')
+
+
+def build(root=None):
+    """Fingerprint and precompress every static asset; return the manifest."""
+    root = root or static_dir()
+    dist = os.path.join(root, DIST_DIR)
+    if os.path.isdir(dist):
+        shutil.rmtree(dist)
+
+    manifest = {}
+    for directory, subdirs, files in os.walk(root):
+        relative_dir = os.path.relpath(directory, root)
+        if relative_dir == '.':
+            subdirs[:] = [d for d in subdirs if d not in SKIP_DIRS]
+        for name in files:
+            logical = os.path.normpath(os.path.join(relative_dir, name)).replace(os.sep, '/')
+            data = _read_asset(root, logical)
+            stem, ext = os.path.splitext(logical)
+            fingerprinted = f'{DIST_DIR}/{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}'
+            target = os.path.join(root, fingerprinted)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, 'wb') as f:
+                f.write(data)
+            if ext.lower() in COMPRESSIBLE:
+                _precompress(target)
+            manifest[logical] = fingerprinted
+
+    with open(os.path.join(dist, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def load_manifest():
+    """(Re)load the manifest written by :func:`build`, if any."""
+    global _manifest
+    path = os.path.join(static_dir(), DIST_DIR, MANIFEST_NAME)
+    try:
+        with open(path) as f:
+            _manifest = json.load(f)
+    except FileNotFoundError:
+        _manifest = {}
+    return _manifest
+
+
+def is_immutable(filename):
+    """Whether ``filename`` (relative to static/) changes name when it changes content."""
+    if FINGERPRINT_RE.match(filename) or VARIANT_RE.match(filename):
+        return True
+    return filename.startswith('uploads/') and is_blob_name(filename[len('uploads/'):])
+
+
+@app.url_defaults
+def _fingerprint_static_urls(endpoint, values):
+    if endpoint == 'static' and _manifest and 'filename' in values:
+        values['filename'] = _manifest.get(values['filename'], values['filename'])
+
+
+def serve_static(filename):
+    """Flask's static view, plus precompressed files and immutable caching."""
+    if not is_immutable(filename):
+        return app.send_static_file(filename)
+
+    accepted = request.accept_encodings
+    for encoding, suffix in ENCODINGS:
+        if accepted[encoding] and os.path.isfile(os.path.join(static_dir(), filename + suffix)):
+            mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+            response = send_from_directory(static_dir(), filename + suffix,
+                                           mimetype=mimetype, max_age=IMMUTABLE_MAX_AGE)
+            response.headers['Content-Encoding'] = encoding
+            break
+    else:
+        response = send_from_directory(static_dir(), filename, max_age=IMMUTABLE_MAX_AGE)
+
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+if app.config.get('STATIC_FINGERPRINTS', True):
+    load_manifest()
+app.view_functions['static'] = serve_static
@@ -1,30 +1,80 @@
-from flask_login import LoginManager
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask_login import LoginManager, UserMixin
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import object_session
 from .models import User
-from . import login_manager, db, mail, app
-from flask_mail import Message
+from . import login_manager, db, app
+from .cache import get_or_set, profile_key
+from .jobs import enqueue
+from . import notifications  # registers the email and sms job handlers
+from .passwords import hash_password, verify
 import random
 import os
-try:
-	from twilio.rest import Client  # optional; we won't use if verification disabled
-except Exception:
-	Client = None
 
-# User loader for Flask-Login
+# Changes to these bump User.version and drop the user's cached principal
+PRINCIPAL_FIELDS = ('name', 'campus_id', 'email', 'phone', 'department', 'password_hash')
+# Shown with the user's items; changes drop cached item markup (see app/cache.py)
+PROFILE_FIELDS = ('name', 'email', 'department')
+
+class Principal(UserMixin):
+	"""The signed-in user as views and templates see it: no hashes or codes."""
+
+	def __init__(self, id, name, campus_id, phone, department, version):
+		self.id = id
+		self.name = name
+		self.campus_id = campus_id
+		self.phone = phone
+		self.department = department
+		self.version = version
+
+def principal_key(user_id):
+	# A per-user pseudo-table for app/cache.py's version counters
+	return f'user:{user_id}'
+
+def _load_principal(user_id):
+	row = (db.session.query(User.id, User.name, User.campus_id, User.phone, User.department, User.version)
+		.filter(User.id == user_id).first())
+	return tuple(row) if row else None
+
+# User loader for Flask-Login: served from the cache, so a steady stream of
+# page views costs no user queries
 @login_manager.user_loader
 def load_user(user_id):
-	return User.query.get(int(user_id))
+	try:
+		user_id = int(user_id)
+	except ValueError:
+		return None
+	row = get_or_set('principal', (user_id,), lambda: _load_principal(user_id),
+		tables=(principal_key(user_id),))
+	return Principal(*row) if row else None
+
+@event.listens_for(User, 'before_update')
+def _bump_user_version(mapper, connection, user):
+	state = inspect(user)
+	changed = object_session(user).info.setdefault('changed_tables', set())
+	if any(state.attrs[field].history.has_changes() for field in PRINCIPAL_FIELDS):
+		user.version = (user.version or 0) + 1
+		# Bumped after commit, with the tables app/cache.py tracks
+		changed.add(principal_key(user.id))
+	if any(state.attrs[field].history.has_changes() for field in PROFILE_FIELDS):
+		changed.update((profile_key(user.id), 'profiles'))
 
 def generate_verification_code():
 	return str(random.randint(100000, 999999))
 
 def send_email_verification(email, code):
-	# Email verification disabled: no-op (log in dev)
-	print(f"[DEV MODE] Email verification code for {email}: {code}")
+	# Queued with the caller's transaction; delivered by "flask jobs work"
+	enqueue('email', {
+		'to': email,
+		'subject': 'Your Campus Lost & Found verification code',
+		'body': f'Your verification code is {code}.',
+	}, key=f'email-code:{email}:{code}')
 
 def send_sms_verification(phone, code):
-	# Twilio disabled: just print the code for dev/local use
-	print(f"[DEV MODE] SMS verification code for {phone}: {code}")
+	# Queued with the caller's transaction; delivered by "flask jobs work"
+	enqueue('sms', {
+		'to': phone,
+		'body': f'Your Campus Lost & Found verification code is {code}.',
+	}, key=f'sms-code:{phone}:{code}')
 
 def register_user(name, campus_id, email, password, department, phone):
 	from sqlalchemy.exc import IntegrityError
@@ -46,7 +96,7 @@ def register_user(name, campus_id, email, password, department, phone):
 	if existing_user_phone:
 		raise ValueError("Phone number is already registered")
 	
-	password_hash = generate_password_hash(password)
+	password_hash = hash_password(password)
 	# Disable verification for now: no codes needed
 	email_code = None
 	phone_code = None
@@ -83,7 +133,7 @@ def register_user(name, campus_id, email, password, department, phone):
 
 def verify_user(campus_id, password):
 	user = User.query.filter_by(campus_id=campus_id).first()
-	if user and check_password_hash(user.password_hash, password):
+	if user and verify(user, password):
 		return user
 	return None
 
@@ -113,8 +163,8 @@ def generate_phone_reset_code(phone: str) -> bool:
 	# Twilio disabled: always use local code path
 	code = generate_verification_code()
 	user.phone_verification_code = code
-	db.session.commit()
 	send_sms_verification(phone, code)
+	db.session.commit()
 	return True
 
 
@@ -131,7 +181,7 @@ def verify_phone_code(phone: str, code: str) -> User | None:
 
 
 def update_user_password(user: User, new_password: str) -> None:
-	user.password_hash = generate_password_hash(new_password)
+	user.password_hash = hash_password(new_password)
 	# clear the phone code once used
 	user.phone_verification_code = None
 	db.session.commit()
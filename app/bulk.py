@@ -0,0 +1,398 @@
+"""Bulk export and import of users and items, for ``flask items export/import``.
+
+Files are CSV or NDJSON, one user or item per record, and are streamed:
+neither side holds more than one batch in memory. Items refer to their
+reporter by ``user_campus_id``, so moving data between databases means
+importing the users file first, then the items file.
+
+Export reads rows as plain tuples ``EXPORT_BATCH_SIZE`` at a time. Import
+inserts ``batch_size`` records per transaction:
+
+- items with ``COPY ... FROM STDIN`` on Postgres, and one ``executemany``
+  ``INSERT`` per batch elsewhere. Neither goes through the ORM unit of
+  work, so the batch also updates the photo reference counts itself;
+- users with ``INSERT ... ON CONFLICT DO NOTHING``, so users that already
+  exist (same campus ID, email or phone) are skipped.
+
+Each batch commits together with an :class:`~app.models.ImportCheckpoint`
+row recording how many records of the file are done. An interrupted import
+run again with the same checkpoint name continues after the last committed
+batch, without duplicating or skipping records.
+
+Photos are copied with a thread pool: export copies each referenced upload
+and its variants into a directory; import adds them to the content-addressed
+store from there. Imported items are not matched or notified about.
+"""
+import csv
+import io
+import json
+import os
+import shutil
+import sys
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime
+
+from . import db, stats
+from .images import submit_item_photo
+from .models import ITEM_STATUSES, ITEM_TYPES, ImportCheckpoint, Item, User
+from .storage import adjust_refs, is_blob_name, store_file, upload_dir, variant_files
+
+EXPORT_BATCH_SIZE = 1000
+
+FORMATS = ('csv', 'ndjson')
+
+USER_FIELDS = ('campus_id', 'name', 'email', 'phone', 'department', 'password_hash',
+               'email_verified', 'phone_verified')
+ITEM_FIELDS = ('user_campus_id', 'title', 'description', 'item_type', 'contact_phone',
+               'date_reported', 'status', 'photo_filename', 'photo_variants')
+
+
+class RecordError(ValueError):
+    """A record that cannot be imported; nothing of its batch was saved."""
+
+
+def guess_format(path):
+    """``'csv'`` or ``'ndjson'`` from a file name, or ``None``."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.csv':
+        return 'csv'
+    if ext in ('.ndjson', '.jsonl'):
+        return 'ndjson'
+    return None
+
+
+def _insert(model):
+    if db.session.get_bind().dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(model)
+
+
+# -- export -----------------------------------------------------------------
+
+def _user_rows():
+    statement = db.select(*(getattr(User, name) for name in USER_FIELDS)).order_by(User.id)
+    for row in db.session.execute(statement.execution_options(yield_per=EXPORT_BATCH_SIZE)):
+        yield row._asdict()
+
+
+def _item_rows():
+    columns = [User.campus_id.label('user_campus_id')]
+    columns += [getattr(Item, name) for name in ITEM_FIELDS[1:]]
+    statement = db.select(*columns).join(Item.user).order_by(Item.id)
+    for row in db.session.execute(statement.execution_options(yield_per=EXPORT_BATCH_SIZE)):
+        record = row._asdict()
+        record['date_reported'] = record['date_reported'].isoformat(sep=' ')
+        yield record
+
+
+def _write_csv(out, fields, records):
+    writer = csv.DictWriter(out, fields)
+    writer.writeheader()
+    for record in records:
+        if record.get('photo_variants') is not None:
+            record['photo_variants'] = json.dumps(record['photo_variants'])
+        writer.writerow(record)
+
+
+def _write_ndjson(out, records):
+    for record in records:
+        out.write(json.dumps(record) + '\n')
+
+
+def _copy_photo(filename, photos_dir):
+    """Copy one upload and its variants into ``photos_dir``; ``False`` if it is missing."""
+    source = os.path.join(upload_dir(), filename)
+    if not os.path.exists(source):
+        return False
+    os.makedirs(os.path.join(photos_dir, 'variants'), exist_ok=True)
+    for path in [source] + variant_files(filename):
+        relative = os.path.relpath(path, upload_dir())
+        target = os.path.join(photos_dir, relative)
+        if not os.path.exists(target):
+            shutil.copyfile(path, target)
+    return True
+
+
+def export(out, table, fmt, photos_dir=None, workers=8):
+    """Write every row of ``table`` (``'users'`` or ``'items'``) to ``out``.
+
+    With ``photos_dir``, item photos are copied there by ``workers`` threads
+    while the rows are written. Returns ``(records, photos_missing)``.
+    """
+    fields, rows = (USER_FIELDS, _user_rows()) if table == 'users' else (ITEM_FIELDS, _item_rows())
+    count = 0
+    copies = []
+    seen = set()
+
+    def records():
+        nonlocal count
+        for record in rows:
+            count += 1
+            filename = record.get('photo_filename')
+            if pool is not None and filename and filename not in seen:
+                seen.add(filename)
+                copies.append(pool.submit(_copy_photo, filename, photos_dir))
+            yield record
+
+    pool = ThreadPoolExecutor(workers) if photos_dir and table == 'items' else None
+    try:
+        if fmt == 'csv':
+            _write_csv(out, fields, records())
+        else:
+            _write_ndjson(out, records())
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    missing = sum(1 for copy in copies if not copy.result())
+    return count, missing
+
+
+# -- import -----------------------------------------------------------------
+
+def read_records(stream, fmt):
+    """Yield the records of a CSV or NDJSON stream as dicts."""
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def _text(record, name, number, required=True):
+    value = record.get(name)
+    if value is None or value == '':
+        if required:
+            raise RecordError(f'Record {number}: {name} is missing')
+        return None
+    return str(value)
+
+
+def _flag(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes')
+    return bool(value)
+
+
+def _user_row(record, number):
+    row = {name: _text(record, name, number) for name in USER_FIELDS[:6]}
+    row['email_verified'] = _flag(record.get('email_verified'))
+    row['phone_verified'] = _flag(record.get('phone_verified'))
+    return row
+
+
+def _item_row(record, number):
+    row = {name: _text(record, name, number) for name in ('title', 'description', 'contact_phone')}
+    row['item_type'] = _text(record, 'item_type', number)
+    if row['item_type'] not in ITEM_TYPES:
+        raise RecordError(f'Record {number}: item_type must be one of {", ".join(ITEM_TYPES)}')
+    row['status'] = _text(record, 'status', number, required=False) or 'active'
+    if row['status'] not in ITEM_STATUSES:
+        raise RecordError(f'Record {number}: status must be one of {", ".join(ITEM_STATUSES)}')
+    date_reported = _text(record, 'date_reported', number)
+    try:
+        row['date_reported'] = datetime.fromisoformat(date_reported)
+    except ValueError:
+        raise RecordError(f'Record {number}: date_reported is not an ISO date') from None
+    row['photo_filename'] = _text(record, 'photo_filename', number, required=False)
+    variants = record.get('photo_variants') or None
+    row['photo_variants'] = json.loads(variants) if isinstance(variants, str) else variants
+    row['user_campus_id'] = _text(record, 'user_campus_id', number)
+    return row
+
+
+def _store_photo(filename, variants, photos_dir):
+    """Add one photo from ``photos_dir`` to the store.
+
+    Returns the stored name (``None`` if the photo is missing) and the
+    variants, ``None`` if they did not come along and must be rebuilt.
+    Old-style (uuid) names are stored under their content hash, and their
+    variants rebuilt.
+    """
+    if is_blob_name(filename) and os.path.exists(os.path.join(upload_dir(), filename)):
+        stored = filename  # content-addressed: same name, same bytes
+    else:
+        # From the export, or an old-style upload already in this upload directory
+        sources = [os.path.join(directory, filename) for directory in (photos_dir, upload_dir())
+                   if directory]
+        source = next((path for path in sources if os.path.exists(path)), None)
+        if source is None:
+            return None, None
+        stored = store_file(source)
+    if not variants or stored != filename:
+        return stored, None
+    for variant in variants.values():
+        for relative in filter(None, (variant.get('webp'), variant.get('jpeg'))):
+            target = os.path.join(upload_dir(), relative)
+            if os.path.exists(target):
+                continue
+            source = os.path.join(photos_dir, relative) if photos_dir else None
+            if source is None or not os.path.exists(source):
+                return stored, None
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copyfile(source, target)
+    return stored, variants
+
+
+def _copy_field(value):
+    # COPY's CSV format reads an unquoted empty field as NULL and a quoted
+    # one as the empty string.
+    if value is None:
+        return ''
+    if isinstance(value, dict):
+        value = json.dumps(value)
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def _copy_items(rows):
+    columns = list(rows[0])
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write(','.join(_copy_field(row[column]) for column in columns) + '\n')
+    buffer.seek(0)
+    cursor = db.session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(f'COPY item ({", ".join(columns)}) FROM STDIN WITH (FORMAT csv)', buffer)
+    finally:
+        cursor.close()
+
+
+class Importer:
+    """Imports one file into ``users`` or ``items`` in checkpointed batches."""
+
+    def __init__(self, table, checkpoint, photos_dir=None, batch_size=1000, workers=8):
+        self.table = table
+        self.checkpoint = checkpoint
+        self.photos_dir = photos_dir
+        self.batch_size = batch_size
+        self.workers = workers
+        self.skipped = Counter()
+        self.variants_pending = False
+
+    def position(self):
+        """Records of the file imported by earlier runs."""
+        checkpoint = db.session.get(ImportCheckpoint, self.checkpoint)
+        return checkpoint.position if checkpoint else 0
+
+    def reset(self):
+        db.session.execute(db.delete(ImportCheckpoint).where(ImportCheckpoint.name == self.checkpoint))
+        db.session.commit()
+
+    def run(self, records):
+        """Import ``records`` after the checkpoint; return how many were read."""
+        start = position = self.position()
+        batch = []
+        pool = ThreadPoolExecutor(self.workers) if self.table == 'items' else None
+        try:
+            for number, record in enumerate(records, 1):
+                if number <= start:
+                    continue
+                batch.append((number, record))
+                if len(batch) >= self.batch_size:
+                    position = self._save(batch, pool)
+                    batch = []
+            if batch:
+                position = self._save(batch, pool)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        if self.variants_pending:
+            self._queue_photo_variants()
+        return position - start
+
+    def _save(self, batch, pool):
+        try:
+            if self.table == 'users':
+                self._insert_users([_user_row(record, number) for number, record in batch])
+            else:
+                self._insert_items([_item_row(record, number) for number, record in batch], pool)
+            position = batch[-1][0]
+            now = datetime.now()
+            db.session.execute(
+                _insert(ImportCheckpoint)
+                .values(name=self.checkpoint, position=position, updated_at=now)
+                .on_conflict_do_update(index_elements=['name'],
+                                       set_={'position': position, 'updated_at': now})
+            )
+            db.session.commit()
+        except BaseException:
+            db.session.rollback()
+            raise
+        return position
+
+    def _insert_users(self, rows):
+        db.session.execute(_insert(User).on_conflict_do_nothing(), rows)
+
+    def _insert_items(self, rows, pool):
+        campus_ids = {row['user_campus_id'] for row in rows}
+        users = {campus_id: (user_id, department) for campus_id, user_id, department in db.session.execute(
+            db.select(User.campus_id, User.id, User.department).where(User.campus_id.in_(campus_ids))
+        )}
+
+        # Items with the same photo share its variants; copy each photo once.
+        photos = {}
+        for row in rows:
+            if row['photo_filename']:
+                photos.setdefault(row['photo_filename'], row['photo_variants'])
+        stored = dict(zip(photos, pool.map(
+            lambda filename: _store_photo(filename, photos[filename], self.photos_dir), photos
+        )))
+
+        items = []
+        counts = Counter()
+        now = datetime.now()  # COPY skips the column's Python default
+        for row in rows:
+            user_id, department = users.get(row.pop('user_campus_id'), (None, None))
+            if user_id is None:
+                self.skipped['unknown user'] += 1
+                continue
+            if row['photo_filename']:
+                row['photo_filename'], row['photo_variants'] = stored[row['photo_filename']]
+                if row['photo_filename'] is None:
+                    self.skipped['photo missing'] += 1
+                elif row['photo_variants'] is None:
+                    self.variants_pending = True
+            else:
+                row['photo_variants'] = None
+            row['user_id'] = user_id
+            row['updated_at'] = now
+            items.append(row)
+            counts.update(stats.counter_keys(row['item_type'], row['status'], department, row['date_reported']))
+        if not items:
+            return
+
+        if db.session.get_bind().dialect.name == 'postgresql':
+            _copy_items(items)
+            # COPY bypasses the session; let the page cache know.
+            db.session.info.setdefault('changed_tables', set()).add('item')
+        else:
+            # The table, not the mapped class: skips the ORM's per-row bulk bookkeeping.
+            db.session.execute(db.insert(Item.__table__), items)
+        adjust_refs(db.session, Counter(row['photo_filename'] for row in items if row['photo_filename']))
+        # Neither insert runs the before_flush hook that keeps the counters.
+        stats.add(db.session, counts)
+
+    def _queue_photo_variants(self):
+        """Queue variant jobs for imported photos whose variants did not come along."""
+        pending = db.session.scalars(
+            db.select(Item.id).where(Item.photo_filename.isnot(None), Item.photo_variants.is_(None))
+        ).all()
+        for item_id in pending:
+            submit_item_photo(item_id)
+        db.session.commit()
+
+
+def open_input(path, fmt):
+    if path == '-':
+        return nullcontext(sys.stdin)
+    return open(path, newline='' if fmt == 'csv' else None, encoding='utf-8')
+
+
+def open_output(path, fmt):
+    if path == '-':
+        return nullcontext(sys.stdout)
+    return open(path, 'w', newline='' if fmt == 'csv' else None, encoding='utf-8')
@@ -0,0 +1,244 @@
+"""Page, fragment and query-result caching with version-counter invalidation.
+
+Nothing is ever deleted on write. Instead every cache key embeds the
+current version of the tables it depends on (e.g. ``item``), and a
+commit that touches a table bumps its version, so later lookups miss and
+old entries age out of the LRU or expire.
+
+Users change far more often than what pages show of them (a login can
+rehash the password), so nothing depends on the ``user`` table. Cached
+item markup depends instead on ``profile:<id>`` of its reporter, and lists
+of many reporters on ``profiles``; app/auth.py bumps both only when a
+shown field changes.
+
+Backends (``CACHE_BACKEND``):
+
+- ``lru``: in-process, bounded LRU (default). Each gunicorn worker has its
+  own cache and version counters, so a write in one worker reaches the
+  others only when their entries expire (``CACHE_DEFAULT_TTL``).
+- ``redis``: any Redis-compatible server at ``CACHE_REDIS_URL``; shared
+  by all workers, so invalidation is immediate. Needs the ``redis`` package.
+- ``none``: caching disabled.
+"""
+import hashlib
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import make_response, request, session
+from flask_login import current_user
+from markupsafe import Markup
+from sqlalchemy import event
+
+from . import app, db
+from .metrics import Counter
+
+CACHE_REQUESTS = Counter(
+    'cache_requests_total', 'Cache lookups by cache and result.', ['cache', 'result']
+)
+
+
+class LRUBackend:
+    """Thread-safe in-process LRU with per-entry expiry."""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires is not None and expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def version(self, name):
+        # Kept apart from the entries so that eviction never resets a counter.
+        return self._versions.get(name, 0)
+
+    def bump(self, name):
+        with self._lock:
+            self._versions[name] = self._versions.get(name, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisBackend:
+    """Shared cache on a Redis-compatible server."""
+
+    def __init__(self, url, prefix='lostfound:'):
+        import redis  # optional dependency, only needed for this backend
+        self._client = redis.Redis.from_url(url)
+        self._prefix = prefix
+
+    def get(self, key):
+        raw = self._client.get(self._prefix + key)
+        return pickle.loads(raw) if raw is not None else None
+
+    def set(self, key, value, ttl=None):
+        self._client.set(self._prefix + key, pickle.dumps(value), ex=ttl or None)
+
+    def version(self, name):
+        return int(self._client.get(f'{self._prefix}version:{name}') or 0)
+
+    def bump(self, name):
+        self._client.incr(f'{self._prefix}version:{name}')
+
+    def clear(self):
+        for key in self._client.scan_iter(self._prefix + '*'):
+            if not key.decode().startswith(f'{self._prefix}version:'):
+                self._client.delete(key)
+
+
+class NullBackend:
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl=None):
+        pass
+
+    def version(self, name):
+        return 0
+
+    def bump(self, name):
+        pass
+
+    def clear(self):
+        pass
+
+
+def create_backend(config):
+    name = config.get('CACHE_BACKEND', 'lru')
+    if name == 'redis':
+        return RedisBackend(config['CACHE_REDIS_URL'])
+    if name == 'none':
+        return NullBackend()
+    return LRUBackend(config.get('CACHE_MAX_ENTRIES', 1024))
+
+
+backend = create_backend(app.config)
+
+
+def versions(*tables):
+    return tuple(backend.version(table) for table in tables)
+
+
+def bump(*tables):
+    for table in tables:
+        backend.bump(table)
+
+
+def profile_key(user_id):
+    """Pseudo-table for what pages show of one user."""
+    return f'profile:{user_id}'
+
+
+def make_key(*parts):
+    raw = '\x1f'.join(str(part) for part in parts)
+    # Keys can carry user input (search terms, cursors); hash them to a fixed size.
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def get_or_set(cache, key_parts, compute, tables=(), ttl=None):
+    """Return the cached value for ``key_parts``, computing and storing it on a miss.
+
+    ``cache`` names the metric label; ``tables`` lists the tables the value
+    depends on.
+    """
+    key = make_key(cache, *key_parts, *versions(*tables))
+    value = backend.get(key)
+    if value is not None:
+        CACHE_REQUESTS.inc(cache=cache, result='hit')
+        return value
+    CACHE_REQUESTS.inc(cache=cache, result='miss')
+    value = compute()
+    backend.set(key, value, ttl or app.config.get('CACHE_DEFAULT_TTL'))
+    return value
+
+
+def cache_page(*tables, ttl=None):
+    """Cache a view's full response for anonymous GET requests.
+
+    Signed-in users, and visitors with pending flash messages, always get a
+    freshly rendered page.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if (request.method != 'GET' or '_flashes' in session
+                    or current_user.is_authenticated):
+                return view(*args, **kwargs)
+
+            key = make_key('page', request.full_path, *versions(*tables))
+            cached = backend.get(key)
+            if cached is not None:
+                CACHE_REQUESTS.inc(cache='page', result='hit')
+                body, content_type = cached
+                return app.response_class(body, content_type=content_type)
+
+            CACHE_REQUESTS.inc(cache='page', result='miss')
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200 and not response.direct_passthrough:
+                backend.set(key, (response.get_data(), response.content_type),
+                            ttl or app.config.get('CACHE_DEFAULT_TTL'))
+            return response
+        return wrapper
+    return decorator
+
+
+@app.template_global()
+def cached_fragment(*key, caller, user_id=None):
+    """Cache the body of a ``{% call cached_fragment(...) %}`` block.
+
+    The key is extended with the ``item`` table version and, for a fragment
+    showing its reporter, with that of ``profile_key(user_id)``.
+    """
+    tables = ('item', profile_key(user_id)) if user_id is not None else ('item',)
+    return Markup(get_or_set('fragment', key, lambda: str(caller()), tables=tables))
+
+
+@event.listens_for(db.session, 'before_flush')
+def _collect_changed_tables(session, flush_context, instances):
+    changed = session.info.setdefault('changed_tables', set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(obj, '__tablename__', None)
+        if table:
+            changed.add(table)
+
+
+@event.listens_for(db.session, 'do_orm_execute')
+def _collect_bulk_writes(orm_execute_state):
+    # insert(Item)/update(Item) statements skip the unit of work and before_flush.
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, 'table', None)
+        if table is not None:
+            orm_execute_state.session.info.setdefault('changed_tables', set()).add(table.name)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _bump_changed_tables(session):
+    bump(*session.info.pop('changed_tables', ()))
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _forget_changed_tables(session):
+    session.info.pop('changed_tables', None)
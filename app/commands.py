@@ -0,0 +1,220 @@
+"""Maintenance commands, run with ``flask --app run <group> <command>``."""
+import os
+import signal
+import threading
+import time
+from datetime import datetime
+
+import click
+from flask.cli import AppGroup
+
+from . import app, archive, assets, bulk, db, jobs, stats
+from .images import process_item_photo
+from .models import Item, Job, User
+from .storage import (
+    delete_upload,
+    is_blob_name,
+    orphaned_files,
+    store_file,
+    upload_dir,
+    variant_files,
+)
+
+uploads_cli = AppGroup('uploads', help='Manage uploaded item photos.')
+assets_cli = AppGroup('assets', help='Build fingerprinted static assets.')
+jobs_cli = AppGroup('jobs', help='Run and inspect background jobs.')
+items_cli = AppGroup('items', help='Export and import users and items in bulk.')
+
+
+@uploads_cli.command('migrate')
+def migrate_uploads():
+    """Move uuid-named uploads into the content-addressed store."""
+    legacy = [item for item in Item.query.filter(Item.photo_filename.isnot(None))
+              if not is_blob_name(item.photo_filename)]
+    old_names = set()
+    missing = 0
+    for item in legacy:
+        path = os.path.join(upload_dir(), item.photo_filename)
+        if not os.path.exists(path):
+            click.echo(f'Item {item.id}: {item.photo_filename} is missing, skipped')
+            missing += 1
+            continue
+        old_names.add(item.photo_filename)
+        item.photo_filename = store_file(path)
+        item.photo_variants = None
+    db.session.commit()
+
+    # Only drop the old files once the items point at the new ones.
+    for filename in old_names:
+        for path in [os.path.join(upload_dir(), filename)] + variant_files(filename):
+            os.remove(path)
+
+    migrated = [item for item in legacy if is_blob_name(item.photo_filename)]
+    for item in migrated:
+        process_item_photo(item.id)
+    stored = len({item.photo_filename for item in migrated})
+    click.echo(f'Migrated {len(migrated)} uploads into {stored} files; {missing} missing.')
+
+
+@uploads_cli.command('gc')
+@click.option('--min-age', default=3600, show_default=True,
+              help='Seconds an unreferenced file must be untouched before it is removed.')
+@click.option('--dry-run', is_flag=True, help='Only list what would be removed.')
+def collect_uploads(min_age, dry_run):
+    """Remove uploads that no item refers to (e.g. from failed reports)."""
+    orphans = orphaned_files(min_age)
+    for filename in orphans:
+        click.echo(f'{"Would remove" if dry_run else "Removing"} {filename}')
+        if not dry_run:
+            delete_upload(filename)
+    if not dry_run:
+        db.session.commit()
+    click.echo(f'{len(orphans)} orphaned uploads.')
+
+
+@assets_cli.command('build')
+def build_assets():
+    """Fingerprint and precompress app/static into app/static/dist."""
+    manifest = assets.build()
+    compression = 'gzip + brotli' if assets.brotli else 'gzip'
+    click.echo(f'Fingerprinted {len(manifest)} assets ({compression}).')
+
+
+@jobs_cli.command('work')
+@click.option('--once', is_flag=True, help='Exit when no job is due instead of polling.')
+def work_jobs(once):
+    """Run queued jobs; start one process per worker wanted."""
+    stop = threading.Event()
+    # Finish the current job, then exit, on Ctrl-C or a platform shutdown.
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stop.set())
+    worker_id = jobs.default_worker_id()
+    jobs.schedule_periodic()
+    click.echo(f'Worker {worker_id} started.')
+    processed = jobs.work(worker_id, once=once, stop=stop)
+    click.echo(f'Worker {worker_id} ran {processed} jobs.')
+
+
+@jobs_cli.command('status')
+def job_status():
+    """Count jobs by kind and status."""
+    rows = (
+        db.session.query(Job.kind, Job.status, db.func.count(Job.id))
+        .group_by(Job.kind, Job.status)
+        .order_by(Job.kind, Job.status)
+    )
+    for kind, status, count in rows:
+        click.echo(f'{kind:<20} {status:<8} {count}')
+
+
+@jobs_cli.command('retry')
+@click.option('--kind', help='Only retry jobs of this kind.')
+def retry_jobs(kind):
+    """Queue failed jobs again with a fresh set of attempts."""
+    query = db.update(Job).where(Job.status == 'failed')
+    if kind:
+        query = query.where(Job.kind == kind)
+    result = db.session.execute(query.values(status='queued', attempts=0, finished_at=None,
+                                             run_at=datetime.now()))
+    db.session.commit()
+    click.echo(f'Requeued {result.rowcount} jobs.')
+
+
+def _format(path, fmt):
+    fmt = fmt or bulk.guess_format(path)
+    if fmt is None:
+        raise click.UsageError(f'Cannot tell the format of {path!r}; pass --format.')
+    return fmt
+
+
+@items_cli.command('export')
+@click.argument('path')
+@click.option('--table', type=click.Choice(['items', 'users']), default='items', show_default=True)
+@click.option('--format', 'fmt', type=click.Choice(bulk.FORMATS),
+              help='Default: from the file extension (.csv, .ndjson/.jsonl).')
+@click.option('--photos', 'photos_dir', type=click.Path(file_okay=False),
+              help='Also copy item photos and their variants into this directory.')
+@click.option('--workers', default=8, show_default=True, help='Threads copying photos.')
+def export_items(path, table, fmt, photos_dir, workers):
+    """Write all items (or users) to PATH ('-' for stdout).
+
+    User records include password hashes: keep the file private.
+    """
+    fmt = _format(path, fmt)
+    started = time.perf_counter()
+    with bulk.open_output(path, fmt) as out:
+        count, missing = bulk.export(out, table, fmt, photos_dir, workers)
+    elapsed = time.perf_counter() - started
+    click.echo(f'Exported {count} {table} in {elapsed:.1f}s'
+               + (f'; {missing} photos missing.' if missing else '.'), err=True)
+
+
+@items_cli.command('import')
+@click.argument('path')
+@click.option('--table', type=click.Choice(['items', 'users']), default='items', show_default=True)
+@click.option('--format', 'fmt', type=click.Choice(bulk.FORMATS),
+              help='Default: from the file extension (.csv, .ndjson/.jsonl).')
+@click.option('--photos', 'photos_dir', type=click.Path(exists=True, file_okay=False),
+              help='Directory written by "items export --photos".')
+@click.option('--batch-size', default=1000, show_default=True, help='Records per transaction.')
+@click.option('--workers', default=8, show_default=True, help='Threads copying photos.')
+@click.option('--checkpoint', help='Name to resume under. Default: "<table>:<file name>".')
+@click.option('--restart', is_flag=True, help='Ignore the checkpoint and import from the start.')
+def import_items(path, table, fmt, photos_dir, batch_size, workers, checkpoint, restart):
+    """Import items (or users) from PATH ('-' for stdin).
+
+    Import users before the items that refer to them. An interrupted
+    import continues where it stopped when run again.
+    """
+    fmt = _format(path, fmt)
+    checkpoint = checkpoint or f'{table}:{os.path.basename(path)}'
+    importer = bulk.Importer(table, checkpoint, photos_dir, batch_size, workers)
+    if restart:
+        importer.reset()
+    elif importer.position():
+        click.echo(f'Resuming {checkpoint} after record {importer.position()}.', err=True)
+    model = User if table == 'users' else Item
+    before = model.query.count()
+    started = time.perf_counter()
+    with bulk.open_input(path, fmt) as stream:
+        try:
+            read = importer.run(bulk.read_records(stream, fmt))
+        except bulk.RecordError as e:
+            raise click.ClickException(f'{e}. Earlier batches are saved; fix it and run again.')
+    elapsed = time.perf_counter() - started
+    added = model.query.count() - before
+    skipped = ', '.join(f'{count} ({reason})' for reason, count in importer.skipped.items())
+    click.echo(f'Read {read} records in {elapsed:.1f}s; imported {added} {table}'
+               + (f', skipped {skipped}.' if skipped else '.'), err=True)
+
+
+@items_cli.command('archive')
+@click.option('--dry-run', is_flag=True, help='Only count the items that would move.')
+def archive_items(dry_run):
+    """Move resolved and stale items to the archive now (also a periodic job)."""
+    if dry_run:
+        count = Item.query.filter(archive.due(datetime.now())).count()
+        click.echo(f'{count} items are due for the archive.')
+        return
+    started = time.perf_counter()
+    moved = archive.archive_items()
+    click.echo(f'Archived {moved} items in {time.perf_counter() - started:.1f}s.')
+
+
+@items_cli.command('stats')
+@click.option('--reconcile', is_flag=True, help='Recount from the item tables first (also a periodic job).')
+def item_stats(reconcile):
+    """Show the precomputed item counts."""
+    if reconcile:
+        started = time.perf_counter()
+        fixed = stats.reconcile_stats()
+        click.echo(f'Fixed {fixed} drifted counters in {time.perf_counter() - started:.1f}s.')
+    totals = stats.summary(days=1)['totals']
+    for item_type, counts in totals.items():
+        click.echo(f'{item_type}: ' + ', '.join(f'{count} {status}' for status, count in counts.items()))
+
+
+app.cli.add_command(uploads_cli)
+app.cli.add_command(assets_cli)
+app.cli.add_command(jobs_cli)
+app.cli.add_command(items_cli)
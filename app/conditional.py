@@ -0,0 +1,116 @@
+"""Conditional GET (``ETag`` / ``Last-Modified``) for read-mostly views.
+
+A *validator* computes, with one query of index and primary-key lookups,
+a fingerprint of the rows a view would render plus their newest
+modification time. Both come from the
+database alone, so every worker agrees on them. When the client's
+``If-None-Match`` or ``If-Modified-Since`` still matches, the view is
+skipped entirely and ``304 Not Modified`` is returned: no row loading, no
+template rendering, no body.
+"""
+import hashlib
+from functools import wraps
+
+from flask import request, session
+from flask_login import current_user
+
+from . import app, db
+from .models import Item, ItemArchive, ItemStat, User
+
+
+def make_etag(parts):
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()[:20]
+
+
+def conditional(validator):
+    """Answer ``304`` when ``validator(**view_args)`` matches the request.
+
+    ``validator`` returns ``None`` to skip conditional handling (e.g. the row
+    does not exist and the view will 404), else ``(parts, last_modified)``:
+    ``parts`` is any ``repr``-able value identifying the response body, and
+    ``last_modified`` is ``None`` when no timestamp covers all of it.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # Pending flash messages are rendered into the body; never 304 over them.
+            if request.method not in ('GET', 'HEAD') or '_flashes' in session:
+                return view(*args, **kwargs)
+            validated = validator(**kwargs)
+            if validated is None:
+                return view(*args, **kwargs)
+
+            parts, last_modified = validated
+            etag = make_etag((request.full_path, request.accept_mimetypes.best,
+                              current_user.is_authenticated, parts))
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains_weak(etag)
+            else:
+                since = request.if_modified_since
+                not_modified = (since is not None and last_modified is not None
+                                and last_modified.replace(microsecond=0) <= since.replace(tzinfo=None))
+
+            if not_modified:
+                response = app.response_class(status=304)
+            else:
+                response = app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag, weak=True)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            # Let clients keep the body but revalidate it on every use.
+            response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
+
+
+def item_validator(item_id):
+    """Fingerprint of one item page: the item, its reporter's version and the item table.
+
+    The page lists suggested matches, which any other item's changes can
+    add or remove, so the whole table's state counts. No
+    ``Last-Modified``: the reporter's changes have a version but no
+    timestamp, and deletes none either.
+    """
+    state = _item_table_state()
+    row = db.session.execute(
+        db.select(Item.id, Item.updated_at, User.version, *state)
+        .join(Item.user)
+        .where(Item.id == item_id)
+    ).first()
+    if row is None:
+        row = db.session.execute(
+            db.select(ItemArchive.id, ItemArchive.archived_at, User.version, *state)
+            .join(ItemArchive.user)
+            .where(ItemArchive.id == item_id)
+        ).first()
+        if row is None:
+            return None
+    return tuple(row), None
+
+
+def _item_table_state():
+    """Scalar subqueries that together change whenever any row of ``item`` does.
+
+    The newest id covers reports, the newest ``updated_at`` edits and status
+    changes, and the item counters (see app/stats.py), less their archived
+    part, deletes and archiving. Each is one index or primary-key lookup;
+    nothing scans the table.
+    """
+    other = db.aliased(Item)  # never correlated with an outer query on ``item``
+    listed = db.case((ItemStat.dimension == 'archived', -ItemStat.count), else_=ItemStat.count)
+    return (
+        db.select(db.func.max(other.id)).scalar_subquery(),
+        db.select(db.func.max(other.updated_at)).scalar_subquery(),
+        db.select(db.func.coalesce(db.func.sum(listed), 0))
+        .where(ItemStat.dimension.in_(('all', 'archived')), ItemStat.bucket == '')
+        .scalar_subquery(),
+    )
+
+
+def item_list_validator(**kwargs):
+    """Fingerprint of the item table; modified when its newest ``updated_at`` is."""
+    row = db.session.execute(db.select(*_item_table_state())).one()
+    return tuple(row), row[1]
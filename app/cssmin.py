@@ -0,0 +1,189 @@
+"""Small CSS minifier used by ``flask assets build``.
+
+Handles what the app's stylesheets actually contain (plain rules, ``@media``,
+``@keyframes``, ``@import``); it is not a general CSS parser. Besides
+removing comments and whitespace it:
+
+- drops a rule when a later rule in the same sheet and context has the same
+  selector and declarations (the later copy wins anyway);
+- drops a page rule that repeats the shared stylesheet's last rule for the
+  same selector in the same context, when the page sheet has no earlier rule
+  for that selector and no rule in between sets the same properties. The
+  shared sheet is always linked before page sheets, so the browser sees
+  that rule already.
+"""
+import re
+
+COMMENT_RE = re.compile(r'/\*.*?\*/', re.S)
+SPACE_RE = re.compile(r'\s+')
+NESTED_AT_RULES = ('@media', '@supports')
+
+
+def _squeeze(text):
+    return SPACE_RE.sub(' ', text).strip()
+
+
+def parse(css):
+    """Split ``css`` into ``[(prelude, body)]``.
+
+    ``body`` is a declaration string, a nested list for ``@media`` and
+    ``@supports``, or ``None`` for statements such as ``@import``.
+    """
+    css = COMMENT_RE.sub('', css)
+    rules = []
+    i, n = 0, len(css)
+    while i < n:
+        brace = css.find('{', i)
+        semicolon = css.find(';', i)
+        if brace == -1:
+            if css[i:].strip():
+                rules.append((_squeeze(css[i:]).rstrip(';'), None))
+            break
+        if semicolon != -1 and semicolon < brace:
+            rules.append((_squeeze(css[i:semicolon]), None))
+            i = semicolon + 1
+            continue
+
+        depth, end = 1, brace + 1
+        while depth and end < n:
+            depth += {'{': 1, '}': -1}.get(css[end], 0)
+            end += 1
+        prelude = _squeeze(css[i:brace])
+        inner = css[brace + 1:end - 1]
+        if prelude.startswith(NESTED_AT_RULES):
+            rules.append((prelude, parse(inner)))
+        else:
+            rules.append((prelude, inner))
+        i = end
+    return rules
+
+
+def _minify_prelude(prelude):
+    prelude = re.sub(r'\s*,\s*', ',', prelude)
+    prelude = re.sub(r'\s*>\s*', '>', prelude)
+    return prelude
+
+
+def _minify_declarations(body):
+    if '{' in body:
+        # @keyframes / @font-face style bodies with their own blocks.
+        steps = parse(body)
+        return ''.join(f'{_minify_prelude(p)}{{{_minify_declarations(b)}}}' for p, b in steps)
+    declarations = []
+    for declaration in body.split(';'):
+        if ':' not in declaration:
+            continue
+        prop, value = declaration.split(':', 1)
+        value = _squeeze(value)
+        value = re.sub(r'\s*,\s*', ',', value)
+        value = re.sub(r'\s*!\s*important', '!important', value)
+        declarations.append(f'{prop.strip()}:{value}')
+    return ';'.join(declarations)
+
+
+def _normalize(rules):
+    return [
+        (_minify_prelude(prelude),
+         _normalize(body) if isinstance(body, list) else
+         (None if body is None else _minify_declarations(body)))
+        for prelude, body in rules
+    ]
+
+
+def _properties(body):
+    """Properties a rule body sets, by root (``margin`` for ``margin-top``)."""
+    if body is None or '{' in body:  # statements; @keyframes steps do not cascade
+        return set()
+    return {declaration.split(':', 1)[0].lstrip('-').split('-')[0]
+            for declaration in body.split(';') if ':' in declaration}
+
+
+def _flatten(rules, context=()):
+    """``(context, prelude, body)`` for every rule, in document order."""
+    for prelude, body in rules:
+        if isinstance(body, list):
+            yield from _flatten(body, context + (prelude,))
+        else:
+            yield context, prelude, body
+
+
+def _dedupe(rules):
+    """Drop rules that a later identical rule in the same context repeats."""
+    later = set()
+    kept = []
+    for prelude, body in reversed(rules):
+        if isinstance(body, list):
+            body = _dedupe(body)
+            if body:
+                kept.append((prelude, body))
+            continue
+        if (prelude, body) in later:
+            continue
+        later.add((prelude, body))
+        kept.append((prelude, body))
+    kept.reverse()
+    return kept
+
+
+def _drop_shared(rules, shared):
+    """Drop page rules the browser already has from ``shared``.
+
+    A page rule goes when it is the page's first for its selector in its
+    context, repeats the shared sheet's last rule there, and no rule in
+    between (later in the shared sheet, earlier in the page, whatever its
+    selector) sets any of its properties: that rule could match the same
+    elements, and the page rule would override it.
+    """
+    flat_shared = list(_flatten(shared))
+    last_shared = {(context, prelude): index
+                   for index, (context, prelude, body) in enumerate(flat_shared) if body is not None}
+    # set_after[i]: properties set by shared rules from index i on
+    set_after = [set() for _ in range(len(flat_shared) + 1)]
+    for index in range(len(flat_shared) - 1, -1, -1):
+        set_after[index] = set_after[index + 1] | _properties(flat_shared[index][2])
+
+    seen = set()
+    set_before = set()
+
+    def walk(rules, context):
+        kept = []
+        for prelude, body in rules:
+            if isinstance(body, list):
+                body = walk(body, context + (prelude,))
+                if body:
+                    kept.append((prelude, body))
+                continue
+            key = (context, prelude)
+            index = last_shared.get(key)
+            properties = _properties(body)
+            redundant = (body is not None and key not in seen and index is not None
+                         and flat_shared[index][2] == body
+                         and not properties & (set_after[index + 1] | set_before))
+            seen.add(key)
+            # Judged against the original order, so a dropped rule still counts.
+            set_before.update(properties)
+            if not redundant:
+                kept.append((prelude, body))
+        return kept
+
+    return walk(rules, ())
+
+
+def _serialize(rules):
+    out = []
+    for prelude, body in rules:
+        if body is None:
+            out.append(prelude + ';')
+        elif isinstance(body, list):
+            out.append(f'{prelude}{{{_serialize(body)}}}')
+        else:
+            out.append(f'{prelude}{{{body}}}')
+    return ''.join(out)
+
+
+def minify(css, shared=None):
+    """Minify ``css``; rules already provided by ``shared`` CSS are dropped."""
+    rules = _dedupe(_normalize(parse(css)))
+    if shared:
+        rules = _drop_shared(rules, _normalize(parse(shared)))
+    return _serialize(rules)
@@ -0,0 +1,106 @@
+"""Engine options and connection tuning for each database backend.
+
+:func:`engine_options` turns the ``DB_*`` / ``SQLITE_*`` settings into
+``SQLALCHEMY_ENGINE_OPTIONS``; ``app/__init__.py`` applies it before
+creating ``db``. Options already set in ``SQLALCHEMY_ENGINE_OPTIONS`` win.
+
+- Postgres: a bounded :class:`TimedQueuePool` with pre-ping (drops
+  connections the server or a proxy closed), recycling, and a
+  server-side ``statement_timeout`` so a runaway query cannot hold a worker.
+- SQLite files: WAL, so readers no longer wait for writers,
+  ``synchronous=NORMAL`` (durable across crashes of the app, not of the OS,
+  in WAL mode), a memory-mapped read path and a busy timeout, applied to
+  every new connection. In-memory databases keep Flask-SQLAlchemy's
+  single shared connection.
+
+Time spent waiting for a pooled connection is exported on ``/metrics`` as
+``db_pool_checkout_seconds``; it includes opening a new connection when the
+pool has room for one.
+"""
+import sqlite3
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+from .metrics import Counter, Histogram
+
+POOL_CHECKOUT_SECONDS = Histogram(
+    'db_pool_checkout_seconds', 'Time spent waiting for a database connection from the pool.',
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30),
+)
+POOL_TIMEOUTS = Counter(
+    'db_pool_timeouts_total', 'Connection checkouts that gave up after DB_POOL_TIMEOUT.'
+)
+
+_sqlite_pragmas = []
+
+
+class TimedQueuePool(QueuePool):
+    """``QueuePool`` that records how long each checkout waited."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            POOL_TIMEOUTS.inc()
+            raise
+        finally:
+            POOL_CHECKOUT_SECONDS.observe(time.perf_counter() - started)
+
+
+def engine_options(config):
+    """``SQLALCHEMY_ENGINE_OPTIONS`` for ``config['SQLALCHEMY_DATABASE_URI']``."""
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    options = {}
+    if url.get_backend_name() == 'postgresql':
+        options.update(
+            poolclass=TimedQueuePool,
+            pool_size=config['DB_POOL_SIZE'],
+            max_overflow=config['DB_MAX_OVERFLOW'],
+            pool_timeout=config['DB_POOL_TIMEOUT'],
+            pool_recycle=config['DB_POOL_RECYCLE'],
+            pool_pre_ping=True,
+        )
+        if config['DB_STATEMENT_TIMEOUT_MS']:
+            options['connect_args'] = {
+                'options': f"-c statement_timeout={config['DB_STATEMENT_TIMEOUT_MS']}"
+            }
+    elif url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:'):
+        options.update(
+            poolclass=TimedQueuePool,
+            pool_size=config['DB_POOL_SIZE'],
+            max_overflow=config['DB_MAX_OVERFLOW'],
+            pool_timeout=config['DB_POOL_TIMEOUT'],
+        )
+    options.update(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    return options
+
+
+def sqlite_pragmas(config):
+    return [
+        'PRAGMA journal_mode=WAL',
+        'PRAGMA synchronous=NORMAL',
+        f"PRAGMA busy_timeout={int(config['SQLITE_BUSY_TIMEOUT_MS'])}",
+        f"PRAGMA mmap_size={int(config['SQLITE_MMAP_SIZE'])}",
+    ]
+
+
+def configure(config):
+    """Fill in ``SQLALCHEMY_ENGINE_OPTIONS`` and the SQLite connection pragmas."""
+    config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(config)
+    _sqlite_pragmas[:] = sqlite_pragmas(config)
+
+
+@event.listens_for(Engine, 'connect')
+def _tune_sqlite_connection(dbapi_connection, connection_record):
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    for pragma in _sqlite_pragmas:
+        # journal_mode is a no-op (it stays "memory") for in-memory databases.
+        cursor.execute(pragma)
+    cursor.close()
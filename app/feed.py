@@ -0,0 +1,227 @@
+"""Live feed of newly reported items, pushed over Server-Sent Events.
+
+Each worker process polls ``item`` for new rows once every
+``FEED_POLL_INTERVAL`` seconds, from one background thread and only while
+someone is listening, and fans the rows out to every subscriber in the
+process. A thousand open dashboards cost one small query a second per
+worker, not a query (or a page reload) each.
+
+- Subscribers filter by type, status and search terms (see
+  ``search.matches``); an event is encoded once, for all of them.
+- Each subscriber has a queue of ``FEED_QUEUE_SIZE`` events. A client too
+  slow to drain it is disconnected instead of holding events in memory;
+  the browser reconnects with ``Last-Event-ID`` and the missed items (up
+  to ``FEED_REPLAY_LIMIT``) are replayed from the database.
+- A comment line every ``FEED_HEARTBEAT`` seconds keeps proxies from
+  closing idle streams and finds clients that went away.
+- At most ``FEED_MAX_SUBSCRIBERS`` streams per process. Under the default
+  ``gevent`` workers a stream is an idle greenlet; gunicorn.conf.py lowers
+  the cap for ``gthread`` workers, where every stream holds a thread.
+
+Items are polled by id, so one whose transaction commits after that of a
+higher id (concurrent reports on Postgres) can be missed by live clients;
+it is there on the next page load.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+from . import app, db
+from .models import Item
+from .routes import WITH_REPORTER, snapshot_item
+from .search import matches, tokenize
+
+RETRY_MS = 5000  # browsers wait this long before reconnecting
+POLL_BATCH_SIZE = 500  # items published per poll; the rest go out on the next one
+
+
+class Event:
+    """A new item, shared by every subscriber; its words and encodings are built once."""
+
+    def __init__(self, item):
+        self.item = item
+        self.words = frozenset(tokenize(f'{item.title} {item.description}'))
+        self._encoded = {}
+        self._lock = threading.Lock()
+
+    def encoded(self, name, encode):
+        with self._lock:
+            if name not in self._encoded:
+                self._encoded[name] = encode(self.item)
+            return self._encoded[name]
+
+
+class Filter:
+    """Which new items a subscriber wants; ``None`` matches anything."""
+
+    def __init__(self, item_type=None, status=None, search=None):
+        # Case-insensitive, as the search backends are
+        self.item_type = item_type.lower() if item_type else None
+        self.status = status.lower() if status else None
+        self.search = search.lower() if search else None
+        self.terms = tokenize(search) if search else []
+
+    def __call__(self, event):
+        item = event.item
+        if self.item_type is not None and item.item_type.lower() != self.item_type:
+            return False
+        if self.status is not None and item.status.lower() != self.status:
+            return False
+        if self.terms:
+            return matches(self.terms, event.words)
+        # Punctuation only: a substring match, as LikeSearch does
+        return (not self.search or self.search in item.title.lower()
+                or self.search in item.description.lower())
+
+    def apply(self, query):
+        if self.item_type is not None:
+            query = query.filter(Item.item_type == self.item_type)
+        if self.status is not None:
+            query = query.filter(Item.status == self.status)
+        return query
+
+
+class Subscription:
+    """One client's filter and its queue of events not yet sent."""
+
+    def __init__(self, wants, size):
+        self.wants = wants
+        self.size = size
+        self.closed = False
+        self._events = deque()
+        self._ready = threading.Condition()
+
+    def offer(self, events):
+        """Queue ``events``; ``False`` if that would leave more than ``size`` queued."""
+        with self._ready:
+            if len(self._events) + len(events) > self.size:
+                return False
+            self._events.extend(events)
+            self._ready.notify()
+        return True
+
+    def get(self, timeout):
+        """The next event, or ``None`` after ``timeout`` seconds without one or once closed."""
+        with self._ready:
+            if not self._events and not self.closed:
+                self._ready.wait(timeout)
+            return self._events.popleft() if self._events and not self.closed else None
+
+    def close(self):
+        with self._ready:
+            self.closed = True
+            self._ready.notify()
+
+
+class Broker:
+    """Per-process fan-out of new items to subscriptions."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = set()
+        self._pid = None  # process that started the poller; forked workers start their own
+        self.last_id = None  # highest item id published; None while nobody listens
+
+    def subscribe(self, wants):
+        """A new subscription, or ``None`` when this process has ``FEED_MAX_SUBSCRIBERS``.
+
+        The first subscriber sets where new items start, so anything
+        reported after it connects, even before the first poll, is published.
+        """
+        with self._lock:
+            if len(self._subscriptions) >= app.config['FEED_MAX_SUBSCRIBERS']:
+                return None
+            if self.last_id is None:
+                self.last_id = db.session.query(db.func.max(Item.id)).scalar() or 0
+            subscription = Subscription(wants, app.config['FEED_QUEUE_SIZE'])
+            self._subscriptions.add(subscription)
+            if self._pid != os.getpid() and app.config['FEED_POLL_INTERVAL'] > 0:
+                self._pid = os.getpid()
+                threading.Thread(target=self._poll_forever, name='item-feed', daemon=True).start()
+            return subscription
+
+    def unsubscribe(self, subscription):
+        subscription.close()
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def publish(self, items):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        events = [Event(item) for item in items]
+        for subscription in subscriptions:
+            wanted = [event for event in events if subscription.wants(event)]
+            if wanted and not subscription.offer(wanted):
+                # Backpressure: drop the client, it catches up on reconnect.
+                self.unsubscribe(subscription)
+
+    def poll(self):
+        """Publish the items reported since the last poll; return how many."""
+        with self._lock:
+            if not self._subscriptions:
+                self.last_id = None  # nobody missed anything; start afresh
+                return 0
+        items = [snapshot_item(item) for item in Item.query.options(WITH_REPORTER)
+                 .filter(Item.id > self.last_id).order_by(Item.id).limit(POLL_BATCH_SIZE)]
+        if items:
+            self.last_id = items[-1].id
+            self.publish(items)
+        return len(items)
+
+    def _poll_forever(self):
+        while True:
+            time.sleep(app.config['FEED_POLL_INTERVAL'])
+            try:
+                with app.app_context():
+                    self.poll()
+            except Exception:
+                app.logger.exception('Item feed poll failed')
+
+    def reset(self):
+        with self._lock:
+            for subscription in self._subscriptions:
+                subscription.close()
+            self._subscriptions.clear()
+            self.last_id = None
+
+
+broker = Broker()
+
+
+def replay(wants, after_id):
+    """Events for the items after ``after_id`` that ``wants`` matches, oldest first."""
+    query = wants.apply(Item.query.options(WITH_REPORTER)).filter(Item.id > after_id).order_by(Item.id)
+    events = [Event(snapshot_item(item)) for item in query.limit(app.config['FEED_REPLAY_LIMIT'])]
+    return [event for event in events if wants(event)]
+
+
+def frame(item_id, data):
+    return f'id: {item_id}\nevent: item\ndata: {data}\n\n'
+
+
+def stream(subscription, last_id, encode, name):
+    """SSE frames for ``subscription``: missed items after ``last_id``, then live ones.
+
+    ``encode(item)`` builds an event's ``data`` line; ``name`` keys its
+    result, shared with other subscribers using the same encoding.
+    """
+    try:
+        yield f'retry: {RETRY_MS}\n\n'
+        if last_id:
+            for event in replay(subscription.wants, last_id):
+                yield frame(event.item.id, encode(event.item))
+                last_id = event.item.id
+        # Hand the database connection back before waiting.
+        db.session.remove()
+        while True:
+            event = subscription.get(timeout=app.config['FEED_HEARTBEAT'])
+            if subscription.closed:
+                break
+            if event is None:
+                yield ': ping\n\n'
+            elif event.item.id > (last_id or 0):  # not already replayed
+                yield frame(event.item.id, event.encoded(name, encode))
+                last_id = event.item.id
+    finally:
+        broker.unsubscribe(subscription)
@@ -0,0 +1,133 @@
+"""Resized variants of uploaded item photos.
+
+Uploads are stored as-is by the report routes, which queue an
+``item_photo`` job (see :mod:`app.jobs`). The worker writes
+``thumb``/``card``/``full`` renditions in WebP and JPEG under
+``static/uploads/variants`` and records them on ``Item.photo_variants``.
+Re-encoding drops EXIF (GPS position, camera serial) after applying its
+orientation. Photos over ``MAX_IMAGE_PIXELS`` are refused before their
+pixels are decoded. Until the variants exist, templates fall back to the
+original upload.
+"""
+import os
+
+from flask import url_for
+from PIL import Image, ImageOps
+
+from . import app, db
+from .jobs import enqueue, handler
+from .models import Item
+
+# Longest edge in pixels for each variant.
+VARIANTS = {
+    'thumb': 320,
+    'card': 640,
+    'full': 1280,
+}
+
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+VARIANT_DIR = 'variants'
+
+
+def upload_dir():
+    return os.path.join(app.root_path, 'static', 'uploads')
+
+
+def _flatten(image):
+    """Return an RGB copy of ``image``, compositing transparency onto white."""
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def build_variants(filename):
+    """Write every variant of ``uploads/<filename>`` and describe them.
+
+    Returns ``{variant: {'width': w, 'webp': path, 'jpeg': path}}`` with
+    paths relative to ``static/uploads``.
+    """
+    stem = filename.rsplit('.', 1)[0]
+    os.makedirs(os.path.join(upload_dir(), VARIANT_DIR), exist_ok=True)
+
+    with Image.open(os.path.join(upload_dir(), filename)) as original:
+        # Only the header has been read so far: a small file can declare a
+        # huge canvas that would take gigabytes to decode.
+        if original.width * original.height > app.config['MAX_IMAGE_PIXELS']:
+            raise Image.DecompressionBombError(
+                f'{filename} is {original.width}x{original.height} pixels, over MAX_IMAGE_PIXELS')
+        icc_profile = original.info.get('icc_profile')
+        image = _flatten(ImageOps.exif_transpose(original))
+
+    variants = {}
+    for name, edge in VARIANTS.items():
+        resized = image.copy()
+        resized.thumbnail((edge, edge), Image.LANCZOS)
+        variant = {'width': resized.width}
+        for ext, (pil_format, options) in FORMATS.items():
+            relative = f'{VARIANT_DIR}/{stem}-{name}.{ext}'
+            # Only the colour profile is carried over; EXIF and XMP are dropped.
+            resized.save(os.path.join(upload_dir(), relative), pil_format,
+                         icc_profile=icc_profile, **options)
+            variant[ext] = relative
+        variants[name] = variant
+    return variants
+
+
+@handler('item_photo')
+def process_item_photo(item_id):
+    """Build the variants for one item's photo and store them on the row.
+
+    Runs in the worker's session; a failure propagates so the job is retried
+    with backoff (see app/jobs.py).
+    """
+    item = db.session.get(Item, item_id)
+    if item is None or not item.photo_filename:
+        return
+    # Uploads are content-addressed, so another Item may already have
+    # had the same photo processed.
+    processed = (
+        Item.query
+        .filter(Item.photo_filename == item.photo_filename,
+                Item.photo_variants.isnot(None), Item.id != item.id)
+        .first()
+    )
+    if processed is not None:
+        item.photo_variants = processed.photo_variants
+    else:
+        item.photo_variants = build_variants(item.photo_filename)
+    db.session.commit()
+
+
+def submit_item_photo(item_id):
+    """Queue variant generation for ``item_id`` with the caller's transaction."""
+    return enqueue('item_photo', {'item_id': item_id}, key=f'item-photo:{item_id}')
+
+
+@app.template_global()
+def photo_url(item, variant='card', ext='jpeg'):
+    """URL of one photo variant, or of the original while it is processing."""
+    if getattr(item, 'archived_at', None) is not None:
+        return url_for('archived_photo', filename=item.photo_filename)
+    variants = item.photo_variants or {}
+    if variant in variants:
+        filename = 'uploads/' + variants[variant][ext]
+    else:
+        filename = 'uploads/' + item.photo_filename
+    return url_for('static', filename=filename)
+
+
+@app.template_global()
+def photo_srcset(item, ext='jpeg'):
+    """``srcset`` listing every variant of ``item``'s photo in ``ext``."""
+    variants = item.photo_variants or {}
+    return ', '.join(
+        f"{url_for('static', filename='uploads/' + variant[ext])} {variant['width']}w"
+        for variant in sorted(variants.values(), key=lambda v: v['width'])
+    )
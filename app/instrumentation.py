@@ -0,0 +1,141 @@
+"""Per-request performance metrics, ``Server-Timing`` and the slow-request log.
+
+For every request this records, by endpoint:
+
+- ``http_request_duration_seconds``: time until the response is ready (for
+  streamed responses, before the body is sent);
+- ``http_request_db_queries`` / ``http_request_db_seconds``: SQL statements
+  run while handling it, from the engine's cursor events;
+- ``template_render_seconds``: ``render_template`` time, by template;
+- ``http_upload_bytes_total``: request bodies of multipart (upload) posts.
+
+All of them are on ``/metrics``. When ``SERVER_TIMING`` is on, responses
+carry ``Server-Timing: db;dur=…, tpl;dur=…, app;dur=…`` for the browser's
+network panel. Requests slower than ``SLOW_REQUEST_MS`` are logged to the
+``app.slow`` logger with each SQL statement and its duration.
+"""
+import logging
+import time
+
+from flask import g, has_request_context, request, before_render_template, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from . import app
+from .metrics import Counter, Histogram
+
+REQUEST_SECONDS = Histogram(
+    'http_request_duration_seconds', 'Time to build the response, by endpoint.',
+    ['endpoint', 'method'],
+)
+REQUESTS = Counter(
+    'http_requests_total', 'Requests by endpoint and status code.', ['endpoint', 'method', 'status']
+)
+REQUEST_QUERIES = Histogram(
+    'http_request_db_queries', 'SQL statements per request, by endpoint.', ['endpoint'],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+REQUEST_DB_SECONDS = Histogram(
+    'http_request_db_seconds', 'Time spent in SQL per request, by endpoint.', ['endpoint'],
+)
+TEMPLATE_SECONDS = Histogram(
+    'template_render_seconds', 'render_template time, by template.', ['template'],
+)
+UPLOAD_BYTES = Counter(
+    'http_upload_bytes_total', 'Bytes received in multipart (upload) requests.', ['endpoint']
+)
+
+# Statements kept per request for the slow log; the count and time cover all.
+MAX_LOGGED_STATEMENTS = 50
+
+slow_log = logging.getLogger('app.slow')
+
+
+class RequestTiming:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+        self.statements = []
+        self._templates = []
+
+
+def _timing():
+    return g.get('_timing') if has_request_context() else None
+
+
+@app.before_request
+def _start_timing():
+    g._timing = RequestTiming()
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _timing() is not None:
+        conn.info.setdefault('_query_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    timing = _timing()
+    started = conn.info.get('_query_started')
+    if timing is None or not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    timing.queries += 1
+    timing.db_seconds += elapsed
+    if len(timing.statements) < MAX_LOGGED_STATEMENTS:
+        timing.statements.append((elapsed, statement))
+
+
+@before_render_template.connect_via(app)
+def _template_started(sender, template, context, **extra):
+    timing = _timing()
+    if timing is not None:
+        timing._templates.append(time.perf_counter())
+
+
+@template_rendered.connect_via(app)
+def _template_finished(sender, template, context, **extra):
+    timing = _timing()
+    if timing is None or not timing._templates:
+        return
+    elapsed = time.perf_counter() - timing._templates.pop()
+    TEMPLATE_SECONDS.observe(elapsed, template=template.name or '<string>')
+    if not timing._templates:  # count nested renders once
+        timing.template_seconds += elapsed
+
+
+@app.after_request
+def _finish_timing(response):
+    timing = g.pop('_timing', None)
+    if timing is None:
+        return response
+    elapsed = time.perf_counter() - timing.started
+    endpoint = request.endpoint or '<unmatched>'
+
+    REQUEST_SECONDS.observe(elapsed, endpoint=endpoint, method=request.method)
+    REQUESTS.inc(endpoint=endpoint, method=request.method, status=str(response.status_code))
+    REQUEST_QUERIES.observe(timing.queries, endpoint=endpoint)
+    REQUEST_DB_SECONDS.observe(timing.db_seconds, endpoint=endpoint)
+    if request.mimetype == 'multipart/form-data' and request.content_length:
+        UPLOAD_BYTES.inc(request.content_length, endpoint=endpoint)
+
+    if app.config.get('SERVER_TIMING'):
+        response.headers['Server-Timing'] = ', '.join([
+            f'db;dur={timing.db_seconds * 1000:.1f};desc="{timing.queries} queries"',
+            f'tpl;dur={timing.template_seconds * 1000:.1f}',
+            f'app;dur={elapsed * 1000:.1f}',
+        ])
+
+    if elapsed * 1000 >= app.config.get('SLOW_REQUEST_MS', 500):
+        lines = [f'{duration * 1000:8.1f} ms  {" ".join(statement.split())}'
+                 for duration, statement in timing.statements]
+        slow_log.warning(
+            'Slow request: %s %s -> %s in %.0f ms (%d queries, %.0f ms SQL, %.0f ms templates)\n%s',
+            request.method, request.full_path.rstrip('?'), response.status_code, elapsed * 1000,
+            timing.queries, timing.db_seconds * 1000, timing.template_seconds * 1000,
+            '\n'.join(lines),
+        )
+    return response
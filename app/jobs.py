@@ -0,0 +1,214 @@
+"""Durable background jobs stored in the app database.
+
+Slow side effects (email, SMS, photo variants, match notifications) are
+queued as :class:`~app.models.Job` rows and run by ``flask jobs work``
+processes, so a slow SMTP server or SMS gateway never holds up a request::
+
+    @handler('email')
+    def send_email(to, subject, body): ...
+
+    enqueue('email', {'to': ..., 'subject': ..., 'body': ...}, key=f'welcome:{user.id}')
+    db.session.commit()
+
+:func:`enqueue` only adds the row to the current session: the job is saved
+by the caller's commit, together with the change that caused it, and is
+lost if that change is rolled back. An idempotency ``key`` makes enqueuing
+the same work twice a no-op.
+
+Workers claim one due job at a time with a conditional ``UPDATE`` (so two
+workers never run the same job, on SQLite as on Postgres), run its handler
+and commit the result together with anything the handler added to the
+session. A failing job is retried with exponential backoff up to
+``max_attempts``, then marked ``failed``. Jobs left ``running`` by a worker
+that died are requeued after ``JOBS_LOCK_TIMEOUT`` seconds. Handlers must
+therefore tolerate running more than once.
+
+Handlers registered with :func:`periodic` (e.g. archiving old items) are
+also queued on a schedule, each run by one worker.
+"""
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import IntegrityError
+
+from . import app, db
+from .models import Job
+
+HANDLERS = {}
+PERIODIC = {}  # kind -> config setting with its interval in seconds
+
+
+def handler(kind):
+    """Register the decorated function as the handler for jobs of ``kind``."""
+    def register(func):
+        HANDLERS[kind] = func
+        return func
+    return register
+
+
+def periodic(kind, setting):
+    """Run the ``kind`` handler every ``app.config[setting]`` seconds (0 disables it).
+
+    ``flask jobs work`` queues the first run; each run queues the next.
+    """
+    PERIODIC[kind] = setting
+
+
+def schedule_periodic(*kinds):
+    """Queue the next run of periodic jobs (all by default) and commit.
+
+    Runs are keyed by their time slot, so any number of workers calling
+    this queue each run once.
+    """
+    now = time.time()
+    for kind in kinds or PERIODIC:
+        interval = app.config.get(PERIODIC[kind]) or 0
+        if interval <= 0:
+            continue
+        slot = int(now // interval) + 1
+        enqueue(kind, key=f'{kind}:{slot}', delay=slot * interval - now)
+    db.session.commit()
+
+
+def enqueue(kind, payload=None, key=None, delay=0, max_attempts=None):
+    """Add a ``kind`` job to the current transaction and return it.
+
+    With ``key``, an existing job with the same idempotency key is returned
+    instead of queuing a second one.
+    """
+    if kind not in HANDLERS:
+        raise ValueError(f'Unknown job kind {kind!r}')
+    if key is not None:
+        existing = Job.query.filter_by(idempotency_key=key).first()
+        if existing is not None:
+            return existing
+
+    now = datetime.now()
+    job = Job(
+        kind=kind,
+        payload=payload or {},
+        idempotency_key=key,
+        status='queued',
+        attempts=0,
+        max_attempts=max_attempts or app.config['JOBS_MAX_ATTEMPTS'],
+        run_at=now + timedelta(seconds=delay),
+        created_at=now,
+    )
+    try:
+        with db.session.begin_nested():
+            db.session.add(job)
+    except IntegrityError:
+        # Another request queued the same key between our check and insert.
+        return Job.query.filter_by(idempotency_key=key).one()
+    return job
+
+
+def backoff(attempts):
+    """Seconds to wait before retrying a job that has failed ``attempts`` times."""
+    delay = app.config['JOBS_BACKOFF_BASE'] * 2 ** (attempts - 1)
+    return min(delay, app.config['JOBS_BACKOFF_MAX']) * random.uniform(0.5, 1.0)
+
+
+def claim_next(worker_id):
+    """Mark the next due job as running for ``worker_id`` and return it, or ``None``."""
+    now = datetime.now()
+    due = (
+        db.session.query(Job.id)
+        .filter(Job.status == 'queued', Job.run_at <= now)
+        .order_by(Job.run_at, Job.id)
+        .limit(5)
+    )
+    for (job_id,) in due.all():
+        claimed = db.session.execute(
+            db.update(Job)
+            .where(Job.id == job_id, Job.status == 'queued')
+            .values(status='running', locked_by=worker_id, locked_at=now,
+                    attempts=Job.attempts + 1)
+        )
+        db.session.commit()
+        if claimed.rowcount == 1:
+            return db.session.get(Job, job_id, populate_existing=True)
+    return None
+
+
+def requeue_stale():
+    """Requeue jobs whose worker stopped before finishing them."""
+    cutoff = datetime.now() - timedelta(seconds=app.config['JOBS_LOCK_TIMEOUT'])
+    stale = (Job.status == 'running', Job.locked_at < cutoff)
+    db.session.execute(
+        db.update(Job).where(*stale, Job.attempts >= Job.max_attempts)
+        .values(status='failed', locked_by=None, finished_at=datetime.now(),
+                last_error='Worker stopped while running the job')
+    )
+    db.session.execute(
+        db.update(Job).where(*stale).values(status='queued', locked_by=None, run_at=datetime.now())
+    )
+    db.session.commit()
+
+
+def run(job):
+    """Run one claimed job and record the outcome; return whether it succeeded."""
+    job_id = job.id
+    try:
+        func = HANDLERS.get(job.kind)
+        if func is None:
+            raise LookupError(f'No handler for job kind {job.kind!r}')
+        func(**job.payload)
+    except Exception:
+        db.session.rollback()
+        job = db.session.get(Job, job_id)
+        job.last_error = traceback.format_exc(limit=5)
+        job.locked_by = None
+        if job.attempts >= job.max_attempts:
+            job.status = 'failed'
+            job.finished_at = datetime.now()
+            app.logger.error('Job %s (%s) failed after %s attempts', job_id, job.kind, job.attempts)
+        else:
+            job.status = 'queued'
+            job.run_at = datetime.now() + timedelta(seconds=backoff(job.attempts))
+            app.logger.warning('Job %s (%s) failed, retry at %s', job_id, job.kind, job.run_at)
+        db.session.commit()
+        return False
+
+    job.status = 'done'
+    job.locked_by = None
+    job.finished_at = datetime.now()
+    db.session.commit()
+    return True
+
+
+def default_worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def work(worker_id=None, once=False, stop=None):
+    """Run jobs until ``stop`` (a ``threading.Event``) is set; return how many ran.
+
+    With ``once``, return as soon as no job is due instead of polling.
+    """
+    worker_id = worker_id or default_worker_id()
+    stop = stop or threading.Event()
+    processed = 0
+    next_stale_check = 0
+    while not stop.is_set():
+        if time.monotonic() >= next_stale_check:
+            requeue_stale()
+            next_stale_check = time.monotonic() + app.config['JOBS_LOCK_TIMEOUT'] / 10
+        job = claim_next(worker_id)
+        if job is None:
+            if once:
+                break
+            db.session.remove()  # don't hold a connection between polls
+            stop.wait(app.config['JOBS_POLL_INTERVAL'])
+            continue
+        kind = job.kind
+        run(job)
+        if kind in PERIODIC:
+            schedule_periodic(kind)
+        processed += 1
+    return processed
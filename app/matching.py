@@ -0,0 +1,253 @@
+"""Suggested lost↔found matches for an item.
+
+Titles and descriptions are tokenized into an in-memory inverted index,
+one per item type. Looking up a lost item scores the found items that
+share its words with TF-IDF cosine similarity (and vice versa):
+
+- candidates come from the posting lists of the query's rarer tokens, those
+  with at most ``MAX_POSTINGS`` entries; common tokens ("black", "phone")
+  only add to the score of candidates found that way. When every token is
+  common, the newest ``MAX_POSTINGS`` items of the rarest one are used. A
+  lookup therefore costs ``O(tokens × MAX_POSTINGS)`` however many items
+  exist;
+- candidates are ranked by their summed IDF weights first, and only the
+  best ``RERANK_FACTOR × k`` are normalized to a cosine score.
+
+When an item is reported, a ``match_notification`` job emails its reporter
+the suggestions and tells the reporters of those items about the new one.
+
+The index is per process and incremental: before each lookup, active items
+with an id above the highest one already indexed are read and added.
+gunicorn.conf.py loads it in the master before forking, so no request
+waits for the first full read. Items resolved, archived or deleted since
+(by any process) are found when results are loaded from the database,
+which only returns active ones; they are dropped from the index and more
+candidates fetched until ``k`` active items are found or none are left.
+"""
+import math
+import re
+import threading
+from bisect import bisect_left
+from collections import Counter, defaultdict, namedtuple
+
+from . import app, db
+from .jobs import enqueue, handler
+from .models import Item
+
+DEFAULT_K = 5
+MAX_K = 20
+MAX_POSTINGS = 2000
+RERANK_FACTOR = 10
+MIN_SCORE = 0.15
+
+OPPOSITE = {'lost': 'found', 'found': 'lost'}
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+STOPWORDS = frozenset('''
+    a an and are as at be but by for from has have i in is it its my near of on or our
+    the this that to was were with left lost found item someone please if any call
+'''.split())
+
+Match = namedtuple('Match', 'item score')
+
+
+def tokenize(text):
+    """Lowercased word tokens of ``text``, without stopwords and with plurals folded."""
+    tokens = []
+    for token in TOKEN_RE.findall((text or '').lower()):
+        if len(token) < 2 or token in STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+class MatchIndex:
+    """Inverted index of item tokens, split by item type."""
+
+    def __init__(self, max_postings=MAX_POSTINGS):
+        self.max_postings = max_postings
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.max_seen = 0
+        self._vocabulary = {}
+        self._postings = {kind: defaultdict(list) for kind in OPPOSITE}
+        self._documents = {}
+        self._sizes = Counter()
+
+    def __len__(self):
+        return len(self._documents)
+
+    def _token_ids(self, tokens, create=False):
+        ids = set()
+        for token in tokens:
+            token_id = self._vocabulary.get(token)
+            if token_id is None and create:
+                token_id = self._vocabulary[token] = len(self._vocabulary)
+            if token_id is not None:
+                ids.add(token_id)
+        return ids
+
+    def add(self, item_id, item_type, text):
+        if item_type not in OPPOSITE:
+            return
+        with self._lock:
+            if item_id in self._documents:
+                return
+            token_ids = self._token_ids(tokenize(text), create=True)
+            self._documents[item_id] = (item_type, tuple(token_ids))
+            self._sizes[item_type] += 1
+            postings = self._postings[item_type]
+            for token_id in token_ids:
+                postings[token_id].append(item_id)
+            self.max_seen = max(self.max_seen, item_id)
+
+    def skip(self, item_id):
+        """Note ``item_id`` as read without indexing it (it is not active)."""
+        with self._lock:
+            self.max_seen = max(self.max_seen, item_id)
+
+    def remove(self, item_ids):
+        """Drop ``item_ids`` from the index; ids not in it are ignored."""
+        with self._lock:
+            for item_id in item_ids:
+                document = self._documents.pop(item_id, None)
+                if document is None:
+                    continue
+                item_type, token_ids = document
+                self._sizes[item_type] -= 1
+                postings = self._postings[item_type]
+                for token_id in token_ids:
+                    posting = postings[token_id]
+                    position = bisect_left(posting, item_id)
+                    if position < len(posting) and posting[position] == item_id:
+                        del posting[position]
+                    if not posting:
+                        del postings[token_id]
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+
+    def _idf(self, item_type, token_id):
+        df = len(self._postings[item_type].get(token_id, ()))
+        return math.log((self._sizes[item_type] + 1) / (df + 1)) + 1
+
+    def candidates(self, item_type, text, k=DEFAULT_K, exclude=None):
+        """Top ``k`` ``(item_id, score)`` of type ``item_type`` for ``text``."""
+        with self._lock:
+            postings = self._postings[item_type]
+            weights = {
+                token_id: self._idf(item_type, token_id) ** 2
+                for token_id in self._token_ids(tokenize(text)) if token_id in postings
+            }
+            if not weights:
+                return []
+
+            raw = defaultdict(float)
+            common = []
+            for token_id in sorted(weights, key=lambda t: len(postings[t])):
+                posting = postings[token_id]
+                if len(posting) > self.max_postings and raw:
+                    common.append(token_id)
+                    continue
+                # Posting lists are in id order, so the slice keeps the newest items.
+                for item_id in posting[-self.max_postings:]:
+                    raw[item_id] += weights[token_id]
+            for item_id in raw:
+                document = self._documents[item_id][1]
+                raw[item_id] += sum(weights[t] for t in common if t in document)
+            raw.pop(exclude, None)
+
+            best = sorted(raw.items(), key=lambda pair: pair[1], reverse=True)[:k * RERANK_FACTOR]
+            query_norm = math.sqrt(sum(weights.values()))
+            scored = []
+            for item_id, dot in best:
+                norm = math.sqrt(sum(self._idf(item_type, t) ** 2 for t in self._documents[item_id][1]))
+                score = dot / (query_norm * norm)
+                if score >= MIN_SCORE:
+                    scored.append((item_id, round(score, 4)))
+        scored.sort(key=lambda pair: (pair[1], pair[0]), reverse=True)
+        return scored[:k]
+
+
+index = MatchIndex()
+
+
+def item_text(item):
+    return f'{item.title} {item.description}'
+
+
+def refresh():
+    """Add active items reported since the last refresh to the index; return how many."""
+    # Status is checked here rather than in SQL, so the read walks the
+    # primary key instead of sorting the status index's rows.
+    rows = (
+        db.session.query(Item.id, Item.item_type, Item.status, Item.title, Item.description)
+        .filter(Item.id > index.max_seen)
+        .order_by(Item.id)
+        .yield_per(1000)
+    )
+    added = 0
+    for row in rows:
+        if row.status == 'active':
+            index.add(row.id, row.item_type, item_text(row))
+            added += 1
+        else:
+            index.skip(row.id)
+    return added
+
+
+@app.template_global()
+def find_matches(item, k=DEFAULT_K):
+    """Active items of the opposite type most similar to ``item``, best first."""
+    if item.item_type not in OPPOSITE:
+        return []
+    refresh()
+    while True:
+        scored = index.candidates(OPPOSITE[item.item_type], item_text(item), k * 2, exclude=item.id)
+        loaded = {
+            match.id: match
+            for match in Item.query.filter(
+                Item.id.in_([item_id for item_id, _ in scored]), Item.status == 'active'
+            )
+        } if scored else {}
+        # Each stale id is dropped once, so over the index's life this costs
+        # at most one extra query per resolved, archived or deleted item.
+        stale = [item_id for item_id, _ in scored if item_id not in loaded]
+        index.remove(stale)
+        matches = [Match(loaded[item_id], score) for item_id, score in scored if item_id in loaded]
+        if len(matches) >= k or not stale:
+            return matches[:k]
+
+
+def queue_match_notification(item):
+    """Queue the match emails for a newly reported ``item`` with the caller's transaction."""
+    return enqueue('match_notification', {'item_id': item.id}, key=f'item-matches:{item.id}')
+
+
+@handler('match_notification')
+def notify_matches(item_id):
+    item = db.session.get(Item, item_id)
+    if item is None or item.status != 'active':
+        return
+    matches = find_matches(item)
+    if not matches:
+        return
+
+    base_url = app.config['PUBLIC_URL'].rstrip('/')
+    listing = '\n'.join(f'- {match.item.title}: {base_url}/item/{match.item.id}' for match in matches)
+    enqueue('email', {
+        'to': item.user.email,
+        'subject': f'Possible matches for "{item.title}"',
+        'body': f'These {OPPOSITE[item.item_type]} reports look like your item:\n\n{listing}\n',
+    }, key=f'match-email:{item.id}')
+    for match in matches:
+        enqueue('email', {
+            'to': match.item.user.email,
+            'subject': f'A new {item.item_type} report may match "{match.item.title}"',
+            'body': f'{item.title}: {base_url}/item/{item.id}\n',
+        }, key=f'match-email:{item.id}:{match.item.id}')
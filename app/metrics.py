@@ -0,0 +1,108 @@
+"""In-process metrics in the Prometheus text exposition format.
+
+Metrics are module-level objects registered on creation::
+
+    CACHE_REQUESTS = Counter('cache_requests_total', 'Cache lookups.', ['cache', 'result'])
+    CACHE_REQUESTS.inc(cache='page', result='hit')
+
+:class:`Histogram` works the same way with ``observe(seconds, **labels)``.
+
+Values are per process; with several gunicorn workers each one reports its
+own, which is what a Prometheus scrape of each worker expects.
+"""
+import threading
+
+REGISTRY = []
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels
+    )
+    return '{' + pairs + '}'
+
+
+class Counter:
+    """A monotonically increasing value, optionally split by labels."""
+    type = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f'{self.name} expects labels {self.labelnames}, got {tuple(labels)}')
+        return tuple((name, labels[name]) for name in self.labelnames)
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in sorted(self._values.items())]
+
+
+class Histogram(Counter):
+    """Observations counted into cumulative ``le`` buckets, with their sum."""
+    type = 'histogram'
+
+    DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            # One count per bucket, then the total count and sum.
+            state = self._values.setdefault(key, [0] * (len(self.buckets) + 1) + [0.0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += 1
+            state[-1] += value
+
+    def inc(self, amount=1, **labels):
+        raise TypeError('Histograms are updated with observe()')
+
+    def value(self, **labels):
+        """``(count, sum)`` of the observations for one label set."""
+        state = self._values.get(self._key(labels))
+        return (state[-2], state[-1]) if state else (0, 0.0)
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(state)) for key, state in sorted(self._values.items())]
+        samples = []
+        for key, state in items:
+            for bound, count in zip(self.buckets, state):
+                samples.append((f'{self.name}_bucket', key + (('le', str(float(bound))),), count))
+            samples.append((f'{self.name}_bucket', key + (('le', '+Inf'),), state[-2]))
+            samples.append((f'{self.name}_count', key, state[-2]))
+            samples.append((f'{self.name}_sum', key, state[-1]))
+        return samples
+
+
+def render():
+    """All registered metrics as Prometheus text."""
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.type}')
+        for name, labels, value in metric.samples():
+            lines.append(f'{name}{_format_labels(labels)} {value}')
+    return '\n'.join(lines) + '\n'
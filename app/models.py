@@ -1,6 +1,12 @@
+from datetime import datetime
+
 from . import db
 from flask_login import UserMixin
 
+# Native enums on Postgres (4 bytes a row); short strings on SQLite
+ITEM_TYPES = ('lost', 'found')
+ITEM_STATUSES = ('active', 'resolved')
+
 class User(UserMixin, db.Model):
 	id = db.Column(db.Integer, primary_key=True)
 	name = db.Column(db.String(100), nullable=False)
@@ -8,20 +14,105 @@ class User(UserMixin, db.Model):
 	email = db.Column(db.String(120), unique=True, nullable=False)
 	phone = db.Column(db.String(20), unique=True, nullable=False)
 	department = db.Column(db.String(100), nullable=False)
-	password_hash = db.Column(db.String(128), nullable=False)
+	password_hash = db.Column(db.String(255), nullable=False)  # Long enough for scrypt hashes
 	email_verified = db.Column(db.Boolean, default=False)
 	email_verification_code = db.Column(db.String(6))
 	phone_verified = db.Column(db.Boolean, default=False)
 	phone_verification_code = db.Column(db.String(6))
-	items = db.relationship('Item', backref='user', lazy=True)
+	version = db.Column(db.Integer, nullable=False, default=1, server_default='1')  # Bumped on profile/password changes; see app/auth.py
+	items = db.relationship('Item', back_populates='user', lazy=True)
 
 class Item(db.Model):
+	__table_args__ = (
+		# Backs keyset pagination over (date_reported, id); see app/pagination.py
+		db.Index('ix_item_date_reported_id', 'date_reported', 'id'),
+		# /search filtered by type and/or status, newest first. A query with both
+		# filters walks one of these in order and checks the other column.
+		db.Index('ix_item_item_type_date_reported_id', 'item_type', 'date_reported', 'id'),
+		db.Index('ix_item_status_date_reported_id', 'status', 'date_reported', 'id'),
+		db.Index('ix_item_user_id', 'user_id'),
+		# max(updated_at) is the list validator in app/conditional.py
+		db.Index('ix_item_updated_at', 'updated_at'),
+	)
+
 	id = db.Column(db.Integer, primary_key=True)
 	title = db.Column(db.String(100), nullable=False)
 	description = db.Column(db.Text, nullable=False)
-	item_type = db.Column(db.String(10), nullable=False)  # 'lost' or 'found'
+	item_type = db.Column(db.Enum(*ITEM_TYPES, name='item_type', length=10), nullable=False)
 	contact_phone = db.Column(db.String(20), nullable=False)  # Contact phone for this item
 	photo_filename = db.Column(db.String(255))  # Optional photo filename
+	photo_variants = db.Column(db.JSON(none_as_null=True))  # Resized renditions, filled in by app/images.py
+	date_reported = db.Column(db.DateTime, nullable=False)
+	status = db.Column(db.Enum(*ITEM_STATUSES, name='item_status', length=20), default='active')
+	user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+	# Set on every insert and update, Core statements included; nullable only
+	# so SQLite could add it without rebuilding the table
+	updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+	user = db.relationship('User', back_populates='items')
+
+class Blob(db.Model):
+	"""A content-addressed upload, shared by every Item with the same photo."""
+	sha256 = db.Column(db.String(64), primary_key=True)
+	filename = db.Column(db.String(255), nullable=False)  # '<sha256>.<ext>' under static/uploads
+	size = db.Column(db.Integer, nullable=False)
+	ref_count = db.Column(db.Integer, nullable=False, default=0)
+	created_at = db.Column(db.DateTime, nullable=False)
+
+class Job(db.Model):
+	"""A unit of background work, run by ``flask jobs work``; see app/jobs.py."""
+	__table_args__ = (
+		# Workers poll for due jobs in run_at order
+		db.Index('ix_job_status_run_at', 'status', 'run_at'),
+	)
+
+	id = db.Column(db.Integer, primary_key=True)
+	kind = db.Column(db.String(64), nullable=False)  # Handler name, e.g. 'email'
+	payload = db.Column(db.JSON, nullable=False)  # Keyword arguments for the handler
+	idempotency_key = db.Column(db.String(200), unique=True)  # Enqueuing the same key twice is a no-op
+	status = db.Column(db.String(20), nullable=False, default='queued')  # 'queued', 'running', 'done', 'failed'
+	attempts = db.Column(db.Integer, nullable=False, default=0)
+	max_attempts = db.Column(db.Integer, nullable=False, default=5)
+	run_at = db.Column(db.DateTime, nullable=False)
+	locked_by = db.Column(db.String(100))
+	locked_at = db.Column(db.DateTime)
+	last_error = db.Column(db.Text)
+	created_at = db.Column(db.DateTime, nullable=False)
+	finished_at = db.Column(db.DateTime)
+
+class RateLimitBucket(db.Model):
+	"""Token bucket state for the ``database`` rate limit backend; see app/ratelimit.py."""
+	key = db.Column(db.String(255), primary_key=True)  # '<limit>:<ip or identifier>'
+	tokens = db.Column(db.Float, nullable=False)
+	updated = db.Column(db.Float, nullable=False)  # Unix time of the last refill
+
+class ImportCheckpoint(db.Model):
+	"""How far ``flask items import`` got through a file; see app/bulk.py."""
+	name = db.Column(db.String(255), primary_key=True)  # '<table>:<file name>' unless given
+	position = db.Column(db.Integer, nullable=False)  # Records of the file already imported
+	updated_at = db.Column(db.DateTime, nullable=False)
+
+class ItemArchive(db.Model):
+	"""An Item moved out of the hot ``item`` table by app/archive.py; same id, read-only."""
+	__table_args__ = (
+		db.Index('ix_item_archive_user_id', 'user_id'),
+	)
+
+	id = db.Column(db.Integer, primary_key=True, autoincrement=False)  # The Item's id
+	title = db.Column(db.String(100), nullable=False)
+	description = db.Column(db.Text, nullable=False)
+	item_type = db.Column(db.Enum(*ITEM_TYPES, name='item_type', length=10), nullable=False)
+	contact_phone = db.Column(db.String(20), nullable=False)
+	photo_filename = db.Column(db.String(255))  # Gzipped in the archive photo directory
 	date_reported = db.Column(db.DateTime, nullable=False)
-	status = db.Column(db.String(20), default='active')  # 'active', 'resolved', etc.
+	status = db.Column(db.Enum(*ITEM_STATUSES, name='item_status', length=20))
 	user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+	archived_at = db.Column(db.DateTime, nullable=False)
+	user = db.relationship('User')
+
+class ItemStat(db.Model):
+	"""A precomputed item count, kept current by app/stats.py."""
+	dimension = db.Column(db.String(20), primary_key=True)  # 'all', 'department' or 'day'
+	bucket = db.Column(db.String(100), primary_key=True)  # '', the department, or 'YYYY-MM-DD' reported
+	item_type = db.Column(db.String(10), primary_key=True)
+	status = db.Column(db.String(20), primary_key=True)
+	count = db.Column(db.Integer, nullable=False, default=0)
@@ -0,0 +1,70 @@
+"""Outgoing email and SMS, sent from background jobs.
+
+Request handlers never talk to SMTP or Twilio directly: they queue an
+``email`` or ``sms`` job (see :mod:`app.jobs`), and a worker delivers it
+through the transport picked by ``NOTIFY_TRANSPORT``:
+
+- ``console``: print the message (default; local development);
+- ``live``: Flask-Mail for email, Twilio for SMS;
+- ``fake``: keep messages in ``transport.outbox`` (tests).
+"""
+from flask_mail import Message
+
+from . import app, mail
+from .jobs import handler
+
+try:
+    from twilio.rest import Client  # optional; only the live transport needs it
+except Exception:
+    Client = None
+
+
+class ConsoleTransport:
+    def send_email(self, to, subject, body):
+        print(f'[DEV MODE] Email to {to}: {subject}\n{body}')
+
+    def send_sms(self, to, body):
+        print(f'[DEV MODE] SMS to {to}: {body}')
+
+
+class FakeTransport:
+    """Records messages instead of sending them."""
+
+    def __init__(self):
+        self.outbox = []
+
+    def send_email(self, to, subject, body):
+        self.outbox.append({'channel': 'email', 'to': to, 'subject': subject, 'body': body})
+
+    def send_sms(self, to, body):
+        self.outbox.append({'channel': 'sms', 'to': to, 'body': body})
+
+
+class LiveTransport:
+    def send_email(self, to, subject, body):
+        mail.send(Message(subject=subject, recipients=[to], body=body))
+
+    def send_sms(self, to, body):
+        if Client is None:
+            raise RuntimeError('The twilio package is required to send SMS')
+        client = Client(app.config['TWILIO_ACCOUNT_SID'], app.config['TWILIO_AUTH_TOKEN'])
+        client.messages.create(to=to, from_=app.config['TWILIO_PHONE_NUMBER'], body=body)
+
+
+TRANSPORTS = {
+    'console': ConsoleTransport,
+    'live': LiveTransport,
+    'fake': FakeTransport,
+}
+
+transport = TRANSPORTS[app.config.get('NOTIFY_TRANSPORT', 'console')]()
+
+
+@handler('email')
+def send_email(to, subject, body):
+    transport.send_email(to, subject, body)
+
+
+@handler('sms')
+def send_sms(to, body):
+    transport.send_sms(to, body)
@@ -0,0 +1,118 @@
+"""Keyset (cursor) pagination for item lists.
+
+Rather than ``OFFSET``, each page continues from the sort key of the last
+row of the previous page, so page N costs the same as page 1 and rows
+inserted meanwhile do not shift pages. The sort key always ends with
+``Item.id`` to make it unique.
+
+Cursors are opaque, URL-safe strings holding that last sort key.
+"""
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+from .models import Item
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+# Newest first: the order of the dashboard, /search without a text query and /api/items.
+RECENT_FIRST = [(Item.date_reported, True), (Item.id, True)]
+
+
+class Page:
+    def __init__(self, items, next_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def _dump(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    return value
+
+
+def _load(value, column):
+    """``value`` as a Python value of ``column``'s type; ``ValueError`` if it is not one."""
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:  # an untyped expression, e.g. ts_rank(): a number
+        python_type = float
+    if python_type is datetime:
+        if not (isinstance(value, dict) and value.keys() == {'dt'} and isinstance(value['dt'], str)):
+            raise ValueError('Invalid cursor')
+        return datetime.fromisoformat(value['dt'])
+    allowed = (int, float) if python_type is float else (python_type,)
+    # bool is an int, and JSON allows NaN; neither can be a sort key.
+    if isinstance(value, bool) or not isinstance(value, allowed) or value != value:
+        raise ValueError('Invalid cursor')
+    return value
+
+
+def encode_cursor(values):
+    raw = json.dumps([_dump(value) for value in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, sort_keys):
+    """Inverse of :func:`encode_cursor` for ``sort_keys``; raises ``ValueError`` on garbage.
+
+    The cursor must hold one value of the right type per sort key, so a
+    crafted one cannot reach the query.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise ValueError('Invalid cursor') from e
+    if not isinstance(values, list) or len(values) != len(sort_keys):
+        raise ValueError('Invalid cursor')
+    return [_load(value, column) for value, (column, _) in zip(values, sort_keys)]
+
+
+def parse_limit(value, default=DEFAULT_LIMIT):
+    """Clamp a ``limit`` request argument to ``1..MAX_LIMIT``."""
+    try:
+        limit = int(value) if value not in (None, '') else default
+    except ValueError:
+        raise ValueError('limit must be an integer')
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def _after(sort_keys, values):
+    """WHERE clause selecting rows that sort strictly after ``values``."""
+    clauses = []
+    for i, (column, descending) in enumerate(sort_keys):
+        step = column < values[i] if descending else column > values[i]
+        ties = [sort_keys[j][0] == values[j] for j in range(i)]
+        clauses.append(and_(*ties, step))
+    return or_(*clauses)
+
+
+def paginate(query, sort_keys, limit=DEFAULT_LIMIT, cursor=None):
+    """Return one :class:`Page` of ``query`` ordered by ``sort_keys``.
+
+    ``sort_keys`` is a list of ``(column, descending)`` pairs. Selected
+    columns other than the entity (e.g. a search score) are read back from
+    the result rows to build the next cursor.
+    """
+    if cursor:
+        values = decode_cursor(cursor, sort_keys)
+        query = query.filter(_after(sort_keys, values))
+    query = query.order_by(*[column.desc() if descending else column.asc()
+                             for column, descending in sort_keys])
+    rows = query.add_columns(*[column for column, _ in sort_keys]).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][1:])
+    return Page([row[0] for row in rows], next_cursor)
@@ -0,0 +1,129 @@
+"""Password hashing with configurable cost, run outside the request thread.
+
+Hashes use ``PASSWORD_HASH_METHOD`` (any werkzeug method string, e.g.
+``pbkdf2:sha256:600000`` or ``scrypt:32768:8:1``). A stored hash made with
+other parameters still verifies, and is replaced with a new one on the
+user's next successful login, so raising the cost needs no migration.
+
+Each hash burns a CPU core for a large fraction of a second. Rather than
+on the request thread, it runs in a small process pool per web worker
+(``PASSWORD_HASH_WORKERS`` processes; 0 hashes in the calling thread), so
+a login spike cannot take more than that many cores from other requests.
+At most ``PASSWORD_HASH_MAX_PENDING`` hashes per web worker are queued or
+running; a request that cannot get a slot within ``PASSWORD_HASH_WAIT``
+seconds gets ``503`` with ``Retry-After`` instead of tying up a thread.
+"""
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+
+from werkzeug.exceptions import ServiceUnavailable
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from . import app, db
+from .metrics import Counter, Histogram
+
+HASH_SECONDS = Histogram(
+    'password_hash_seconds', 'Time to hash or check a password, including the wait for a slot.',
+    ['operation'],
+)
+HASH_REJECTED = Counter(
+    'password_hash_rejected_total', 'Password checks refused because every hashing slot was busy.'
+)
+
+RETRY_AFTER = 2  # seconds, sent with HashingBusy
+
+
+class HashingBusy(ServiceUnavailable):
+    description = 'Too many sign-ins at once. Please try again in a few seconds.'
+
+
+_lock = threading.Lock()
+_pool = None
+_slots = None
+_pid = None
+
+
+def _start_method():
+    # Pool processes only run werkzeug.security; don't fork a threaded web
+    # worker to get them.
+    methods = multiprocessing.get_all_start_methods()
+    return 'forkserver' if 'forkserver' in methods else 'spawn'
+
+
+def _executor():
+    """This process's pool and slot semaphore, created on first use.
+
+    Keyed by PID: a pool created before gunicorn forks belongs to the master.
+    """
+    global _pool, _slots, _pid
+    with _lock:
+        if _pid != os.getpid():
+            workers = app.config['PASSWORD_HASH_WORKERS']
+            _pool = None
+            if workers > 0:
+                context = multiprocessing.get_context(_start_method())
+                _pool = ProcessPoolExecutor(workers, mp_context=context)
+            _slots = threading.BoundedSemaphore(app.config['PASSWORD_HASH_MAX_PENDING'])
+            _pid = os.getpid()
+        return _pool, _slots
+
+
+def shutdown():
+    """Stop this process's pool; the next hash starts a new one from the config."""
+    global _pool, _pid
+    with _lock:
+        if _pool is not None and _pid == os.getpid():
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = _pid = None
+
+
+def _run(operation, function, *args):
+    pool, slots = _executor()
+    started = time.perf_counter()
+    if not slots.acquire(timeout=app.config['PASSWORD_HASH_WAIT']):
+        HASH_REJECTED.inc()
+        raise HashingBusy(retry_after=RETRY_AFTER)
+    try:
+        if pool is None:
+            return function(*args)
+        try:
+            return pool.submit(function, *args).result()
+        except BrokenProcessPool:
+            shutdown()  # a pool process died (e.g. OOM-killed); start afresh next time
+            raise
+    finally:
+        slots.release()
+        HASH_SECONDS.observe(time.perf_counter() - started, operation=operation)
+
+
+def hash_password(password):
+    return _run('hash', generate_password_hash, password, app.config['PASSWORD_HASH_METHOD'])
+
+
+def check_password(password_hash, password):
+    return _run('check', check_password_hash, password_hash, password)
+
+
+@lru_cache(maxsize=None)
+def _stored_method(method):
+    """``method`` as werkzeug writes it at the start of a hash, defaults filled in."""
+    return generate_password_hash('', method).split('$', 1)[0]
+
+
+def needs_rehash(password_hash):
+    return password_hash.split('$', 1)[0] != _stored_method(app.config['PASSWORD_HASH_METHOD'])
+
+
+def verify(user, password):
+    """Check ``user``'s password, upgrading an outdated hash when it matches."""
+    if not check_password(user.password_hash, password):
+        return False
+    if needs_rehash(user.password_hash):
+        user.password_hash = hash_password(password)
+        db.session.commit()
+    return True
@@ -0,0 +1,214 @@
+"""Token-bucket rate limits for the endpoints that are expensive to abuse.
+
+A limit is a bucket of ``count`` tokens refilled evenly over ``period``:
+``'5/minute'`` allows a burst of five requests and then one every 12
+seconds. Each limit has a config setting ``RATE_LIMIT_<NAME>`` (empty
+disables it) and is applied to a view with :func:`rate_limit`, keyed by
+client IP or by an identifier from the form or JSON body (campus ID,
+email, phone), so spreading attempts over addresses or over accounts
+both run out. A request over its limit gets ``429`` with ``Retry-After``.
+
+Backends (``RATE_LIMIT_BACKEND``):
+
+- ``memory``: per process, bounded (default). Each gunicorn worker
+  counts separately, so a client gets up to ``workers ×`` the limit.
+- ``database``: a ``rate_limit_bucket`` row per key in the app database,
+  updated by one atomic upsert; shared by all workers (SQLite or Postgres).
+- ``redis``: a Lua script on ``RATE_LIMIT_REDIS_URL``; shared, and the
+  cheapest shared option. Needs the ``redis`` package.
+- ``none``: no limits.
+
+Backend errors are logged and the request is let through: an outage of
+the limiter's store must not take logins down with it.
+"""
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import request
+from sqlalchemy import case
+from werkzeug.exceptions import TooManyRequests
+
+from . import app, db
+from .metrics import Counter
+from .models import RateLimitBucket
+
+RATE_LIMITED = Counter('rate_limited_total', 'Requests refused with 429, by limit.', ['limit'])
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+log = logging.getLogger(__name__)
+
+
+def parse_rate(rate):
+    """``'5/minute'``, ``'3/10 minutes'`` or ``'20/60'`` (seconds) -> ``(count, seconds)``."""
+    count, _, period = rate.partition('/')
+    period = period.strip().rstrip('s')
+    number, unit = '', period
+    while unit[:1].isdigit():
+        number, unit = number + unit[0], unit[1:]
+    unit = unit.strip()
+    if unit and unit not in PERIODS:
+        raise ValueError(f'Unknown rate limit period: {rate!r}')
+    seconds = int(number or 1) * PERIODS.get(unit, 1)
+    return int(count), seconds
+
+
+def refill(tokens, updated, now, capacity, rate):
+    return min(capacity, tokens + (now - updated) * rate)
+
+
+class MemoryBackend:
+    """Thread-safe buckets in this process; the oldest keys are dropped past ``max_keys``."""
+
+    def __init__(self, max_keys=100_000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, rate, now):
+        """Take a token; return 0 if allowed, else seconds until one is available."""
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = refill(tokens, updated, now, capacity, rate)
+            wait = 0.0 if tokens >= 1 else (1 - tokens) / rate
+            self._buckets[key] = (tokens - 1 if not wait else tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return wait
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class DatabaseBackend:
+    """Buckets in the ``rate_limit_bucket`` table, shared by every worker."""
+
+    def take(self, key, capacity, rate, now):
+        table = RateLimitBucket.__table__
+        if db.engine.dialect.name == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        refilled = table.c.tokens + (now - table.c.updated) * rate
+        refilled = case((refilled > capacity, capacity), else_=refilled)
+        statement = insert(table).values(key=key, tokens=capacity - 1, updated=now)
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.key],
+            set_={'tokens': refilled - 1, 'updated': now},
+            where=refilled >= 1,
+        ).returning(table.c.tokens)
+        # Its own transaction: the request's session may roll back or never commit.
+        with db.engine.begin() as connection:
+            if connection.execute(statement).first() is not None:
+                return 0.0
+            tokens, updated = connection.execute(
+                db.select(table.c.tokens, table.c.updated).where(table.c.key == key)
+            ).one()
+        return (1 - refill(tokens, updated, now, capacity, rate)) / rate
+
+    def clear(self):
+        with db.engine.begin() as connection:
+            connection.execute(db.delete(RateLimitBucket))
+
+
+class RedisBackend:
+    """Buckets as Redis hashes, updated atomically by a Lua script."""
+
+    SCRIPT = """
+    local capacity, rate, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+    local tokens = tonumber(state[1]) or capacity
+    local updated = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + (now - updated) * rate)
+    local wait = 0
+    if tokens >= 1 then tokens = tokens - 1 else wait = (1 - tokens) / rate end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+    redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000))
+    return tostring(wait)
+    """
+
+    def __init__(self, url, prefix='lostfound:ratelimit:'):
+        import redis  # optional dependency, only needed for this backend
+        self._client = redis.Redis.from_url(url)
+        self._script = self._client.register_script(self.SCRIPT)
+        self._prefix = prefix
+
+    def take(self, key, capacity, rate, now):
+        return float(self._script(keys=[self._prefix + key], args=[capacity, rate, now]))
+
+    def clear(self):
+        for key in self._client.scan_iter(self._prefix + '*'):
+            self._client.delete(key)
+
+
+class NullBackend:
+    def take(self, key, capacity, rate, now):
+        return 0.0
+
+    def clear(self):
+        pass
+
+
+def create_backend(config):
+    name = config.get('RATE_LIMIT_BACKEND', 'memory')
+    if name == 'redis':
+        return RedisBackend(config['RATE_LIMIT_REDIS_URL'])
+    if name == 'database':
+        return DatabaseBackend()
+    if name == 'none':
+        return NullBackend()
+    return MemoryBackend()
+
+
+backend = create_backend(app.config)
+
+
+def client_ip():
+    # remote_addr is the proxy's address unless the app is wrapped in
+    # werkzeug's ProxyFix; see DEPLOYMENT.md.
+    return request.remote_addr or 'unknown'
+
+
+def field(name):
+    """Key function: a form, query string or JSON field, normalized, e.g. ``field('phone')``."""
+    def key():
+        value = request.values.get(name)
+        if value is None:
+            data = request.get_json(silent=True)
+            value = data.get(name) if isinstance(data, dict) else None
+        return str(value).strip().lower() if value else None
+    return key
+
+
+def check(name, key):
+    """Take a token from limit ``name`` for ``key``; raise ``TooManyRequests`` if empty."""
+    rate = app.config.get(f'RATE_LIMIT_{name.upper()}')
+    if not rate or key is None:
+        return
+    capacity, period = parse_rate(rate)
+    try:
+        wait = backend.take(f'{name}:{key}', capacity, capacity / period, time.time())
+    except Exception:
+        log.exception('Rate limit backend failed; allowing the request')
+        return
+    if wait > 0:
+        RATE_LIMITED.inc(limit=name)
+        raise TooManyRequests(retry_after=max(1, math.ceil(wait)))
+
+
+def rate_limit(name, key=client_ip, methods=('POST',)):
+    """Apply limit ``name`` (config ``RATE_LIMIT_<NAME>``) to ``methods`` of a view."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method in methods:
+                check(name, key())
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -1,7 +1,18 @@
 from . import app, db
-from flask import render_template, request, redirect, url_for, flash
+from flask import render_template, request, redirect, url_for, flash, abort, make_response, send_file
 from flask_login import login_user, logout_user, login_required, current_user
-from .models import Item
+from .models import Item, ItemArchive, User
+from .search import search_items
+from .images import submit_item_photo
+from .storage import store_upload
+from .archive import open_photo
+from .assets import IMMUTABLE_MAX_AGE
+from .cache import cache_page, get_or_set
+from .conditional import conditional, item_validator
+from .matching import find_matches, queue_match_notification
+from .metrics import render as render_metrics
+from .ratelimit import field, rate_limit
+from .pagination import RECENT_FIRST, Page, paginate, parse_limit
 from .auth import (
     register_user,
     verify_user,
@@ -12,13 +23,20 @@ from .auth import (
     update_user_password,
 )
 from datetime import datetime
-import os
+from types import SimpleNamespace
+import gzip
+import mimetypes
+from sqlalchemy.orm import joinedload
+from werkzeug.exceptions import RequestEntityTooLarge, UnsupportedMediaType
 from werkzeug.utils import secure_filename
-import uuid
 
 # Photo upload configuration
+# (size limit and content sniffing: MAX_UPLOAD_SIZE and app/storage.py)
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
-MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
+
+# Item cards show the reporter's name and department; load them in the same
+# SELECT instead of one lazy query per card.
+WITH_REPORTER = joinedload(Item.user).load_only(User.name, User.department)
 
 def allowed_file(filename):
     return '.' in filename and \
@@ -28,23 +46,70 @@ def save_uploaded_photo(photo):
     """Save uploaded photo and return filename"""
     if photo and photo.filename != '':
         if allowed_file(photo.filename):
-            # Create unique filename
-            file_ext = photo.filename.rsplit('.', 1)[1].lower()
-            unique_filename = f"{uuid.uuid4().hex}.{file_ext}"
-            
-            # Create uploads directory if it doesn't exist
-            upload_dir = os.path.join(app.root_path, 'static', 'uploads')
-            os.makedirs(upload_dir, exist_ok=True)
-            
-            # Save file
-            file_path = os.path.join(upload_dir, unique_filename)
-            photo.save(file_path)
-            
-            return unique_filename
+            # Content-addressed: identical photos share one file
+            return store_upload(photo)
     return None
 
+def snapshot_item(item):
+    """Detached, picklable copy of the fields item cards and the item feed use."""
+    user = None
+    if item.user:
+        user = SimpleNamespace(name=item.user.name, department=item.user.department)
+    return SimpleNamespace(
+        id=item.id,
+        title=item.title,
+        description=item.description,
+        item_type=item.item_type,
+        status=item.status,
+        date_reported=item.date_reported,
+        photo_filename=item.photo_filename,
+        photo_variants=item.photo_variants,
+        user_id=item.user_id,
+        user=user,
+    )
+
+def render_item_page(template, query, sort_keys, cache_name=None):
+    """Render one keyset page of items.
+
+    With ``?partial=1`` only the item cards are returned (for "load more"),
+    with the following page's cursor in the ``X-Next-Cursor`` header.
+    With ``cache_name`` the page's rows are cached until items or reporters change.
+    """
+    try:
+        limit = parse_limit(request.args.get('limit'))
+        cursor = request.args.get('cursor')
+
+        def load_page():
+            return paginate(query, sort_keys, limit=limit, cursor=cursor)
+
+        if cache_name:
+            def load_snapshot():
+                page = load_page()
+                return Page([snapshot_item(item) for item in page], page.next_cursor)
+            page = get_or_set('query', (cache_name, limit, cursor), load_snapshot,
+                              tables=('item', 'profiles'))
+        else:
+            page = load_page()
+    except ValueError:
+        abort(400)
+
+    next_url = None
+    if page.next_cursor:
+        args = request.args.to_dict()
+        args.pop('partial', None)
+        args['cursor'] = page.next_cursor
+        next_url = url_for(request.endpoint, **args)
+
+    if request.args.get('partial'):
+        response = make_response(render_template('_item_cards.html', items=page))
+        if next_url:
+            response.headers['X-Next-Cursor'] = page.next_cursor
+        return response
+    return render_template(template, items=page, next_url=next_url)
+
 # Landing page: accessible to both authenticated and non-authenticated users
 @app.route('/')
+@cache_page()
 def index():
     return render_template('index.html')
 
@@ -80,6 +145,8 @@ def register():
 
 # Login route
 @app.route('/login', methods=['GET', 'POST'])
+@rate_limit('login_ip')
+@rate_limit('login_account', key=field('campus_id'))
 def login():
     if request.method == 'POST':
         campus_id = request.form['campus_id']
@@ -105,8 +172,8 @@ def logout():
 @app.route('/dashboard')
 @login_required
 def dashboard():
-    recent_items = Item.query.order_by(Item.date_reported.desc()).limit(10).all()
-    return render_template('dashboard.html', items=recent_items)
+    return render_item_page('dashboard.html', Item.query.options(WITH_REPORTER), RECENT_FIRST,
+                            cache_name='dashboard')
 
 # Report lost item
 @app.route('/report_lost', methods=['GET', 'POST'])
@@ -127,6 +194,8 @@ def report_lost():
                     if not photo_filename:
                         flash('Invalid file type. Please upload PNG, JPG, JPEG, or GIF files only.', 'error')
                         return render_template('report_lost.html')
+                except (RequestEntityTooLarge, UnsupportedMediaType):
+                    raise  # flashed by upload_rejected
                 except Exception as e:
                     flash('Error uploading photo. Please try again.', 'error')
                     return render_template('report_lost.html')
@@ -144,7 +213,16 @@ def report_lost():
         
         try:
             db.session.add(item)
+            db.session.flush()
+            # Side effects are queued in the same transaction as the item
+            if photo_filename:
+                submit_item_photo(item.id)
+            queue_match_notification(item)
             db.session.commit()
+            matches = find_matches(item)
+            if matches:
+                flash(f'Lost item reported successfully! {len(matches)} possible match(es) are listed below.', 'success')
+                return redirect(url_for('item_details', item_id=item.id))
             flash('Lost item reported successfully!', 'success')
             return redirect(url_for('dashboard'))
         except Exception as e:
@@ -172,6 +250,8 @@ def report_found():
                     if not photo_filename:
                         flash('Invalid file type. Please upload PNG, JPG, JPEG, or GIF files only.', 'error')
                         return render_template('report_found.html')
+                except (RequestEntityTooLarge, UnsupportedMediaType):
+                    raise  # flashed by upload_rejected
                 except Exception as e:
                     flash('Error uploading photo. Please try again.', 'error')
                     return render_template('report_found.html')
@@ -189,7 +269,16 @@ def report_found():
         
         try:
             db.session.add(item)
+            db.session.flush()
+            # Side effects are queued in the same transaction as the item
+            if photo_filename:
+                submit_item_photo(item.id)
+            queue_match_notification(item)
             db.session.commit()
+            matches = find_matches(item)
+            if matches:
+                flash(f'Found item reported successfully! {len(matches)} possible match(es) are listed below.', 'success')
+                return redirect(url_for('item_details', item_id=item.id))
             flash('Found item reported successfully!', 'success')
             return redirect(url_for('dashboard'))
         except Exception as e:
@@ -200,23 +289,42 @@ def report_found():
 
 # Item details page
 @app.route('/item/<int:item_id>')
+@conditional(item_validator)
+@cache_page('item', 'profiles')
 def item_details(item_id):
-    item = Item.query.get_or_404(item_id)
+    item = db.session.get(Item, item_id, options=[joinedload(Item.user)])
+    if item is None:
+        # Old items live on in the archive under the same id
+        item = ItemArchive.query.options(joinedload(ItemArchive.user)).filter_by(id=item_id).first_or_404()
     return render_template('item_details.html', item=item)
 
+# Photos of archived items, gzipped in cold storage (see app/archive.py)
+@app.route('/archive/photos/<filename>')
+def archived_photo(filename):
+    found = open_photo(secure_filename(filename))
+    if found is None:
+        abort(404)
+    path, gzipped = found
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    if not gzipped:
+        response = send_file(path, mimetype=mimetype, max_age=IMMUTABLE_MAX_AGE)
+    elif request.accept_encodings['gzip']:
+        response = send_file(path, mimetype=mimetype, max_age=IMMUTABLE_MAX_AGE)
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response = send_file(gzip.open(path), mimetype=mimetype, max_age=IMMUTABLE_MAX_AGE)
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
 # Search functionality for dashboard
 @app.route('/search')
+@rate_limit('search_ip', methods=('GET',))
 def search():
     query = request.args.get('search', '')
     item_type = request.args.get('type', '')
     status = request.args.get('status', '')
     
-    items_query = Item.query
-    
-    if query:
-        items_query = items_query.filter(
-            Item.title.contains(query) | Item.description.contains(query)
-        )
+    items_query = Item.query.options(WITH_REPORTER)
     
     if item_type and item_type != 'all':
         items_query = items_query.filter(Item.item_type == item_type)
@@ -224,23 +332,40 @@ def search():
     if status and status != 'all':
         items_query = items_query.filter(Item.status == status)
     
-    items = items_query.order_by(Item.date_reported.desc()).all()
+    sort_keys = RECENT_FIRST
+    if query:
+        items_query, sort_keys = search_items(items_query, query)
     
     if current_user.is_authenticated:
-        return render_template('dashboard.html', items=items)
+        return render_item_page('dashboard.html', items_query, sort_keys)
     else:
-        return render_template('index.html', items=items)
+        return render_item_page('index.html', items_query, sort_keys)
 
 @app.route('/about')
+@cache_page()
 def about():
     """About page showcasing the development team"""
     return render_template('about.html')
 
+# Uploads rejected while streaming in (too large, not an image): back to the form
+@app.errorhandler(RequestEntityTooLarge)
+@app.errorhandler(UnsupportedMediaType)
+def upload_rejected(e):
+    if request.endpoint in ('report_lost', 'report_found'):
+        flash(e.description, 'error')
+        return redirect(url_for(request.endpoint))
+    return e
+
 # Favicon route (to prevent 404 errors)
 @app.route('/favicon.ico')
 def favicon():
     return '', 204
 
+# Prometheus metrics for this worker process
+@app.route('/metrics')
+def prometheus_metrics():
+    return render_metrics(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
 # Email verification routes
 @app.route('/verify-email', methods=['GET', 'POST'])
 def verify_email():
@@ -259,6 +384,8 @@ def resend_email():
 
 # Password reset via Phone OTP
 @app.route('/forgot-password', methods=['GET', 'POST'])
+@rate_limit('otp_ip')
+@rate_limit('otp_phone', key=field('phone'))
 def forgot_password():
     if request.method == 'POST':
         phone = request.form.get('phone')
@@ -274,6 +401,7 @@ def forgot_password():
 
 
 @app.route('/verify-reset-code', methods=['GET', 'POST'])
+@rate_limit('otp_verify', key=field('phone'))
 def verify_reset_code():
     phone = request.args.get('phone') or request.form.get('phone')
     if request.method == 'POST':
@@ -0,0 +1,197 @@
+"""Full-text search over item titles and descriptions.
+
+Each backend narrows an ``Item`` query to the rows matching a free-text
+search and returns the sort key that ranks them by relevance, for
+:func:`app.pagination.paginate`:
+
+- ``sqlite``: an FTS5 external-content table (``item_fts``) kept in sync with
+  ``item`` by triggers, ranked with ``bm25``.
+- ``postgresql``: a GIN expression index over ``to_tsvector``, ranked with
+  ``ts_rank``. The index is maintained by Postgres itself.
+- ``like``: the old ``LIKE '%q%'`` scan, used for other databases or when the
+  index has not been created yet.
+
+``SEARCH_BACKEND`` in the config forces a backend; ``auto`` picks one from
+the database dialect.
+"""
+import re
+
+from sqlalchemy import event, inspect, literal_column, text
+
+from . import app, db
+from .models import Item
+from .pagination import RECENT_FIRST
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS item_fts USING fts5("
+    "title, description, content='item', content_rowid='id', "
+    "tokenize='porter unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS item_fts_ai AFTER INSERT ON item BEGIN "
+    "INSERT INTO item_fts(rowid, title, description) "
+    "VALUES (new.id, new.title, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS item_fts_ad AFTER DELETE ON item BEGIN "
+    "INSERT INTO item_fts(item_fts, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS item_fts_au AFTER UPDATE OF title, description ON item BEGIN "
+    "INSERT INTO item_fts(item_fts, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); "
+    "INSERT INTO item_fts(rowid, title, description) "
+    "VALUES (new.id, new.title, new.description); END",
+]
+
+# Must match the indexed expression character for character, otherwise the
+# planner will not use ix_item_search.
+POSTGRES_DOCUMENT = (
+    "to_tsvector('english', coalesce(item.title, '') || ' ' || coalesce(item.description, ''))"
+)
+POSTGRES_DDL = [
+    f"CREATE INDEX IF NOT EXISTS ix_item_search ON item USING gin ({POSTGRES_DOCUMENT})",
+]
+
+# Created by the DDL above rather than the models (FTS5 adds the shadow
+# tables itself); migrations/env.py keeps autogenerate away from them.
+SEARCH_OBJECTS = frozenset({
+    'item_fts', 'item_fts_config', 'item_fts_data', 'item_fts_idx', 'item_fts_docsize',
+    'ix_item_search',
+})
+
+
+def tokenize(query):
+    """Split a user query into lowercase word tokens (punctuation dropped)."""
+    return TOKEN_RE.findall(query.lower())
+
+
+def matches(terms, words):
+    """Whether an item whose title and description tokenize to ``words`` has ``terms``.
+
+    Checked in Python, for items not worth a query (app/feed.py): every
+    term must be one of the words, the last possibly a prefix of one, as in
+    the full-text backends. ``terms`` is a non-empty ``tokenize`` result.
+    """
+    return (all(term in words for term in terms[:-1])
+            and any(word.startswith(terms[-1]) for word in words))
+
+
+class LikeSearch:
+    name = 'like'
+    ddl = []
+
+    def is_installed(self, connection):
+        return True
+
+    def rebuild(self, connection):
+        pass
+
+    def apply(self, query, search_text):
+        query = query.filter(
+            Item.title.contains(search_text) | Item.description.contains(search_text)
+        )
+        return query, RECENT_FIRST
+
+
+class SqliteSearch:
+    name = 'sqlite'
+    ddl = SQLITE_DDL
+
+    def is_installed(self, connection):
+        return inspect(connection).has_table('item_fts')
+
+    def rebuild(self, connection):
+        connection.execute(text("INSERT INTO item_fts(item_fts) VALUES ('rebuild')"))
+
+    def apply(self, query, search_text):
+        terms = tokenize(search_text)
+        if not terms:
+            return LikeSearch().apply(query, search_text)
+        # Every term must match; the last one as a prefix so partial words
+        # typed into the search box still find something.
+        match = ' '.join(f'"{term}"' for term in terms[:-1])
+        match = f'{match} "{terms[-1]}"*'.strip()
+        hits = (
+            text(
+                "SELECT rowid AS item_id, bm25(item_fts, 10.0, 1.0) AS score "
+                "FROM item_fts WHERE item_fts MATCH :match"
+            )
+            .bindparams(match=match)
+            .columns(item_id=db.Integer, score=db.Float)
+            .subquery('fts')
+        )
+        # bm25() is "lower is better".
+        return query.join(hits, hits.c.item_id == Item.id), [(hits.c.score, False)] + RECENT_FIRST
+
+
+class PostgresSearch:
+    name = 'postgresql'
+    ddl = POSTGRES_DDL
+
+    def is_installed(self, connection):
+        indexes = inspect(connection).get_indexes('item')
+        return any(index['name'] == 'ix_item_search' for index in indexes)
+
+    def rebuild(self, connection):
+        connection.execute(text('REINDEX INDEX ix_item_search'))
+
+    def apply(self, query, search_text):
+        terms = tokenize(search_text)
+        if not terms:
+            return LikeSearch().apply(query, search_text)
+        document = literal_column(POSTGRES_DOCUMENT)
+        tsquery = db.func.to_tsquery(
+            literal_column("'english'"), ' & '.join(f'{term}:*' for term in terms)
+        )
+        score = db.func.ts_rank(document, tsquery)
+        return query.filter(document.op('@@')(tsquery)), [(score, True)] + RECENT_FIRST
+
+
+BACKENDS = {backend.name: backend for backend in (LikeSearch(), SqliteSearch(), PostgresSearch())}
+
+# Resolved lazily per process: checking for the index on every search would
+# cost an extra query.
+_active_backend = None
+
+
+def backend_for(connection):
+    """Return the backend that fits ``connection``'s dialect and the config."""
+    name = app.config.get('SEARCH_BACKEND', 'auto')
+    if name == 'auto':
+        name = connection.dialect.name
+    return BACKENDS.get(name, BACKENDS['like'])
+
+
+def get_backend():
+    global _active_backend
+    if _active_backend is None:
+        with db.engine.connect() as connection:
+            backend = backend_for(connection)
+            if not backend.is_installed(connection):
+                app.logger.warning(
+                    'Search index for %s is missing; falling back to LIKE. '
+                    'Run "flask db upgrade" to create it.', backend.name
+                )
+                backend = BACKENDS['like']
+        _active_backend = backend
+    return _active_backend
+
+
+def search_items(query, search_text):
+    """Restrict ``query`` to items matching ``search_text``.
+
+    Returns ``(query, sort_keys)``; the sort keys put the best match first.
+    """
+    return get_backend().apply(query, search_text)
+
+
+def install(connection):
+    """Create the search index for ``connection`` and backfill it."""
+    backend = backend_for(connection)
+    for statement in backend.ddl:
+        connection.execute(text(statement))
+    backend.rebuild(connection)
+
+
+@event.listens_for(Item.__table__, 'after_create')
+def _install_after_create(target, connection, **kw):
+    # Keeps ``db.create_all()`` (init_db.py, deploy.sh) on par with migrations.
+    install(connection)
@@ -0,0 +1,218 @@
+"""Precomputed item counts for the dashboard hero and ``/api/stats``.
+
+``item_stat`` holds one counter per (dimension, bucket, item type, status):
+
+- ``all``: the totals, bucket ``''``;
+- ``department``: the reporter's department;
+- ``day``: the day the item was reported, ``YYYY-MM-DD``;
+- ``archived``: the part of the totals that is in ``item_archive``, bucket
+  ``''``. Lists only show the hot table, so the dashboard's open counts
+  leave these out.
+
+The first three cover archived items too, so archiving an item only adds
+to ``archived``. They change in the transaction that changes the items:
+
+- ORM flushes (the report forms and API, status changes, deletes) through
+  a ``before_flush`` hook;
+- bulk imports and the archive job, which skip the unit of work, call
+  :func:`add` themselves.
+
+Each change is an atomic ``count = count + delta`` upsert, so concurrent
+writers never lose an update. Anything that bypasses both, and reporters
+changing department, is caught by the ``reconcile_stats`` job (every
+``STATS_RECONCILE_INTERVAL`` seconds, or ``flask items stats --reconcile``),
+which recounts from the item tables and fixes the counters that drifted.
+
+Reads are primary-key lookups of at most a few rows per department and
+day shown, never an aggregate over ``item``, and are cached until a
+counter changes.
+"""
+from collections import Counter
+from datetime import date, timedelta
+
+from sqlalchemy import event
+
+from . import app, db
+from .cache import get_or_set
+from .jobs import handler, periodic
+from .models import ITEM_STATUSES, ITEM_TYPES, Item, ItemArchive, ItemStat, User
+
+DEFAULT_DAYS = 7
+MAX_DAYS = 365
+# Item attributes the counters depend on
+COUNTED = ('item_type', 'status', 'date_reported', 'user_id')
+
+
+def counter_keys(item_type, status, department, reported):
+    """The counters an item with these values adds to."""
+    status = status or 'active'  # The column default, not yet applied to pending items
+    return [
+        ('all', '', item_type, status),
+        ('department', department, item_type, status),
+        ('day', reported.date().isoformat(), item_type, status),
+    ]
+
+
+def archived_key(item_type, status):
+    """The counter an archived item with these values adds to."""
+    return ('archived', '', item_type, status or 'active')
+
+
+def _insert():
+    if db.session.get_bind().dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(ItemStat.__table__)
+
+
+def _write(session, counts, increment):
+    table = ItemStat.__table__
+    statement = _insert()
+    value = table.c.count + statement.excluded.count if increment else statement.excluded.count
+    statement = statement.on_conflict_do_update(index_elements=list(table.primary_key),
+                                                set_={'count': value})
+    # Sorted, so concurrent transactions lock the counter rows in the same order.
+    rows = [dict(dimension=key[0], bucket=key[1], item_type=key[2], status=key[3], count=count)
+            for key, count in sorted(counts.items())]
+    if rows:
+        session.execute(statement, rows)
+
+
+def add(session, deltas):
+    """Add ``deltas`` (counter key -> change) to the counters in ``session``'s transaction."""
+    _write(session, {key: delta for key, delta in deltas.items() if delta}, increment=True)
+
+
+def _department(session, item):
+    user = session.get(User, item.user_id) if item.user_id is not None else item.user
+    return user.department if user is not None else None
+
+
+def _stored_keys(session, item_id):
+    # The row as the database has it: the old values may not be loaded.
+    row = session.execute(
+        db.select(Item.item_type, Item.status, User.department, Item.date_reported)
+        .join(Item.user).where(Item.id == item_id)
+    ).one_or_none()
+    return counter_keys(*row) if row is not None else []
+
+
+@event.listens_for(db.session, 'before_flush')
+def _count_items(session, flush_context, instances):
+    deltas = Counter()
+    with session.no_autoflush:
+        for obj in session.new:
+            if isinstance(obj, Item) and obj.date_reported is not None:
+                department = _department(session, obj)
+                if department is not None:
+                    deltas.update(counter_keys(obj.item_type, obj.status, department, obj.date_reported))
+        for obj in session.deleted:
+            if isinstance(obj, Item):
+                deltas.subtract(_stored_keys(session, obj.id))
+        for obj in session.dirty:
+            if not isinstance(obj, Item):
+                continue
+            attrs = db.inspect(obj).attrs
+            if not any(attrs[name].history.has_changes() for name in COUNTED):
+                continue
+            deltas.subtract(_stored_keys(session, obj.id))
+            deltas.update(counter_keys(obj.item_type, obj.status, _department(session, obj),
+                                       obj.date_reported))
+    if any(deltas.values()):
+        add(session, deltas)
+
+
+def _day(column):
+    if db.session.get_bind().dialect.name == 'postgresql':
+        return db.cast(db.cast(column, db.Date), db.String)
+    return db.func.date(column)
+
+
+def recount():
+    """Every counter's true value (counter key -> count), from ``item`` and ``item_archive``."""
+    counts = Counter()
+    for model in (Item, ItemArchive):
+        status = db.func.coalesce(model.status, 'active')
+        for dimension, bucket in (('all', None), ('department', User.department),
+                                  ('day', _day(model.date_reported))):
+            columns = [model.item_type, status] + ([bucket] if bucket is not None else [])
+            query = db.select(*columns, db.func.count()).group_by(*columns)
+            if dimension == 'department':
+                query = query.join(User, User.id == model.user_id)
+            for row in db.session.execute(query):
+                item_type, item_status, *rest, count = row
+                counts[(dimension, rest[0] if rest else '', item_type, item_status)] += count
+                if model is ItemArchive and dimension == 'all':
+                    counts[archived_key(item_type, item_status)] += count
+    return counts
+
+
+@handler('reconcile_stats')
+def reconcile_stats():
+    """Recount the counters and fix the ones that drifted; return how many were fixed."""
+    if db.session.get_bind().dialect.name == 'postgresql':
+        # Writers wait at their counter upsert until the recount is stored;
+        # one already past it holds a row lock, so we wait for its commit.
+        db.session.execute(db.text('LOCK TABLE item_stat IN EXCLUSIVE MODE'))
+    else:
+        # Take SQLite's write lock before reading, for the same reason.
+        db.session.execute(db.update(ItemStat).where(db.false()).values(count=ItemStat.count))
+    actual = recount()
+    stored = {tuple(row[:4]): row[4] for row in db.session.execute(
+        db.select(ItemStat.dimension, ItemStat.bucket, ItemStat.item_type, ItemStat.status, ItemStat.count)
+    )}
+    drifted = {key: actual.get(key, 0) for key in stored.keys() | actual.keys()
+               if stored.get(key, 0) != actual.get(key, 0)}
+    _write(db.session, drifted, increment=False)
+    db.session.commit()
+    if drifted:
+        app.logger.warning('Reconciled %s item counters that had drifted', len(drifted))
+    return len(drifted)
+
+
+periodic('reconcile_stats', 'STATS_RECONCILE_INTERVAL')
+
+
+def _by_type(rows):
+    counts = {item_type: dict.fromkeys(ITEM_STATUSES, 0) for item_type in ITEM_TYPES}
+    for stat in rows:
+        counts[stat.item_type][stat.status] = stat.count
+    return counts
+
+
+def summary(days=DEFAULT_DAYS, today=None):
+    """Totals, archived items, per-department and per-day counts for the last ``days`` days.
+
+    Days are oldest first. Each count is ``{item_type: {status: count}}``.
+    """
+    today = today or date.today()
+
+    def load():
+        first = (today - timedelta(days=days - 1)).isoformat()
+        rows = ItemStat.query.filter(
+            db.or_(ItemStat.dimension.in_(('all', 'archived', 'department')),
+                   db.and_(ItemStat.dimension == 'day', ItemStat.bucket >= first))
+        ).all()
+        grouped = {}
+        for stat in rows:
+            grouped.setdefault((stat.dimension, stat.bucket), []).append(stat)
+        per_day = []
+        for offset in range(days - 1, -1, -1):
+            day = (today - timedelta(days=offset)).isoformat()
+            counts = _by_type(grouped.get(('day', day), ()))
+            per_day.append(dict(counts, date=day, total=sum(sum(s.values()) for s in counts.values())))
+        return {
+            'totals': _by_type(grouped.get(('all', ''), ())),
+            'archived': _by_type(grouped.get(('archived', ''), ())),
+            'departments': {bucket: _by_type(stats) for (dimension, bucket), stats in sorted(grouped.items())
+                            if dimension == 'department'},
+            'days': per_day,
+        }
+
+    return get_or_set('query', ('stats', days, today), load, tables=('item_stat',))
+
+
+@app.template_global()
+def item_stats(days=DEFAULT_DAYS):
+    return summary(days)
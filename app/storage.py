@@ -0,0 +1,305 @@
+"""Content-addressed store for uploaded photos.
+
+Uploads are named after the SHA-256 of their bytes (``<sha256>.<ext>``), so
+the same photo uploaded twice is stored once and its URL never changes
+meaning. The upload is hashed while it is streamed to disk rather than
+read into memory first.
+
+Form uploads never pass through memory or a second temporary file: the
+app's request class has the multipart parser write each file part into
+an :class:`UploadSink` in the upload directory, which hashes it, checks
+its magic bytes and enforces ``MAX_UPLOAD_SIZE`` as the bytes arrive.
+
+A :class:`~app.models.Blob` row per file counts the Items pointing at it.
+The counts are maintained in a ``before_flush`` hook, so every code path
+that adds, re-points or deletes an Item keeps them right. Files that end
+up unreferenced (for instance because the Item insert after the upload
+failed) are removed by ``flask uploads gc``.
+"""
+import hashlib
+import os
+import re
+import tempfile
+from collections import Counter
+from datetime import datetime
+
+from flask import Request
+from sqlalchemy import case, event
+from werkzeug.exceptions import RequestEntityTooLarge, UnsupportedMediaType
+
+from . import app, db
+from .models import Blob, Item, ItemArchive
+
+CHUNK_SIZE = 64 * 1024
+
+BLOB_NAME_RE = re.compile(r'^[0-9a-f]{64}\.[a-z0-9]+$')
+
+# Extensions that mean the same format are stored under one spelling.
+CANONICAL_EXTENSIONS = {'jpeg': 'jpg'}
+
+# Leading bytes of the image formats accepted for photos, and their extension
+SIGNATURES = [
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+]
+SNIFF_BYTES = max(len(signature) for signature, _ in SIGNATURES)
+
+
+def upload_dir():
+    return os.path.join(app.root_path, 'static', 'uploads')
+
+
+def is_blob_name(filename):
+    return bool(filename) and BLOB_NAME_RE.match(filename) is not None
+
+
+def canonical_extension(ext):
+    ext = ext.lower()
+    return CANONICAL_EXTENSIONS.get(ext, ext)
+
+
+def sniff_image(head):
+    """Extension of the image format ``head`` starts with, or ``None``."""
+    for signature, ext in SIGNATURES:
+        if head.startswith(signature):
+            return ext
+    return None
+
+
+def _place(temp_path, digest, ext):
+    """Rename a hashed temporary file to its store name, or drop it if already stored."""
+    filename = f'{digest}.{canonical_extension(ext)}'
+    final_path = os.path.join(upload_dir(), filename)
+    if os.path.exists(final_path):
+        os.remove(temp_path)
+    else:
+        os.replace(temp_path, final_path)
+    return filename
+
+
+def store_stream(stream, ext):
+    """Copy ``stream`` into the store and return its ``<sha256>.<ext>`` name.
+
+    The bytes go to a temporary file in the upload directory while being
+    hashed, then the file is renamed into place, or dropped if that content
+    is already stored.
+    """
+    directory = upload_dir()
+    os.makedirs(directory, exist_ok=True)
+    digest = hashlib.sha256()
+
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.upload-')
+    try:
+        with os.fdopen(fd, 'wb') as temp_file:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                temp_file.write(chunk)
+
+        return _place(temp_path, digest.hexdigest(), ext)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def store_file(path):
+    """Store a file that is already on disk (used when migrating old uploads)."""
+    with open(path, 'rb') as source:
+        return store_stream(source, path.rsplit('.', 1)[1])
+
+
+class UploadSink:
+    """Where the multipart parser writes one uploaded file, as it arrives.
+
+    Memory stays at one parser chunk whatever the file size. A file whose
+    first bytes are not a PNG, JPEG or GIF (415), or that grows past
+    ``max_size`` (413), aborts the request before the rest of the body is
+    read. :meth:`commit` moves the file into the store; an uncommitted file
+    is deleted when the request closes it.
+    """
+
+    def __init__(self, max_size):
+        directory = upload_dir()
+        os.makedirs(directory, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(dir=directory, prefix='.upload-')
+        self._file = os.fdopen(fd, 'w+b')
+        self._digest = hashlib.sha256()
+        self._head = b''
+        self.max_size = max_size
+        self.size = 0
+        self.ext = None
+
+    def write(self, data):
+        self.size += len(data)
+        if self.size > self.max_size:
+            self.close()
+            raise RequestEntityTooLarge(f'Photos can be at most {self.max_size // (1024 * 1024)} MB.')
+        if len(self._head) < SNIFF_BYTES:
+            self._head += data[:SNIFF_BYTES - len(self._head)]
+            if len(self._head) == SNIFF_BYTES:
+                self.ext = sniff_image(self._head)
+                if self.ext is None:
+                    self.close()
+                    raise UnsupportedMediaType('Please upload a PNG, JPG or GIF image.')
+        self._digest.update(data)
+        return self._file.write(data)
+
+    def commit(self):
+        """Store the upload; return its ``<sha256>.<ext>`` name, or ``None`` if it is no image."""
+        self.ext = self.ext or sniff_image(self._head)
+        if self.ext is None or self.path is None:
+            self.close()
+            return None
+        self._file.close()
+        filename = _place(self.path, self._digest.hexdigest(), self.ext)
+        self.path = None
+        return filename
+
+    def close(self):
+        self._file.close()
+        if self.path is not None and os.path.exists(self.path):
+            os.remove(self.path)
+        self.path = None
+
+    def __getattr__(self, name):
+        # read/seek/tell/... for werkzeug's FileStorage
+        return getattr(self._file, name)
+
+
+class UploadRequest(Request):
+    def _get_file_stream(self, total_content_length, content_type, filename=None,
+                         content_length=None):
+        if not filename:  # a file input left empty
+            return super()._get_file_stream(total_content_length, content_type, filename,
+                                            content_length)
+        return UploadSink(app.config['MAX_UPLOAD_SIZE'])
+
+
+app.request_class = UploadRequest
+
+
+def store_upload(upload):
+    """Store a werkzeug ``FileStorage``; return its name, or ``None`` if it is no image.
+
+    Uploads not parsed by :class:`UploadRequest` are copied through an
+    :class:`UploadSink`, so they get the same checks.
+    """
+    if isinstance(upload.stream, UploadSink):
+        return upload.stream.commit()
+    sink = UploadSink(app.config['MAX_UPLOAD_SIZE'])
+    try:
+        while True:
+            chunk = upload.stream.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            sink.write(chunk)
+        return sink.commit()
+    finally:
+        sink.close()
+
+
+def adjust_refs(session, deltas):
+    """Add ``{filename: delta}`` to the blobs' reference counts in ``session``'s transaction.
+
+    Called for ORM flushes below, and by bulk loaders that insert Items
+    without the ORM (see app/bulk.py).
+    """
+    # Requests storing the same photo at once race to create its Blob row, and
+    # to bump its count: insert with ON CONFLICT DO NOTHING, and increment in SQL.
+    if session.get_bind().dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    with session.no_autoflush:
+        for filename, delta in deltas.items():
+            if not delta or not is_blob_name(filename):
+                continue
+            sha256 = filename.split('.', 1)[0]
+            blob = session.get(Blob, sha256)
+            if blob is None:
+                path = os.path.join(upload_dir(), filename)
+                session.execute(insert(Blob).values(
+                    sha256=sha256,
+                    filename=filename,
+                    size=os.path.getsize(path) if os.path.exists(path) else 0,
+                    ref_count=0,
+                    created_at=datetime.now(),
+                ).on_conflict_do_nothing(index_elements=['sha256']))
+                blob = session.get(Blob, sha256)
+            count = Blob.ref_count + delta
+            blob.ref_count = case((count < 0, 0), else_=count)
+
+
+@event.listens_for(db.session, 'before_flush')
+def _count_photo_references(session, flush_context, instances):
+    deltas = Counter()
+    for obj in session.new:
+        if isinstance(obj, Item) and obj.photo_filename:
+            deltas[obj.photo_filename] += 1
+    for obj in session.deleted:
+        if isinstance(obj, Item) and obj.photo_filename:
+            deltas[obj.photo_filename] -= 1
+    for obj in session.dirty:
+        if not isinstance(obj, Item):
+            continue
+        history = db.inspect(obj).attrs.photo_filename.history
+        for filename in history.added:
+            if filename:
+                deltas[filename] += 1
+        for filename in history.deleted:
+            if filename:
+                deltas[filename] -= 1
+    if deltas:
+        adjust_refs(session, deltas)
+
+
+def orphaned_files(min_age_seconds=3600):
+    """Upload files no Item or archived item refers to, older than ``min_age_seconds``.
+
+    The age threshold keeps uploads whose Item is still being saved by an
+    in-flight request from being collected.
+    """
+    referenced = set()
+    for model in (Item, ItemArchive):
+        referenced.update(
+            filename for (filename,) in
+            db.session.query(model.photo_filename).filter(model.photo_filename.isnot(None)).distinct()
+        )
+    cutoff = datetime.now().timestamp() - min_age_seconds
+    directory = upload_dir()
+    if not os.path.isdir(directory):
+        return []
+    orphans = []
+    for entry in os.scandir(directory):
+        if not entry.is_file() or entry.name in referenced:
+            continue
+        if entry.stat().st_mtime > cutoff:
+            continue
+        orphans.append(entry.name)
+    return sorted(orphans)
+
+
+def variant_files(filename):
+    """Paths of the resized variants generated for an upload (see app/images.py)."""
+    stem = filename.rsplit('.', 1)[0]
+    directory = os.path.join(upload_dir(), 'variants')
+    if not os.path.isdir(directory):
+        return []
+    return [os.path.join(directory, name) for name in os.listdir(directory)
+            if name.startswith(stem + '-')]
+
+
+def delete_upload(filename):
+    """Remove an upload, its variants and its Blob row (caller commits)."""
+    for path in [os.path.join(upload_dir(), filename)] + variant_files(filename):
+        if os.path.exists(path):
+            os.remove(path)
+    if is_blob_name(filename):
+        blob = db.session.get(Blob, filename.split('.', 1)[0])
+        if blob is not None:
+            db.session.delete(blob)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""Peak memory and time of a full /api/items export: one list vs streamed.
+
+    python benchmarks/api_stream.py                      # 10k, 50k, 200k items
+    python benchmarks/api_stream.py --items 1000 100000
+
+Each size is seeded once into a temporary SQLite file; every mode then runs
+in a fresh process so its peak RSS (``ru_maxrss``) is its own. Modes:
+
+- ``list``: what ``/api/items`` used to do, every row serialized into one
+  list and passed to ``jsonify``;
+- ``json``: ``/api/items?stream=1``;
+- ``ndjson``: ``/api/items`` with ``Accept: application/x-ndjson``.
+
+The streamed modes should show the same peak RSS growth at every size.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import app, create_schema, peak_rss_kb, seed
+
+from flask import jsonify
+
+MODES = {
+    'json': ('/api/items?stream=1', {}),
+    'ndjson': ('/api/items', {'Accept': 'application/x-ndjson'}),
+}
+
+
+def run_list():
+    from app.api import serialize_item
+    from app.models import Item
+    with app.test_request_context('/api/items'):
+        items = Item.query.order_by(Item.date_reported.desc(), Item.id.desc()).all()
+        body = jsonify([serialize_item(item) for item in items]).get_data()
+    return len(body), None
+
+
+def run_streamed(mode):
+    url, headers = MODES[mode]
+    response = app.test_client().get(url, headers=headers, buffered=False)
+    size, first_byte = 0, None
+    started = time.perf_counter()
+    for chunk in response.response:
+        if first_byte is None:
+            first_byte = time.perf_counter() - started
+        size += len(chunk)
+    response.close()
+    return size, first_byte
+
+
+def measure(mode):
+    """Run one export in this process and print its numbers as JSON."""
+    from app import db
+    from app.models import Item
+    with app.app_context():
+        db.session.query(Item.id).limit(1).all()  # connect and warm up first
+    before = peak_rss_kb()
+    started = time.perf_counter()
+    size, first_byte = run_list() if mode == 'list' else run_streamed(mode)
+    print(json.dumps({
+        'bytes': size,
+        'seconds': round(time.perf_counter() - started, 3),
+        'first_byte_seconds': None if first_byte is None else round(first_byte, 4),
+        'peak_rss_growth_mb': round((peak_rss_kb() - before) / 1024, 1),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', type=int, nargs='+', default=[10_000, 50_000, 200_000])
+    parser.add_argument('--seed', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--mode', choices=['list', *MODES], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.seed:
+        create_schema()
+        seed(users=50, items=args.items[0])
+        return
+    if args.mode:
+        measure(args.mode)
+        return
+
+    report = {}
+    for count in args.items:
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ, BENCH_DATABASE_URL=f'sqlite:///{tmp}/bench.db')
+            command = [sys.executable, os.path.abspath(__file__), '--items', str(count)]
+            subprocess.run(command + ['--seed'], env=env, check=True)
+            report[count] = {
+                mode: json.loads(subprocess.check_output(command + ['--mode', mode], env=env))
+                for mode in ['list', *MODES]
+            }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
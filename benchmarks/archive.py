@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""Hot-table route latency before and after archiving old items.
+
+    python benchmarks/archive.py
+    python benchmarks/archive.py --items 300000 --archived 0.9
+
+Seeds a temporary SQLite file database with ``--items`` items reported a
+minute apart, times the list routes (page cache off), archives the oldest
+``--archived`` share of them with ``archive_items`` and times the routes
+again. Reported: p50/p95 per route before and after, the archive run's
+items per second, and ``/item/<id>`` latency for an archived and a hot item.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+os.environ['CACHE_BACKEND'] = 'none'
+
+from common import WORDS, app, create_schema, login, percentile, seed
+
+from app import archive, db
+from app.models import Item, ItemArchive
+
+ROUTES = {
+    'dashboard': lambda rng: '/dashboard',
+    'search': lambda rng: f'/search?search={rng.choice(WORDS)}',
+    'search_resolved': lambda rng: '/search?status=resolved',
+    'api_items': lambda rng: '/api/items?limit=20',
+}
+
+
+def time_routes(client, requests):
+    rng = random.Random(1)
+    report = {}
+    for name, url in ROUTES.items():
+        latencies = []
+        for n in range(requests + 3):
+            started = time.perf_counter()
+            response = client.get(url(rng))
+            elapsed = (time.perf_counter() - started) * 1000
+            assert response.status_code == 200, (name, response.status_code)
+            if n >= 3:  # warm-up
+                latencies.append(elapsed)
+        report[name] = {'p50_ms': round(percentile(latencies, 0.5), 1),
+                        'p95_ms': round(percentile(latencies, 0.95), 1)}
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', type=int, default=100_000)
+    parser.add_argument('--archived', type=float, default=0.8, help='share of items to archive')
+    parser.add_argument('--requests', type=int, default=30, help='requests per route')
+    args = parser.parse_args()
+
+    if os.environ.get('BENCH_DATABASE_URL', 'sqlite://') == 'sqlite://':
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ, BENCH_DATABASE_URL=f'sqlite:///{tmp}/bench.db')
+            subprocess.run([sys.executable, __file__, *sys.argv[1:]], env=env, check=True)
+        return
+
+    create_schema()
+    user_id = seed(users=200, items=args.items)
+    client = app.test_client()
+    login(client, user_id)
+    report = {'items': args.items, 'before': time_routes(client, args.requests)}
+
+    with app.app_context():
+        oldest = db.session.query(db.func.min(Item.date_reported)).scalar()
+        # Items are a minute apart: make the oldest share stale at ``now``.
+        now = (oldest + timedelta(minutes=int(args.items * args.archived))
+               + timedelta(days=app.config['ARCHIVE_STALE_AFTER_DAYS']))
+        started = time.perf_counter()
+        moved = archive.archive_items(now=now)
+        elapsed = time.perf_counter() - started
+        report['archive'] = {'moved': moved, 'seconds': round(elapsed, 2),
+                             'items_per_second': round(moved / elapsed),
+                             'hot_items_left': Item.query.count()}
+        item_ids = {'archived_item': db.session.query(ItemArchive.id).limit(1).scalar(),
+                    'hot_item': db.session.query(Item.id).limit(1).scalar()}
+
+    report['after'] = time_routes(client, args.requests)
+    for name, item_id in item_ids.items():
+        client.get(f'/item/{item_id}')  # warm-up, compiles the template
+        started = time.perf_counter()
+        assert client.get(f'/item/{item_id}').status_code == 200
+        report[f'{name}_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
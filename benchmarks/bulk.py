@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""Rows per second of ``flask items export/import`` against one row per commit.
+
+    python benchmarks/bulk.py
+    python benchmarks/bulk.py --items 300000 --batch-size 5000
+
+Seeds a temporary SQLite file database with ``--users`` users and
+``--items`` items, exports the items to NDJSON and CSV, deletes them and
+imports each file back. The baseline inserts ``--baseline-items`` items
+through the ORM with a commit per item, as the report API does. Reported:
+seconds and rows per second for each, and the projected time for
+``--project`` rows.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import app, create_schema, seed
+
+from app import bulk, db
+from app.models import ImportCheckpoint, Item, User
+
+
+def timed(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - started
+
+
+def export_file(path, fmt):
+    with app.app_context(), bulk.open_output(path, fmt) as out:
+        return bulk.export(out, 'items', fmt)[0]
+
+
+def import_file(path, fmt, batch_size):
+    with app.app_context():
+        db.session.execute(db.delete(Item))
+        db.session.execute(db.delete(ImportCheckpoint))
+        db.session.commit()
+        importer = bulk.Importer('items', f'bench:{fmt}', batch_size=batch_size)
+        with bulk.open_input(path, fmt) as stream:
+            return importer.run(bulk.read_records(stream, fmt))
+
+
+def one_per_commit(path, count):
+    with app.app_context():
+        with bulk.open_input(path, 'ndjson') as stream:
+            records = [record for _, record in zip(range(count), bulk.read_records(stream, 'ndjson'))]
+        user_ids = dict(db.session.query(User.campus_id, User.id))
+        for number, record in enumerate(records, 1):
+            row = bulk._item_row(record, number)
+            row['user_id'] = user_ids[row.pop('user_campus_id')]
+            db.session.add(Item(**row))
+            db.session.commit()
+        return len(records)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--items', type=int, default=100_000)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--baseline-items', type=int, default=2000)
+    parser.add_argument('--project', type=int, default=300_000, help='rows to project times for')
+    args = parser.parse_args()
+
+    if os.environ.get('BENCH_DATABASE_URL', 'sqlite://') == 'sqlite://':
+        # Commits only cost what they do in production against a file.
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ, BENCH_DATABASE_URL=f'sqlite:///{tmp}/bench.db')
+            subprocess.run([sys.executable, __file__, *sys.argv[1:]], env=env, check=True)
+        return
+
+    create_schema()
+    seed(users=args.users, items=args.items)
+    report = {'items': args.items, 'batch_size': args.batch_size}
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt in bulk.FORMATS:
+            path = os.path.join(tmp, f'items.{fmt}')
+            rows, seconds = timed(export_file, path, fmt)
+            report[f'export_{fmt}'] = {'rows': rows, 'seconds': round(seconds, 2),
+                                       'rows_per_second': round(rows / seconds)}
+            rows, seconds = timed(import_file, path, fmt, args.batch_size)
+            report[f'import_{fmt}'] = {'rows': rows, 'seconds': round(seconds, 2),
+                                       'rows_per_second': round(rows / seconds)}
+        rows, seconds = timed(one_per_commit, os.path.join(tmp, 'items.ndjson'), args.baseline_items)
+        report['one_per_commit'] = {'rows': rows, 'seconds': round(seconds, 2),
+                                    'rows_per_second': round(rows / seconds)}
+    report[f'projected_minutes_for_{args.project}'] = {
+        name: round(args.project / numbers['rows_per_second'] / 60, 1)
+        for name, numbers in report.items() if isinstance(numbers, dict)
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""Shared setup for the benchmark scripts: an isolated app and seed data.
+
+Import this before anything from ``app``: it points ``DATABASE_URL`` at a
+throwaway database (in-memory unless ``BENCH_DATABASE_URL`` is set) so
+benchmarks never touch ``instance/app.db``, and turns rate limiting off
+(unless ``RATE_LIMIT_BACKEND`` is set) so the loads they send are served,
+not refused with 429. Servers started from a benchmark inherit both.
+"""
+import http.client
+import os
+import resource
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ['DATABASE_URL'] = os.environ.get('BENCH_DATABASE_URL', 'sqlite://')
+os.environ.setdefault('RATE_LIMIT_BACKEND', 'none')
+
+from sqlalchemy import event  # noqa: E402
+from werkzeug.security import generate_password_hash  # noqa: E402
+
+from app import app, db  # noqa: E402
+from app.models import Item, User  # noqa: E402
+
+PASSWORD = 'bench-password'
+
+WORDS = (
+    'black leather wallet blue umbrella student id card laptop charger keys '
+    'water bottle backpack headphones phone calculator notebook jacket '
+    'library cafeteria lecture hall hostel gym chapel car park lab'
+).split()
+
+
+def create_schema():
+    with app.app_context():
+        db.create_all()
+
+
+def campus_id(n):
+    return f'ATU{n:07d}'
+
+
+def seed(users=10, items=100, batch_size=1000):
+    """Insert ``users`` users and ``items`` items; return the first user's id.
+
+    Every user's password is ``PASSWORD`` and user ``n`` has ``campus_id(n)``.
+    """
+    password_hash = generate_password_hash(PASSWORD, app.config['PASSWORD_HASH_METHOD'])
+    with app.app_context():
+        for offset in range(0, users, batch_size):
+            db.session.execute(db.insert(User), [
+                dict(name=f'User {n}', campus_id=campus_id(n), email=f'user{n}@example.com',
+                     phone=f'+233{n:09d}', department=f'Department {n % 12}',
+                     password_hash=password_hash, email_verified=True, phone_verified=True)
+                for n in range(offset, min(users, offset + batch_size))
+            ])
+        user_ids = [user_id for (user_id,) in db.session.query(User.id)]
+        start = datetime(2025, 1, 1)
+        for offset in range(0, items, batch_size):
+            rows = []
+            for n in range(offset, min(items, offset + batch_size)):
+                words = [WORDS[(n * 7 + k * 3) % len(WORDS)] for k in range(6)]
+                rows.append(dict(
+                    title=' '.join(words[:3]).title(),
+                    description=f'{" ".join(words)} near the {WORDS[n % len(WORDS)]}',
+                    item_type='lost' if n % 2 else 'found',
+                    contact_phone='+233000000000',
+                    date_reported=start + timedelta(minutes=n),
+                    status='active' if n % 5 else 'resolved',
+                    user_id=user_ids[n % len(user_ids)],
+                ))
+            db.session.execute(db.insert(Item), rows)
+        db.session.commit()
+        return user_ids[0]
+
+
+def login(client, user_id):
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+
+
+def peak_rss_kb():
+    """Peak resident set size of this process so far (KiB on Linux)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+@contextmanager
+def count_queries():
+    """Collect every SQL statement executed inside the block."""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+
+
+def wait_for_server(port, timeout=30):
+    """Block until a server on ``port`` answers ``/about``."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            connection.request('GET', '/about')
+            connection.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError('server did not start')
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""Live item feed fan-out against dashboards reloading for new items.
+
+    python benchmarks/feed.py
+    python benchmarks/feed.py --subscribers 5000 --new-items 20
+
+Seeds a temporary SQLite file database, opens ``--subscribers`` feed
+subscriptions in one process (no sockets: this measures the broker) and
+reports ``--new-items`` items. Reported: the poll that publishes them, the
+time for every subscriber to drain and encode its events, memory per idle
+subscription, and what the same clients cost reloading the dashboard once
+(the first page, query cache off) to see the new items.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+os.environ['CACHE_BACKEND'] = 'none'
+os.environ['FEED_POLL_INTERVAL'] = '0'  # polled by hand below
+
+from common import app, create_schema, login, percentile, seed
+
+from app import db, feed
+from app.api import serialize_item
+from app.models import Item
+
+
+def dashboard_ms(client, requests):
+    latencies = []
+    for n in range(requests + 3):
+        started = time.perf_counter()
+        assert client.get('/dashboard').status_code == 200
+        if n >= 3:  # warm-up
+            latencies.append((time.perf_counter() - started) * 1000)
+    return percentile(latencies, 0.5)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', type=int, default=20_000)
+    parser.add_argument('--subscribers', type=int, default=2000)
+    parser.add_argument('--new-items', type=int, default=10)
+    args = parser.parse_args()
+
+    if os.environ.get('BENCH_DATABASE_URL', 'sqlite://') == 'sqlite://':
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ, BENCH_DATABASE_URL=f'sqlite:///{tmp}/bench.db')
+            subprocess.run([sys.executable, __file__, *sys.argv[1:]], env=env, check=True)
+        return
+
+    create_schema()
+    user_id = seed(users=200, items=args.items)
+    app.config['FEED_MAX_SUBSCRIBERS'] = args.subscribers
+    app.config['FEED_QUEUE_SIZE'] = args.new_items
+    report = {'subscribers': args.subscribers, 'new_items': args.new_items}
+
+    with app.app_context():
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        # Half want everything, half only lost items matching a search
+        subscriptions = [feed.broker.subscribe(feed.Filter('lost', search='library') if n % 2 else feed.Filter())
+                         for n in range(args.subscribers)]
+        report['bytes_per_subscription'] = (tracemalloc.get_traced_memory()[0] - before) // args.subscribers
+        tracemalloc.stop()
+
+        feed.broker.poll()
+        for n in range(args.new_items):
+            db.session.add(Item(title=f'Umbrella {n}', description='Left near the library',
+                                item_type='lost' if n % 2 else 'found', contact_phone='+233000000000',
+                                date_reported=datetime.now(), user_id=user_id))
+        db.session.commit()
+        started = time.perf_counter()
+        published = feed.broker.poll()
+        report['poll_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        assert published == args.new_items
+
+        encode = lambda item: json.dumps(serialize_item(item))  # noqa: E731
+        started = time.perf_counter()
+        delivered = 0
+        for subscription in subscriptions:
+            while (event := subscription.get(timeout=0)) is not None:
+                feed.frame(event.item.id, event.encoded('json', encode))
+                delivered += 1
+        report['deliver_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        report['events_delivered'] = delivered
+        feed.broker.reset()
+
+    client = app.test_client()
+    login(client, user_id)
+    reload_ms = dashboard_ms(client, 20)
+    report['dashboard_reload_p50_ms'] = round(reload_ms, 1)
+    report['reload_all_subscribers_seconds'] = round(reload_ms * args.subscribers / 1000, 1)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""HTML bytes per route, optionally compared against the templates of another revision.
+
+    python benchmarks/html_bytes.py                 # current templates
+    python benchmarks/html_bytes.py --baseline HEAD~1
+
+Reports raw and gzip-compressed HTML size and how much of it is inline
+<style>. Stylesheet bytes are listed separately: they are fetched once
+and then served from cache (see app/assets.py).
+"""
+import argparse
+import gzip
+import json
+import re
+import subprocess
+
+from common import ROOT, app, create_schema, login, seed
+
+from jinja2 import DictLoader
+
+ROUTES = [
+    ('/', False),
+    ('/about', False),
+    ('/login', False),
+    ('/register', False),
+    ('/forgot-password', False),
+    ('/dashboard', True),
+    ('/report_lost', True),
+    ('/report_found', True),
+    ('/item/1', True),
+]
+
+STYLE_RE = re.compile(rb'<style[^>]*>.*?</style>', re.S)
+STYLESHEET_RE = re.compile(rb'<link rel="stylesheet" href="(/static/[^"]+)"')
+
+
+def templates_at(revision):
+    names = subprocess.check_output(
+        ['git', 'ls-tree', '--name-only', f'{revision}:app/templates'], cwd=ROOT, text=True
+    ).split()
+    return {
+        name: subprocess.check_output(
+            ['git', 'show', f'{revision}:app/templates/{name}'], cwd=ROOT, text=True
+        )
+        for name in names
+    }
+
+
+def measure(client):
+    results = {}
+    for url, _ in ROUTES:
+        html = client.get(url).data
+        stylesheets = 0
+        for href in STYLESHEET_RE.findall(html):
+            stylesheets += len(client.get(href.decode()).data)
+        results[url] = {
+            'html_bytes': len(html),
+            'html_gzip_bytes': len(gzip.compress(html)),
+            'inline_style_bytes': sum(len(block) for block in STYLE_RE.findall(html)),
+            'stylesheet_bytes': stylesheets,
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--baseline', help='git revision whose templates to compare against')
+    args = parser.parse_args()
+
+    create_schema()
+    user_id = seed(users=5, items=40)
+    client = app.test_client()
+    login(client, user_id)
+
+    report = {'after': measure(client)}
+    if args.baseline:
+        current_loader = app.jinja_env.loader
+        app.jinja_env.loader = DictLoader(templates_at(args.baseline))
+        app.jinja_env.cache.clear()
+        try:
+            report['before'] = measure(client)
+        finally:
+            app.jinja_env.loader = current_loader
+            app.jinja_env.cache.clear()
+        report['saved_html_bytes'] = {
+            url: report['before'][url]['html_bytes'] - report['after'][url]['html_bytes']
+            for url, _ in ROUTES
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
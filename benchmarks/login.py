@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""Login throughput per core, and what a login spike does to other requests.
+
+    python benchmarks/login.py
+    python benchmarks/login.py --clients 32 --duration 20 --method scrypt:32768:8:1
+
+Seeds a temporary SQLite database, then for each hashing mode starts
+``gunicorn -c gunicorn.conf.py run:app`` on it (``gthread`` workers, whose
+threads a login spike can use up) and, for ``--duration``
+seconds, has ``--clients`` processes post correct credentials to
+``/login`` (backing off for ``Retry-After`` when refused) while one more
+process fetches ``/about`` every 50 ms. Modes:
+
+- ``inline``: ``PASSWORD_HASH_WORKERS=0``, hashing on the request thread
+  with no cap (``PASSWORD_HASH_MAX_PENDING`` = gunicorn threads);
+- ``pool``: the defaults, a hashing process and two slots per web worker.
+
+Reported per mode: successful logins per second (and per core), logins
+refused with 503, and the ``/about`` latency seen during the spike.
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlencode
+
+from common import PASSWORD, ROOT, app, campus_id, create_schema, percentile, seed, wait_for_server
+
+THREADS = 4
+MODES = {
+    'inline': {'PASSWORD_HASH_WORKERS': '0', 'PASSWORD_HASH_MAX_PENDING': str(THREADS)},
+    'pool': {},
+}
+
+
+def login_loop(port, users, deadline, counts):
+    rng = random.Random(os.getpid())
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    ok = refused = failed = 0
+    while time.monotonic() < deadline:
+        body = urlencode({'campus_id': campus_id(rng.randrange(users)), 'password': PASSWORD})
+        try:
+            connection.request('POST', '/login', body,
+                               {'Content-Type': 'application/x-www-form-urlencoded'})
+            response = connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            failed += 1
+            connection.close()
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+            continue
+        if response.status == 302:
+            ok += 1
+        elif response.status == 503:
+            refused += 1
+            time.sleep(float(response.getheader('Retry-After', 1)))
+        else:
+            failed += 1
+    with counts.get_lock():
+        counts[0] += ok
+        counts[1] += refused
+        counts[2] += failed
+
+
+def probe_loop(port, deadline, latencies):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        connection.request('GET', '/about')
+        connection.getresponse().read()
+        latencies.append((time.perf_counter() - started) * 1000)
+        time.sleep(0.05)
+
+
+def measure(mode, args, env, cores):
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'run:app'],
+        cwd=ROOT,
+        env=dict(env, **MODES[mode], PORT=str(args.port)),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_for_server(args.port)
+        counts = multiprocessing.Array('i', 3)
+        latencies = multiprocessing.Manager().list()
+        deadline = time.monotonic() + args.duration
+        processes = [
+            multiprocessing.Process(target=login_loop, args=(args.port, args.users, deadline, counts))
+            for _ in range(args.clients)
+        ]
+        processes.append(multiprocessing.Process(target=probe_loop,
+                                                 args=(args.port, deadline, latencies)))
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        latencies = list(latencies)
+        ok, refused, failed = counts[:]
+        return {
+            'logins': ok,
+            'refused_503': refused,
+            'errors': failed,
+            'logins_per_second': round(ok / args.duration, 1),
+            'logins_per_second_per_core': round(ok / args.duration / cores, 1),
+            'about_p50_ms': round(percentile(latencies, 0.50), 1),
+            'about_p95_ms': round(percentile(latencies, 0.95), 1),
+        }
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=60)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10, help='seconds per mode')
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--web-workers', type=int, help='gunicorn workers (default: one per core)')
+    parser.add_argument('--method', help='PASSWORD_HASH_METHOD (default: the app default)')
+    parser.add_argument('--port', type=int, default=8766)
+    args = parser.parse_args()
+
+    if os.environ.get('BENCH_DATABASE_URL', 'sqlite://') == 'sqlite://':
+        # gunicorn runs in other processes, so the database has to be a file.
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ, BENCH_DATABASE_URL=f'sqlite:///{tmp}/bench.db')
+            if args.method:
+                env['PASSWORD_HASH_METHOD'] = args.method
+            subprocess.run([sys.executable, __file__, *sys.argv[1:]], env=env, check=True)
+        return
+
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()
+    create_schema()
+    seed(users=args.users, items=100)
+    env = dict(os.environ, DATABASE_URL=os.environ['BENCH_DATABASE_URL'], CACHE_BACKEND='none',
+               GUNICORN_MAX_REQUESTS='0', GUNICORN_WORKER_CLASS='gthread', GUNICORN_THREADS=str(THREADS),
+               WEB_CONCURRENCY=str(args.web_workers or cores))
+    report = {
+        'cores': cores,
+        'clients': args.clients,
+        'method': app.config['PASSWORD_HASH_METHOD'],
+        'modes': {mode: measure(mode, args, env, cores) for mode in args.modes},
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""Recall and latency of the lost/found matching index on synthetic reports.
+
+    python benchmarks/matching.py                        # 10k, 100k, 1M items
+    python benchmarks/matching.py --sizes 10000 --max-postings 500
+
+Half the generated items are lost and half found. For a share of the lost
+reports a found report of the same object is planted, worded differently
+(shared object, colour and brand, a different place, some words dropped,
+one of two distinguishing details kept). Recall@k is the share of planted
+pairs whose found report is among the top ``k`` candidates; latency is per
+lookup. Runs on :class:`app.matching.MatchIndex` alone, with no database.
+
+Passing a ``--max-postings`` larger than any posting list gives the
+exhaustive-scan baseline to compare recall against.
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+
+from common import percentile
+from app.matching import MatchIndex
+
+OBJECTS = ('wallet purse umbrella phone laptop key student-id card bottle backpack headphones '
+           'earbuds calculator jacket hoodie charger watch glasses notebook textbook ring '
+           'bracelet necklace cap scarf tablet mouse flash-drive hard-drive lanyard').split()
+COLOURS = 'black white blue red green grey brown pink purple silver gold yellow orange navy'.split()
+BRANDS = ('samsung iphone tecno infinix hp dell lenovo nike adidas puma casio jbl sony beats '
+          'anker oraimo hisense gucci zara').split()
+MATERIALS = 'leather plastic metal fabric canvas rubber glass wooden denim'.split()
+PLACES = ('library cafeteria lecture-hall hostel gym chapel car-park lab auditorium bus-stop '
+          'admin-block clinic sports-field').split()
+
+
+def details(rng, tail):
+    # Distinguishing marks (stickers, initials, a keychain) come from a long tail of words.
+    return [f'd{int(tail ** rng.random())}' for _ in range(2)]
+
+
+def report(rng, tail, obj=None, colour=None, brand=None, marks=None):
+    obj = obj or rng.choice(OBJECTS)
+    colour = colour or rng.choice(COLOURS)
+    brand = brand or rng.choice(BRANDS)
+    marks = marks or details(rng, tail)
+    title = f'{colour} {brand} {obj}'
+    words = [rng.choice(MATERIALS), obj, 'with', *marks, 'near', 'the', rng.choice(PLACES)]
+    return title, ' '.join(words), (obj, colour, brand, marks)
+
+
+def reworded(rng, tail, facts):
+    obj, colour, brand, marks = facts
+    kept = [rng.choice(marks)] + details(rng, tail)[:1]
+    title, description, _ = report(rng, tail, obj, colour, brand, kept)
+    words = description.split()
+    return title, ' '.join(w for w in words if rng.random() > 0.25 or w == obj)
+
+
+def generate(size, pair_share, seed, tail):
+    rng = random.Random(seed)
+    items, pairs = [], []
+    while len(items) < size:
+        title, description, facts = report(rng, tail)
+        lost_id = len(items) + 1
+        items.append((lost_id, 'lost', f'{title} {description}'))
+        if rng.random() < pair_share:
+            found_title, found_description = reworded(rng, tail, facts)
+            items.append((lost_id + 1, 'found', f'{found_title} {found_description}'))
+            pairs.append((lost_id, lost_id + 1))
+        else:
+            title, description, _ = report(rng, tail)
+            items.append((lost_id + 1, 'found', f'{title} {description}'))
+    return items[:size], pairs
+
+
+def run(size, args):
+    items, pairs = generate(size, args.pair_share, args.seed, args.tail)
+    texts = {item_id: text for item_id, _, text in items}
+    index = MatchIndex(max_postings=args.max_postings)
+
+    started = time.perf_counter()
+    for item_id, item_type, text in items:
+        index.add(item_id, item_type, text)
+    build_seconds = time.perf_counter() - started
+
+    sample = random.Random(args.seed).sample(pairs, min(args.queries, len(pairs)))
+    hits, latencies = 0, []
+    for lost_id, found_id in sample:
+        started = time.perf_counter()
+        candidates = index.candidates('found', texts[lost_id], k=args.k)
+        latencies.append((time.perf_counter() - started) * 1000)
+        hits += any(item_id == found_id for item_id, _ in candidates)
+
+    return {
+        'items': size,
+        'build_seconds': round(build_seconds, 2),
+        'queries': len(sample),
+        f'recall_at_{args.k}': round(hits / len(sample), 3) if sample else None,
+        'latency_ms': {
+            'mean': round(statistics.mean(latencies), 2),
+            'p50': round(percentile(latencies, 0.50), 2),
+            'p95': round(percentile(latencies, 0.95), 2),
+            'p99': round(percentile(latencies, 0.99), 2),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--queries', type=int, default=1000)
+    parser.add_argument('--pair-share', type=float, default=0.1,
+                        help='share of lost reports with a planted found report')
+    parser.add_argument('--max-postings', type=int, default=MatchIndex().max_postings)
+    parser.add_argument('--tail', type=int, default=50_000, help='distinct distinguishing words')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    print(json.dumps([run(size, args) for size in args.sizes], indent=2))
+
+
+if __name__ == '__main__':
+    main()
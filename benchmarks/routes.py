@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""Latency, throughput, query count and peak memory for the main routes.
+
+    python benchmarks/routes.py                                   # 50 users, 5k items
+    python benchmarks/routes.py --users 10000 --items 1000000 --output after.json
+    python benchmarks/routes.py --routes dashboard search --compare before.json
+
+Seeds a temporary SQLite database (or ``BENCH_DATABASE_URL``, if set to a
+file or server database) once, then benchmarks every route in its own
+process so each one's peak RSS is its own. Requests go through Flask's
+test client, one at a time, so throughput is per process without network
+overhead. Each route gets a few warm-up requests first. Page and query
+caches stay on unless ``--no-cache`` is given.
+
+Output is JSON keyed by route: ``p50_ms``/``p95_ms``/``p99_ms``,
+``requests_per_second``, ``queries_per_request`` and
+``peak_rss_growth_mb``. With ``--compare``, the change against an earlier
+output file is added under ``"change"``, for comparing two commits.
+"""
+import argparse
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import (
+    PASSWORD, WORDS, app, campus_id, count_queries, create_schema, login, peak_rss_kb,
+    percentile, seed,
+)
+
+from PIL import Image
+
+WARMUP = 5
+
+
+def photo(rng):
+    buffer = io.BytesIO()
+    colour = tuple(rng.randrange(256) for _ in range(3))
+    Image.new('RGB', (640, 480), colour).save(buffer, 'JPEG', quality=85)
+    buffer.seek(0)
+    return buffer
+
+
+# name -> (needs login, builds the test client call from (rng, args))
+ROUTES = {
+    'index': (False, lambda rng, args: ('GET', '/', {})),
+    'dashboard': (True, lambda rng, args: ('GET', '/dashboard', {})),
+    'search': (True, lambda rng, args: ('GET', f'/search?search={rng.choice(WORDS)}', {})),
+    'item': (True, lambda rng, args: ('GET', f'/item/{rng.randint(1, args.items)}', {})),
+    'api_items': (False, lambda rng, args: ('GET', '/api/items?limit=20', {})),
+    'report_lost': (True, lambda rng, args: ('POST', '/report_lost', {'data': {
+        'title': f'{rng.choice(WORDS)} {rng.choice(WORDS)}'.title(),
+        'description': ' '.join(rng.choice(WORDS) for _ in range(12)),
+        'contact_phone': '+233000000000',
+        'photo': (photo(rng), 'photo.jpg'),
+    }})),
+    'login': (False, lambda rng, args: ('POST', '/login', {'data': {
+        'campus_id': campus_id(rng.randrange(args.users)), 'password': PASSWORD,
+    }})),
+}
+
+# Password hashing makes each login take a large fraction of a second.
+REQUESTS = {'login': 20}
+
+
+def remove_uploads():
+    """Delete the photos stored by report_lost runs (they land in app/static/uploads)."""
+    from app import db
+    from app.models import Blob
+    from app.storage import delete_upload
+    with app.app_context():
+        for blob in Blob.query.all():
+            delete_upload(blob.filename)
+        db.session.commit()
+
+
+def measure(name, args):
+    """Benchmark one route in this process and print its numbers as JSON."""
+    needs_login, build = ROUTES[name]
+    rng = random.Random(args.seed)
+    client = app.test_client()
+    if needs_login:
+        login(client, 1)
+    count = REQUESTS.get(name, args.requests)
+
+    def call():
+        method, url, kwargs = build(rng, args)
+        response = client.open(url, method=method, **kwargs)
+        if response.status_code not in (200, 302):
+            raise RuntimeError(f'{method} {url} returned {response.status}')
+        if name == 'login':
+            client.get('/logout')
+
+    try:
+        for _ in range(WARMUP):
+            call()
+        before = peak_rss_kb()
+        latencies = []
+        with count_queries() as statements:
+            started = time.perf_counter()
+            for _ in range(count):
+                request_started = time.perf_counter()
+                call()
+                latencies.append((time.perf_counter() - request_started) * 1000)
+            elapsed = time.perf_counter() - started
+    finally:
+        if name == 'report_lost':
+            remove_uploads()
+
+    print(json.dumps({
+        'requests': count,
+        'p50_ms': round(percentile(latencies, 0.50), 2),
+        'p95_ms': round(percentile(latencies, 0.95), 2),
+        'p99_ms': round(percentile(latencies, 0.99), 2),
+        'requests_per_second': round(count / elapsed, 1),
+        # The logout after each login is counted too.
+        'queries_per_request': round(len(statements) / count, 2),
+        'peak_rss_growth_mb': round((peak_rss_kb() - before) / 1024, 1),
+    }))
+
+
+def compare(report, baseline):
+    change = {}
+    for name, result in report.items():
+        old = baseline.get(name)
+        if not old:
+            continue
+        change[name] = {
+            key: f'{(result[key] - old[key]) / old[key]:+.1%}' if old[key] else None
+            for key in ('p50_ms', 'p95_ms', 'p99_ms', 'requests_per_second', 'queries_per_request')
+        }
+    return change
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--items', type=int, default=5000)
+    parser.add_argument('--requests', type=int, default=200, help='timed requests per route')
+    parser.add_argument('--routes', nargs='+', choices=ROUTES, default=list(ROUTES))
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--no-cache', action='store_true',
+                        help='run with CACHE_BACKEND=none, so every request does its full work')
+    parser.add_argument('--output', help='also write the results to this file')
+    parser.add_argument('--compare', help='results file of an earlier run to compare against')
+    parser.add_argument('--setup', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--route', choices=ROUTES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.setup:
+        create_schema()
+        seed(users=args.users, items=args.items)
+        return
+    if args.route:
+        measure(args.route, args)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ)
+        env.setdefault('BENCH_DATABASE_URL', f'sqlite:///{tmp}/bench.db')
+        if args.no_cache:
+            env['CACHE_BACKEND'] = 'none'
+        command = [sys.executable, os.path.abspath(__file__), '--users', str(args.users),
+                   '--items', str(args.items), '--requests', str(args.requests),
+                   '--seed', str(args.seed)]
+        started = time.perf_counter()
+        subprocess.run(command + ['--setup'], env=env, check=True)
+        seed_seconds = time.perf_counter() - started
+        routes = {
+            name: json.loads(subprocess.check_output(command + ['--route', name], env=env))
+            for name in args.routes
+        }
+
+    report = {
+        'users': args.users,
+        'items': args.items,
+        'cache': not args.no_cache,
+        'seed_seconds': round(seed_seconds, 1),
+        'routes': routes,
+    }
+    if args.compare:
+        with open(args.compare) as f:
+            report['change'] = compare(routes, json.load(f)['routes'])
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    print(output)
+
+
+if __name__ == '__main__':
+    main()
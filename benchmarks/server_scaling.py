@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""Throughput of gunicorn with 1, 2, 4… workers, to check it scales with cores.
+
+    python benchmarks/server_scaling.py
+    python benchmarks/server_scaling.py --workers 1 2 4 8 --clients 32 --duration 15
+
+Seeds a temporary SQLite database, then for each worker count starts
+``gunicorn -c gunicorn.conf.py run:app`` on it and hammers a mix of list,
+detail and search URLs from ``--clients`` keep-alive connections spread
+over several client processes (so the load generator is not the
+bottleneck). Caching is disabled so every request does its real work.
+Throughput should grow roughly linearly up to the number of cores.
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import ROOT, create_schema, seed, wait_for_server
+
+URLS = ['/api/items?limit=50', '/search?search=wallet', '/item/{id}', '/']
+
+
+def client_loop(port, items, deadline, counts, errors):
+    rng = random.Random(os.getpid())
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    done = failed = 0
+    while time.monotonic() < deadline:
+        url = rng.choice(URLS).format(id=rng.randint(1, items))
+        try:
+            connection.request('GET', url)
+            response = connection.getresponse()
+            response.read()
+            if response.status == 200:
+                done += 1
+            else:
+                failed += 1
+        except (OSError, http.client.HTTPException):
+            failed += 1
+            connection.close()
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    with counts.get_lock():
+        counts.value += done
+    with errors.get_lock():
+        errors.value += failed
+
+
+def measure(workers, args, env):
+    port = args.port
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'run:app'],
+        cwd=ROOT,
+        env=dict(env, WEB_CONCURRENCY=str(workers), PORT=str(port)),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_for_server(port)
+        counts = multiprocessing.Value('i', 0)
+        errors = multiprocessing.Value('i', 0)
+        deadline = time.monotonic() + args.duration
+        clients = [
+            multiprocessing.Process(target=client_loop,
+                                    args=(port, args.items, deadline, counts, errors))
+            for _ in range(args.clients)
+        ]
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join()
+        return {
+            'workers': workers,
+            'requests': counts.value,
+            'errors': errors.value,
+            'requests_per_second': round(counts.value / args.duration, 1),
+        }
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=60)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()
+    default_workers = sorted({1, 2, 4, cores} | {w for w in (8, 16) if w <= cores})
+    parser.add_argument('--workers', type=int, nargs='+', default=default_workers)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10, help='seconds per worker count')
+    parser.add_argument('--items', type=int, default=5000)
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    if os.environ.get('BENCH_DATABASE_URL', 'sqlite://') == 'sqlite://':
+        # gunicorn runs in other processes, so the database has to be a file.
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ, BENCH_DATABASE_URL=f'sqlite:///{tmp}/bench.db')
+            subprocess.run([sys.executable, __file__, *sys.argv[1:]], env=env, check=True)
+        return
+
+    create_schema()
+    seed(users=100, items=args.items)
+    env = dict(os.environ, DATABASE_URL=os.environ['BENCH_DATABASE_URL'], CACHE_BACKEND='none',
+               GUNICORN_MAX_REQUESTS='0')
+    results = [measure(workers, args, env) for workers in args.workers]
+    base = results[0]['requests_per_second'] or 1
+    for result in results:
+        result['speedup'] = round(result['requests_per_second'] / base, 2)
+    print(json.dumps({'cores': cores, 'clients': args.clients, 'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""``/api/stats`` from the precomputed counters against aggregating per request.
+
+    python benchmarks/stats.py
+    python benchmarks/stats.py --items 300000 --days 30
+
+Seeds a temporary SQLite file database with ``--items`` items, fills the
+counters with one ``reconcile_stats`` run and times (query cache off):
+``/api/stats``, the ``GROUP BY`` recount the endpoint would otherwise run,
+and reporting an item through the ORM with and without the counter hook.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+os.environ['CACHE_BACKEND'] = 'none'
+
+from common import app, create_schema, percentile, seed
+
+from sqlalchemy import event
+
+from app import db, stats
+from app.models import Item
+
+
+def timed(function, runs):
+    latencies = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        function()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return {'p50_ms': round(percentile(latencies, 0.5), 2), 'p95_ms': round(percentile(latencies, 0.95), 2)}
+
+
+def report_item(user_id):
+    db.session.add(Item(title='Blue bottle', description='Steel', item_type='lost',
+                        contact_phone='+233000000000', date_reported=datetime.now(), user_id=user_id))
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', type=int, default=100_000)
+    parser.add_argument('--days', type=int, default=stats.DEFAULT_DAYS)
+    parser.add_argument('--runs', type=int, default=50)
+    args = parser.parse_args()
+
+    if os.environ.get('BENCH_DATABASE_URL', 'sqlite://') == 'sqlite://':
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ, BENCH_DATABASE_URL=f'sqlite:///{tmp}/bench.db')
+            subprocess.run([sys.executable, __file__, *sys.argv[1:]], env=env, check=True)
+        return
+
+    create_schema()
+    user_id = seed(users=200, items=args.items)
+    client = app.test_client()
+    report = {'items': args.items}
+    with app.app_context():
+        started = time.perf_counter()
+        report['counters'] = stats.reconcile_stats()  # the seed inserts skip the hook
+        report['reconcile_seconds'] = round(time.perf_counter() - started, 2)
+
+    def api_stats():
+        assert client.get(f'/api/stats?days={args.days}').status_code == 200
+
+    report['api_stats'] = timed(api_stats, args.runs)
+    with app.app_context():
+        report['aggregate_per_request'] = timed(stats.recount, max(3, args.runs // 10))
+        report['report_item_with_counters'] = timed(lambda: report_item(user_id), args.runs)
+        event.remove(db.session, 'before_flush', stats._count_items)
+        report['report_item_without_counters'] = timed(lambda: report_item(user_id), args.runs)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""Memory and time of concurrent photo uploads, and how early bad ones stop.
+
+    python benchmarks/uploads.py
+    python benchmarks/uploads.py --concurrency 16 --uploads 4 --size-mb 4.5
+
+Each run is a fresh process posting ``/report_lost`` from ``--concurrency``
+threads at once through the WSGI app, with the request body fed from a
+stream whose position shows how much of it the app read. Runs:
+
+- ``werkzeug``: Flask's default request class (files spooled by werkzeug,
+  then copied into the store), for comparison;
+- ``streaming``: the app's :class:`~app.storage.UploadRequest`.
+
+Scenarios: ``valid`` uploads of ``--size-mb``; ``oversized`` uploads of
+twice ``MAX_UPLOAD_SIZE``; ``not_image`` uploads of ``--size-mb`` that are
+not images. Reported: peak RSS growth, wall time, and the share of the
+body read before the response.
+"""
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from common import app, create_schema, login, peak_rss_kb, seed
+
+from flask import Request
+from werkzeug.datastructures import FileStorage
+from werkzeug.test import EnvironBuilder, encode_multipart
+
+JPEG_HEADER = b'\xff\xd8\xff\xe0\x00\x10JFIF\x00'
+
+
+def body(scenario, size):
+    if scenario == 'oversized':
+        size = 2 * app.config['MAX_UPLOAD_SIZE']
+    head = b'%PDF-1.7\n' if scenario == 'not_image' else JPEG_HEADER
+    photo = head + os.urandom(size - len(head))
+    return encode_multipart({
+        'title': 'Benchmark upload',
+        'description': 'Large photo upload',
+        'contact_phone': '+233000000000',
+        'photo': FileStorage(io.BytesIO(photo), 'photo.jpg', content_type='image/jpeg'),
+    })
+
+
+def upload(user_id, boundary, data, count, results):
+    client = app.test_client()
+    login(client, user_id)
+    for _ in range(count):
+        stream = io.BytesIO(data)  # shares ``data``'s buffer, no copy
+        builder = EnvironBuilder(
+            path='/report_lost', method='POST', input_stream=stream,
+            content_type=f'multipart/form-data; boundary={boundary}', content_length=len(data),
+        )
+        response = client.open(builder)
+        results.append((response.status_code, stream.tell() / len(data)))
+
+
+def measure(mode, scenario, args):
+    """Run one scenario in this process and print its numbers as JSON."""
+    from app import storage
+    if mode == 'werkzeug':
+        app.request_class = Request
+    size = int(args.size_mb * 1024 * 1024)
+    with tempfile.TemporaryDirectory() as tmp:
+        storage.upload_dir = lambda: tmp
+        with app.app_context():
+            seed(users=args.concurrency, items=0)
+        # One body, built before the baseline, shared by every request; the
+        # store keeps a single copy of the identical photos.
+        boundary, data = body(scenario, size)
+        results = []
+        threads = [threading.Thread(target=upload, args=(n + 1, boundary, data, args.uploads, results))
+                   for n in range(args.concurrency)]
+        before = peak_rss_kb()
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+    print(json.dumps({
+        'uploads': len(results),
+        'statuses': sorted({status for status, _ in results}),
+        'seconds': round(elapsed, 2),
+        'body_read': f'{sum(share for _, share in results) / len(results):.0%}',
+        'peak_rss_growth_mb': round((peak_rss_kb() - before) / 1024, 1),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--uploads', type=int, default=3, help='uploads per thread')
+    parser.add_argument('--size-mb', type=float, default=4.5)
+    parser.add_argument('--scenarios', nargs='+', default=['valid', 'oversized', 'not_image'],
+                        choices=['valid', 'oversized', 'not_image'])
+    parser.add_argument('--mode', choices=['werkzeug', 'streaming'], help=argparse.SUPPRESS)
+    parser.add_argument('--scenario', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        create_schema()
+        measure(args.mode, args.scenario, args)
+        return
+
+    report = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, BENCH_DATABASE_URL=f'sqlite:///{tmp}/bench.db')
+        for scenario in args.scenarios:
+            report[scenario] = {}
+            for mode in ('werkzeug', 'streaming'):
+                if os.path.exists(f'{tmp}/bench.db'):
+                    os.remove(f'{tmp}/bench.db')
+                command = [sys.executable, os.path.abspath(__file__), '--mode', mode,
+                           '--scenario', scenario, '--concurrency', str(args.concurrency),
+                           '--uploads', str(args.uploads), '--size-mb', str(args.size_mb)]
+                report[scenario][mode] = json.loads(subprocess.check_output(command, env=env))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
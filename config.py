@@ -11,9 +11,79 @@ class Config:
     SQLALCHEMY_DATABASE_URI = DATABASE_URL or 'sqlite:///app.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # Engine tuning, turned into SQLALCHEMY_ENGINE_OPTIONS by app/engine.py
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))  # Connections kept open per process
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))  # Extra connections allowed under load
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 10))  # Seconds to wait for a free connection
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))  # Reopen connections older than this (seconds)
+    DB_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 30000))  # Postgres only; 0 disables
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))  # Wait this long for a write lock
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))  # Bytes of the file read via mmap
+    
+    # Password hashing (see app/passwords.py); changing the method rehashes each user at their next login
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000')
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 1))  # Hashing processes per web worker; 0 hashes inline
+    PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', 2))  # Hashes queued or running per web worker
+    PASSWORD_HASH_WAIT = float(os.environ.get('PASSWORD_HASH_WAIT', 0.25))  # Seconds to wait for a slot before answering 503
+    
+    # Rate limits (see app/ratelimit.py): token buckets written '<requests>/<period>', e.g. '5/minute'; empty disables
+    RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'memory')  # 'memory' (per process), 'database', 'redis' or 'none'
+    RATE_LIMIT_REDIS_URL = os.environ.get('RATE_LIMIT_REDIS_URL', os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0'))
+    RATE_LIMIT_LOGIN_IP = os.environ.get('RATE_LIMIT_LOGIN_IP', '20/minute')  # /login and /api/login attempts per client IP
+    RATE_LIMIT_LOGIN_ACCOUNT = os.environ.get('RATE_LIMIT_LOGIN_ACCOUNT', '5/minute')  # ... per campus ID or email
+    RATE_LIMIT_OTP_IP = os.environ.get('RATE_LIMIT_OTP_IP', '5/10 minutes')  # /forgot-password requests per client IP
+    RATE_LIMIT_OTP_PHONE = os.environ.get('RATE_LIMIT_OTP_PHONE', '3/10 minutes')  # ... per phone number (each sends an SMS)
+    RATE_LIMIT_OTP_VERIFY = os.environ.get('RATE_LIMIT_OTP_VERIFY', '5/10 minutes')  # /verify-reset-code guesses per phone
+    RATE_LIMIT_SEARCH_IP = os.environ.get('RATE_LIMIT_SEARCH_IP', '60/minute')  # /search requests per client IP
+    TRUSTED_PROXIES = int(os.environ.get('TRUSTED_PROXIES', 0))  # Proxies in front of the app whose X-Forwarded-For is trusted
+    
+    # Full-text search: 'auto' picks FTS5 on SQLite and tsvector on Postgres; 'like' forces LIKE scans
+    SEARCH_BACKEND = os.environ.get('SEARCH_BACKEND', 'auto')
+    
     # Upload Configuration
     UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app', 'static', 'uploads')
-    MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
+    MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max request body
+    MAX_UPLOAD_SIZE = int(os.environ.get('MAX_UPLOAD_SIZE', 5 * 1024 * 1024))  # Per photo; checked while the upload streams in
+    MAX_IMAGE_PIXELS = int(os.environ.get('MAX_IMAGE_PIXELS', 50_000_000))  # Larger photos get no variants: never decoded (decompression bombs)
+    STATIC_FINGERPRINTS = os.environ.get('STATIC_FINGERPRINTS', 'True').lower() == 'true'  # Use dist/manifest.json from "flask assets build"
+    
+    # Background jobs, run by "flask jobs work"
+    JOBS_MAX_ATTEMPTS = int(os.environ.get('JOBS_MAX_ATTEMPTS', 5))
+    JOBS_BACKOFF_BASE = float(os.environ.get('JOBS_BACKOFF_BASE', 10))  # seconds; doubles per failed attempt
+    JOBS_BACKOFF_MAX = float(os.environ.get('JOBS_BACKOFF_MAX', 3600))
+    JOBS_POLL_INTERVAL = float(os.environ.get('JOBS_POLL_INTERVAL', 1))  # seconds between polls when idle
+    JOBS_LOCK_TIMEOUT = int(os.environ.get('JOBS_LOCK_TIMEOUT', 600))  # requeue jobs running longer than this
+    
+    # Archival of old items (see app/archive.py), run by "flask jobs work"
+    ARCHIVE_RESOLVED_AFTER_DAYS = int(os.environ.get('ARCHIVE_RESOLVED_AFTER_DAYS', 90))  # Resolved items reported this long ago
+    ARCHIVE_STALE_AFTER_DAYS = int(os.environ.get('ARCHIVE_STALE_AFTER_DAYS', 365))  # Any item reported this long ago
+    ARCHIVE_INTERVAL = int(os.environ.get('ARCHIVE_INTERVAL', 86400))  # seconds between runs; 0 disables
+    ARCHIVE_BATCH_SIZE = int(os.environ.get('ARCHIVE_BATCH_SIZE', 500))  # Items moved per transaction
+    ARCHIVE_PHOTO_DIR = os.environ.get('ARCHIVE_PHOTO_DIR')  # Gzipped photos of archived items; default instance/archive-photos
+    
+    # Precomputed item counts (see app/stats.py), recounted by "flask jobs work"
+    STATS_RECONCILE_INTERVAL = int(os.environ.get('STATS_RECONCILE_INTERVAL', 3600))  # seconds between recounts; 0 disables
+    
+    # Live item feed over Server-Sent Events (see app/feed.py); per worker process
+    FEED_POLL_INTERVAL = float(os.environ.get('FEED_POLL_INTERVAL', 1))  # seconds between checks for new items; 0 disables
+    FEED_HEARTBEAT = float(os.environ.get('FEED_HEARTBEAT', 15))  # seconds between keep-alive comments
+    FEED_QUEUE_SIZE = int(os.environ.get('FEED_QUEUE_SIZE', 100))  # events a client may fall behind before it is dropped
+    FEED_REPLAY_LIMIT = int(os.environ.get('FEED_REPLAY_LIMIT', 100))  # missed items sent to a reconnecting client
+    FEED_MAX_SUBSCRIBERS = int(os.environ.get('FEED_MAX_SUBSCRIBERS', 2000))  # open streams; gunicorn.conf.py lowers it for gthread
+    
+    # Email/SMS delivery: 'console' (print), 'live' (Flask-Mail + Twilio) or 'fake' (tests)
+    NOTIFY_TRANSPORT = os.environ.get('NOTIFY_TRANSPORT', 'console')
+    PUBLIC_URL = os.environ.get('PUBLIC_URL', 'http://127.0.0.1:5001')  # Base of links in notifications
+    
+    # Instrumentation (see app/instrumentation.py)
+    SERVER_TIMING = os.environ.get('SERVER_TIMING', 'True').lower() == 'true'  # Server-Timing response header
+    SLOW_REQUEST_MS = int(os.environ.get('SLOW_REQUEST_MS', 500))  # Log requests slower than this with their SQL
+    
+    # Caching: 'lru' (per process), 'redis' (shared, needs the redis package) or 'none'
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'lru')
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+    CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', 1024))
+    CACHE_DEFAULT_TTL = int(os.environ.get('CACHE_DEFAULT_TTL', 60))  # seconds
     
     # Twilio Configuration
     TWILIO_ACCOUNT_SID = os.environ.get('TWILIO_ACCOUNT_SID')
@@ -19,6 +19,9 @@ with app.app_context():
     print('✅ Database initialized successfully')
 "
 
+# Fingerprint and precompress static assets (served with long-lived cache headers)
+flask --app run assets build
+
 echo "✅ Deployment setup complete!"
 echo "📝 Don't forget to:"
 echo "   1. Set environment variables on your hosting platform"
@@ -0,0 +1,124 @@
+"""Gunicorn settings for production: ``gunicorn -c gunicorn.conf.py run:app``.
+
+Concurrency model: ``gevent`` workers, i.e. a few processes serving every
+connection from a greenlet. Requests mostly wait on the database, uploads
+and the network; gevent (with psycogreen for psycopg2) switches to another
+request while one waits, and separate processes use every core. Each open
+live feed (app/feed.py) is an idle greenlet, so a worker holds thousands.
+Slow side effects (mail, SMS, photos) run in ``flask jobs work`` processes
+instead (see app/jobs.py). Module state shared by a worker's greenlets is
+listed in DEPLOYMENT.md under "Thread safety".
+
+``gthread`` workers (a pool of threads each) remain available, but a
+thread serves one connection, so they allow only ``threads // 2`` feeds.
+
+Every value can be overridden from the environment:
+
+- ``WEB_CONCURRENCY``: worker processes. By default ``2 × CPUs + 1``,
+  capped so that ``GUNICORN_WORKER_MEMORY_MB`` per worker fits in the
+  memory limit (cgroup limit when in a container, else physical memory).
+- ``GUNICORN_WORKER_CLASS``: ``gevent`` (default) or ``gthread``.
+- ``GUNICORN_THREADS``: threads per worker (default 4, gthread only).
+- ``GUNICORN_WORKER_CONNECTIONS``: connections per worker (default 2000,
+  gevent only).
+- ``GUNICORN_MAX_REQUESTS``: requests before a worker is replaced (default
+  1000, with up to 10% jitter so workers do not restart together).
+- ``GUNICORN_TIMEOUT``, ``PORT``.
+"""
+import multiprocessing
+import os
+
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gevent')
+if worker_class == 'gevent':
+    # Patch before the app is preloaded, so its locks and sockets cooperate.
+    from gevent import monkey
+    monkey.patch_all()
+
+MEMORY_RESERVE_MB = 256  # left for the master process and the OS
+
+
+def _cgroup_value(path):
+    try:
+        with open(path) as f:
+            return f.read().split()
+    except OSError:
+        return None
+
+
+def cpu_count():
+    """CPUs this process may use, honouring affinity and a cgroup v2 CPU quota."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = multiprocessing.cpu_count()
+    quota = _cgroup_value('/sys/fs/cgroup/cpu.max')
+    if quota and quota[0] != 'max':
+        cpus = min(cpus, max(1, int(quota[0]) // int(quota[1])))
+    return cpus
+
+
+def memory_mb():
+    """Memory available to this process in MiB, or ``None`` if unknown."""
+    for path in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        value = _cgroup_value(path)
+        # An unlimited v1 cgroup reports a huge number instead of "max".
+        if value and value[0].isdigit() and int(value[0]) < 1 << 50:
+            return int(value[0]) // (1024 * 1024)
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') // (1024 * 1024)
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def default_workers():
+    workers = 2 * cpu_count() + 1
+    memory = memory_mb()
+    if memory is not None:
+        per_worker = int(os.environ.get('GUNICORN_WORKER_MEMORY_MB', 150))
+        workers = min(workers, (memory - MEMORY_RESERVE_MB) // per_worker)
+    return max(1, workers)
+
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY') or default_workers())
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 2000))
+
+# Import the app once in the master; workers fork with it already loaded.
+preload_app = True
+
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = max_requests // 10
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = 30
+keepalive = 5
+
+# Heartbeat files on tmpfs: a slow disk must not get healthy workers killed.
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+
+def when_ready(server):
+    # Load the lost/found match index once, in the master: workers fork with
+    # it and only read the items reported since (app/matching.py).
+    from app import app, db, matching
+    with app.app_context():
+        server.log.info('Match index loaded with %d items', matching.refresh())
+        db.engine.dispose()
+
+
+def post_fork(server, worker):
+    # Connections opened while preloading belong to the master; never share
+    # them across processes.
+    from app import app, db
+    with app.app_context():
+        db.engine.dispose(close=False)
+    if worker_class == 'gevent':
+        # psycopg2 waits on the server without yielding to other greenlets otherwise.
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
+        app.config['FEED_MAX_SUBSCRIBERS'] = min(app.config['FEED_MAX_SUBSCRIBERS'], worker_connections - 100)
+    elif 'FEED_MAX_SUBSCRIBERS' not in os.environ:
+        # Keep half the threads for ordinary requests.
+        app.config['FEED_MAX_SUBSCRIBERS'] = threads // 2
@@ -0,0 +1,64 @@
+"""Item full-text search index
+
+Revision ID: 1a2f6c0d4e51
+Revises: 973679998edb
+Create Date: 2026-10-18 09:12:41.530112
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1a2f6c0d4e51'
+down_revision = '973679998edb'
+branch_labels = None
+depends_on = None
+
+
+POSTGRES_DOCUMENT = (
+    "to_tsvector('english', coalesce(item.title, '') || ' ' || coalesce(item.description, ''))"
+)
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS item_fts USING fts5("
+            "title, description, content='item', content_rowid='id', "
+            "tokenize='porter unicode61')"
+        )
+        op.execute(
+            "CREATE TRIGGER IF NOT EXISTS item_fts_ai AFTER INSERT ON item BEGIN "
+            "INSERT INTO item_fts(rowid, title, description) "
+            "VALUES (new.id, new.title, new.description); END"
+        )
+        op.execute(
+            "CREATE TRIGGER IF NOT EXISTS item_fts_ad AFTER DELETE ON item BEGIN "
+            "INSERT INTO item_fts(item_fts, rowid, title, description) "
+            "VALUES ('delete', old.id, old.title, old.description); END"
+        )
+        op.execute(
+            "CREATE TRIGGER IF NOT EXISTS item_fts_au AFTER UPDATE OF title, description ON item BEGIN "
+            "INSERT INTO item_fts(item_fts, rowid, title, description) "
+            "VALUES ('delete', old.id, old.title, old.description); "
+            "INSERT INTO item_fts(rowid, title, description) "
+            "VALUES (new.id, new.title, new.description); END"
+        )
+        # Backfill existing rows from the content table.
+        op.execute("INSERT INTO item_fts(item_fts) VALUES ('rebuild')")
+    elif dialect == 'postgresql':
+        # Building the index indexes every existing row, so no separate backfill.
+        op.execute(f"CREATE INDEX IF NOT EXISTS ix_item_search ON item USING gin ({POSTGRES_DOCUMENT})")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute("DROP TRIGGER IF EXISTS item_fts_au")
+        op.execute("DROP TRIGGER IF EXISTS item_fts_ad")
+        op.execute("DROP TRIGGER IF EXISTS item_fts_ai")
+        op.execute("DROP TABLE IF EXISTS item_fts")
+    elif dialect == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_item_search")
@@ -0,0 +1,46 @@
+"""Archive table for old items
+
+Revision ID: b2f8d4a6c0e3
+Revises: a7c3e9b5d1f8
+Create Date: 2026-10-18 22:05:17.904213
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2f8d4a6c0e3'
+down_revision = 'a7c3e9b5d1f8'
+branch_labels = None
+depends_on = None
+
+# The enum types already exist for item (see f1c7a9d3b5e2); SQLite uses VARCHARs.
+item_type = sa.String(length=10).with_variant(
+    postgresql.ENUM('lost', 'found', name='item_type', create_type=False), 'postgresql')
+item_status = sa.String(length=20).with_variant(
+    postgresql.ENUM('active', 'resolved', name='item_status', create_type=False), 'postgresql')
+
+
+def upgrade():
+    op.create_table('item_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('title', sa.String(length=100), nullable=False),
+    sa.Column('description', sa.Text(), nullable=False),
+    sa.Column('item_type', item_type, nullable=False),
+    sa.Column('contact_phone', sa.String(length=20), nullable=False),
+    sa.Column('photo_filename', sa.String(length=255), nullable=True),
+    sa.Column('date_reported', sa.DateTime(), nullable=False),
+    sa.Column('status', item_status, nullable=True),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('archived_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_item_archive_user_id', 'item_archive', ['user_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_item_archive_user_id', table_name='item_archive')
+    op.drop_table('item_archive')
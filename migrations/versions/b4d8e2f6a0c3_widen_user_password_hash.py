@@ -0,0 +1,29 @@
+"""Widen user.password_hash for scrypt hashes
+
+Revision ID: b4d8e2f6a0c3
+Revises: f1c7a9d3b5e2
+Create Date: 2026-10-18 18:21:40.116583
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b4d8e2f6a0c3'
+down_revision = 'f1c7a9d3b5e2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # A batch rebuild on SQLite; "user" has no triggers to lose (unlike item).
+    with op.batch_alter_table('user') as batch_op:
+        batch_op.alter_column('password_hash', type_=sa.String(length=255),
+                              existing_type=sa.String(length=128), existing_nullable=False)
+
+
+def downgrade():
+    with op.batch_alter_table('user') as batch_op:
+        batch_op.alter_column('password_hash', type_=sa.String(length=128),
+                              existing_type=sa.String(length=255), existing_nullable=False)
@@ -0,0 +1,54 @@
+"""Precomputed item counters
+
+Revision ID: c4e1a7d9b3f5
+Revises: b2f8d4a6c0e3
+Create Date: 2026-10-18 23:41:02.518734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4e1a7d9b3f5'
+down_revision = 'b2f8d4a6c0e3'
+branch_labels = None
+depends_on = None
+
+# Every item, hot and archived; counted as in app/stats.py
+ITEMS = """(SELECT item_type, status, date_reported, user_id FROM item
+    UNION ALL SELECT item_type, status, date_reported, user_id FROM item_archive)"""
+
+
+def upgrade():
+    op.create_table('item_stat',
+    sa.Column('dimension', sa.String(length=20), nullable=False),
+    sa.Column('bucket', sa.String(length=100), nullable=False),
+    sa.Column('item_type', sa.String(length=10), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('dimension', 'bucket', 'item_type', 'status')
+    )
+
+    if op.get_bind().dialect.name == 'postgresql':
+        day = 'CAST(CAST(i.date_reported AS DATE) AS VARCHAR)'
+    else:
+        day = 'date(i.date_reported)'
+    item_type = 'CAST(i.item_type AS VARCHAR)'
+    status = "COALESCE(CAST(i.status AS VARCHAR), 'active')"
+    for dimension, bucket, join in (
+        ('all', None, ''),
+        ('department', 'u.department', 'JOIN "user" u ON u.id = i.user_id'),
+        ('day', day, ''),
+    ):
+        groups = ', '.join(filter(None, (bucket, item_type, status)))
+        bucket = bucket or "''"
+        op.execute(
+            'INSERT INTO item_stat (dimension, bucket, item_type, status, count) '
+            f"SELECT '{dimension}', {bucket}, {item_type}, {status}, COUNT(*) "
+            f'FROM {ITEMS} i {join} GROUP BY {groups}'
+        )
+
+
+def downgrade():
+    op.drop_table('item_stat')
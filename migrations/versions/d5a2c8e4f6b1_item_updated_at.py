@@ -0,0 +1,29 @@
+"""Item modification time
+
+Revision ID: d5a2c8e4f6b1
+Revises: c4e1a7d9b3f5
+Create Date: 2026-10-19 10:12:37.640215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5a2c8e4f6b1'
+down_revision = 'c4e1a7d9b3f5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Nullable: on SQLite NOT NULL would mean a batch table rebuild
+    # (dropping the item_fts triggers). The app sets it on every write.
+    op.add_column('item', sa.Column('updated_at', sa.DateTime(), nullable=True))
+    op.execute('UPDATE item SET updated_at = date_reported')
+    op.create_index('ix_item_updated_at', 'item', ['updated_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_item_updated_at', table_name='item')
+    op.drop_column('item', 'updated_at')
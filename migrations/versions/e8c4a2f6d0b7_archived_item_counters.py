@@ -0,0 +1,29 @@
+"""Counters of archived items
+
+Revision ID: e8c4a2f6d0b7
+Revises: d5a2c8e4f6b1
+Create Date: 2026-10-19 11:02:54.381726
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8c4a2f6d0b7'
+down_revision = 'd5a2c8e4f6b1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # As counted by app/stats.py
+    op.execute(
+        'INSERT INTO item_stat (dimension, bucket, item_type, status, count) '
+        "SELECT 'archived', '', CAST(item_type AS VARCHAR), COALESCE(CAST(status AS VARCHAR), 'active'), COUNT(*) "
+        'FROM item_archive GROUP BY 3, 4'
+    )
+
+
+def downgrade():
+    op.execute("DELETE FROM item_stat WHERE dimension = 'archived'")
@@ -0,0 +1,50 @@
+"""Indexes for filtered item lists and the user_id foreign key; enum item_type/status
+
+Revision ID: f1c7a9d3b5e2
+Revises: d6b2a8c4f1e9
+Create Date: 2026-10-18 17:40:12.502931
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1c7a9d3b5e2'
+down_revision = 'd6b2a8c4f1e9'
+branch_labels = None
+depends_on = None
+
+item_type = sa.Enum('lost', 'found', name='item_type')
+item_status = sa.Enum('active', 'resolved', name='item_status')
+
+
+def upgrade():
+    # SQLite has no enum type and ALTER COLUMN would mean a batch table
+    # rebuild (dropping the item_fts triggers), so it keeps its VARCHARs.
+    # Elsewhere convert first, so the new indexes are built only once.
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite':
+        item_type.create(bind, checkfirst=True)
+        item_status.create(bind, checkfirst=True)
+        op.alter_column('item', 'item_type', type_=item_type, existing_nullable=False,
+                        postgresql_using='item_type::item_type')
+        op.alter_column('item', 'status', type_=item_status, existing_nullable=True,
+                        postgresql_using='status::item_status')
+
+    op.create_index('ix_item_item_type_date_reported_id', 'item', ['item_type', 'date_reported', 'id'], unique=False)
+    op.create_index('ix_item_status_date_reported_id', 'item', ['status', 'date_reported', 'id'], unique=False)
+    op.create_index('ix_item_user_id', 'item', ['user_id'], unique=False)
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite':
+        op.alter_column('item', 'status', type_=sa.String(length=20), existing_nullable=True)
+        op.alter_column('item', 'item_type', type_=sa.String(length=10), existing_nullable=False)
+        item_status.drop(bind, checkfirst=True)
+        item_type.drop(bind, checkfirst=True)
+
+    op.drop_index('ix_item_user_id', table_name='item')
+    op.drop_index('ix_item_status_date_reported_id', table_name='item')
+    op.drop_index('ix_item_item_type_date_reported_id', table_name='item')
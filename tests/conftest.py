@@ -0,0 +1,116 @@
+"""Shared pytest fixtures: an in-memory app database and query counting."""
+import os
+import sys
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+# Must be set before the app is imported: config.Config reads them at import time
+os.environ['DATABASE_URL'] = 'sqlite://'
+os.environ['NOTIFY_TRANSPORT'] = 'fake'
+os.environ['FEED_POLL_INTERVAL'] = '0'  # no poller thread; tests call feed.broker.poll()
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from sqlalchemy import event
+
+from app import app as flask_app, cache, db, feed, matching, notifications, ratelimit
+from app.models import User, Item
+
+
+@pytest.fixture
+def app():
+    # Requests push their own app context (and so their own session and
+    # ``g``); only setup and teardown run in this one.
+    flask_app.config.update(TESTING=True)
+    with flask_app.app_context():
+        db.create_all()
+    yield flask_app
+    with flask_app.app_context():
+        db.drop_all()
+    cache.backend.clear()
+    matching.index.clear()
+    notifications.transport.outbox.clear()
+    ratelimit.backend.clear()
+    feed.broker.reset()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def make_user(n=0, **fields):
+    """Insert a user; call inside an app context."""
+    values = dict(
+        name=f'User {n}',
+        campus_id=f'ATU{n:05d}',
+        email=f'user{n}@example.com',
+        phone=f'+23355{n:07d}',
+        department='Computer Science',
+        password_hash='x',
+    )
+    values.update(fields)
+    user = User(**values)
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def make_items(count, start=0):
+    """Insert ``count`` items, each reported by its own user."""
+    base = datetime(2025, 1, 1)
+    for n in range(start, start + count):
+        user = make_user(n)
+        db.session.add(Item(
+            title=f'Black wallet {n}',
+            description='Leather wallet left near the library',
+            item_type='lost' if n % 2 else 'found',
+            contact_phone=user.phone,
+            date_reported=base + timedelta(minutes=n),
+            user_id=user.id,
+        ))
+    db.session.commit()
+
+
+def login(client, user):
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user.id)
+        session['_fresh'] = True
+
+
+@contextmanager
+def count_queries():
+    """Collect every SQL statement executed inside the block."""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with flask_app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+
+
+def assert_queries_do_not_scale(client, url, small=2, large=12):
+    """Fail if rendering ``url`` issues more queries for more rows (N+1).
+
+    ``url`` is fetched once with ``small`` items in the database and once
+    with ``large``; both responses must use the same number of queries.
+    """
+    client.get(url)  # warm up one-off lookups (e.g. search backend detection)
+    counts = []
+    for start, count in ((0, small), (small, large - small)):
+        with flask_app.app_context():
+            make_items(count, start=start)
+        with count_queries() as statements:
+            response = client.get(url)
+        assert response.status_code == 200, response.status
+        counts.append(len(statements))
+    assert counts[0] == counts[1], (
+        f'{url} issued {counts[0]} queries for {small} items '
+        f'but {counts[1]} for {large}'
+    )
@@ -0,0 +1,109 @@
+# Tests for archiving old items
+import gzip
+import hashlib
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from app import archive, db, jobs, storage
+from app.models import Blob, Item, ItemArchive, Job
+from conftest import make_items, make_user
+
+PHOTO_BYTES = b'\xff\xd8\xff\xe0 not really a jpeg'
+PHOTO = hashlib.sha256(PHOTO_BYTES).hexdigest() + '.jpg'
+
+
+@pytest.fixture
+def stores(app, tmp_path, monkeypatch):
+    uploads = tmp_path / 'uploads'
+    uploads.mkdir()
+    for module in (storage, archive):
+        monkeypatch.setattr(module, 'upload_dir', lambda: str(uploads))
+    app.config['ARCHIVE_PHOTO_DIR'] = str(tmp_path / 'cold')
+    yield uploads, tmp_path / 'cold'
+    app.config['ARCHIVE_PHOTO_DIR'] = None
+
+
+def add_item(user, reported, status='active', photo=None):
+    item = Item(title='Grey scarf', description='Wool', item_type='lost', contact_phone=user.phone,
+                date_reported=reported, status=status, user_id=user.id, photo_filename=photo)
+    db.session.add(item)
+    db.session.commit()
+    return item.id
+
+
+def test_old_items_move_to_archive_with_their_photos(app, client, stores):
+    uploads, cold = stores
+    (uploads / PHOTO).write_bytes(PHOTO_BYTES)
+    now = datetime.now()
+    with app.app_context():
+        user = make_user(1)
+        resolved = add_item(user, now - timedelta(days=100), 'resolved', PHOTO)
+        stale = add_item(user, now - timedelta(days=400))
+        recent_resolved = add_item(user, now - timedelta(days=5), 'resolved')
+        active = add_item(user, now - timedelta(days=100), photo=PHOTO)
+        newest = add_item(user, now - timedelta(days=500), 'resolved')
+
+        assert archive.archive_items(batch_size=1) == 2
+        remaining = {item_id for (item_id,) in db.session.query(Item.id)}
+        assert remaining == {recent_resolved, active, newest}
+        assert {row.id for row in ItemArchive.query} == {resolved, stale}
+        # Still used by a hot item: the upload stays, counted once
+        assert db.session.get(Blob, PHOTO.split('.')[0]).ref_count == 1
+        assert (uploads / PHOTO).exists()
+
+        db.session.delete(db.session.get(Item, active))
+        db.session.commit()
+    assert gzip.decompress((cold / (PHOTO + '.gz')).read_bytes()) == PHOTO_BYTES
+
+    response = client.get(f'/item/{resolved}')
+    assert response.status_code == 200
+    assert f'/archive/photos/{PHOTO}'.encode() in response.data
+    assert b'Archived:' in response.data
+
+    # Only the cold copy is left once no hot item uses the photo
+    with app.app_context():
+        storage.delete_upload(PHOTO)
+        db.session.commit()
+    response = client.get(f'/archive/photos/{PHOTO}', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.data) == PHOTO_BYTES
+    response = client.get(f'/archive/photos/{PHOTO}')
+    assert 'Content-Encoding' not in response.headers
+    assert response.data == PHOTO_BYTES
+    assert client.get('/item/999').status_code == 404
+
+
+def test_unused_upload_leaves_hot_store(app, stores):
+    uploads, cold = stores
+    (uploads / PHOTO).write_bytes(PHOTO_BYTES)
+    with app.app_context():
+        user = make_user(1)
+        add_item(user, datetime.now() - timedelta(days=400), photo=PHOTO)
+        make_items(1, start=2)
+        assert archive.archive_items() == 1
+        assert db.session.get(Blob, PHOTO.split('.')[0]) is None
+    assert not (uploads / PHOTO).exists()
+    assert (cold / (PHOTO + '.gz')).exists()
+
+
+def test_periodic_job_is_queued_once_per_slot(app, monkeypatch):
+    clock = SimpleNamespace(time=lambda: 10 * 3600 + 5, monotonic=time.monotonic)
+    monkeypatch.setattr(jobs, 'time', clock)
+    monkeypatch.setitem(app.config, 'ARCHIVE_INTERVAL', 3600)
+    monkeypatch.setitem(app.config, 'STATS_RECONCILE_INTERVAL', 0)  # only archive_items here
+    with app.app_context():
+        jobs.schedule_periodic()
+        jobs.schedule_periodic()  # a second worker starting
+        job = Job.query.one()
+        assert (job.kind, job.idempotency_key) == ('archive_items', 'archive_items:11')
+
+        # An hour later, the run queues the next one
+        clock.time = lambda: 11 * 3600 + 1
+        job.run_at = datetime.now()
+        db.session.commit()
+        assert jobs.work(once=True) == 1
+        keys = [(job.idempotency_key, job.status) for job in Job.query.order_by(Job.id)]
+        assert keys == [('archive_items:11', 'done'), ('archive_items:12', 'queued')]
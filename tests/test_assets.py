@@ -0,0 +1,38 @@
+# Tests for fingerprinted static assets
+import gzip
+
+import pytest
+from flask import url_for
+
+from app import assets
+
+
+@pytest.fixture
+def static(tmp_path, monkeypatch):
+    (tmp_path / 'css').mkdir()
+    (tmp_path / 'css' / 'global.css').write_text('body {\n    color: #ff0000;\n}\n')
+    monkeypatch.setattr(assets, 'static_dir', lambda: str(tmp_path))
+    monkeypatch.setattr(assets, '_manifest', {})  # restored afterwards
+    assets.build()
+    assets.load_manifest()
+    return tmp_path
+
+
+def test_static_urls_resolve_to_immutable_precompressed_files(app, client, static):
+    with app.test_request_context():
+        url = url_for('static', filename='css/global.css')
+    assert url == f"/static/{assets._manifest['css/global.css']}"
+    assert assets.FINGERPRINT_RE.match(url[len('/static/'):])
+
+    response = client.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200 and response.mimetype == 'text/css'
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    assert response.cache_control.immutable and response.cache_control.public
+    assert response.cache_control.max_age == assets.IMMUTABLE_MAX_AGE
+    assert gzip.decompress(response.data) == (static / url[len('/static/'):]).read_bytes()
+
+    plain = client.get(url)
+    assert 'Content-Encoding' not in plain.headers and plain.data.startswith(b'body')
+    # The unversioned path may change under the same name: no immutable caching.
+    assert not client.get('/static/css/global.css').cache_control.immutable
@@ -1 +1,88 @@
 # Tests for authentication logic
+import pytest
+from werkzeug.security import generate_password_hash
+
+from app import db, passwords
+from app.auth import update_user_password
+from app.models import User
+from conftest import count_queries, login, make_user
+
+FAST = 'pbkdf2:sha256:1000'
+
+
+@pytest.fixture
+def hashing(app):
+    """Cheap hash parameters; yields the config to tweak before the first hash."""
+    saved = {key: app.config[key] for key in app.config if key.startswith('PASSWORD_HASH_')}
+    app.config['PASSWORD_HASH_METHOD'] = FAST
+    passwords.shutdown()
+    yield app.config
+    app.config.update(saved)
+    passwords.shutdown()
+
+
+def test_login_rehashes_outdated_password_hash(app, client, hashing):
+    with app.app_context():
+        make_user(1, password_hash=generate_password_hash('secret123', 'pbkdf2:sha256:2000'))
+
+    response = client.post('/login', data={'campus_id': 'ATU00001', 'password': 'secret123'})
+    assert response.status_code == 302
+    with app.app_context():
+        stored = db.session.get(User, 1).password_hash
+    assert stored.startswith(FAST + '$')
+
+    client.get('/logout')
+    response = client.post('/login', data={'campus_id': 'ATU00001', 'password': 'secret123'})
+    assert response.status_code == 302
+    with app.app_context():
+        assert db.session.get(User, 1).password_hash == stored
+
+
+def test_wrong_password_keeps_hash(app, client, hashing):
+    original = generate_password_hash('secret123', 'pbkdf2:sha256:2000')
+    with app.app_context():
+        make_user(1, password_hash=original)
+    response = client.post('/login', data={'campus_id': 'ATU00001', 'password': 'guess'})
+    assert response.status_code == 200
+    with app.app_context():
+        assert db.session.get(User, 1).password_hash == original
+
+
+def test_login_is_refused_when_every_hashing_slot_is_busy(app, client, hashing):
+    hashing.update(PASSWORD_HASH_MAX_PENDING=0, PASSWORD_HASH_WAIT=0, PASSWORD_HASH_WORKERS=0)
+    with app.app_context():
+        make_user(1, password_hash=generate_password_hash('secret123', FAST))
+    response = client.post('/login', data={'campus_id': 'ATU00001', 'password': 'secret123'})
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == str(passwords.RETRY_AFTER)
+
+
+def test_signed_in_page_views_do_not_query_the_user(app, client):
+    with app.app_context():
+        login(client, make_user(1))
+    client.get('/about')
+    with count_queries() as statements:
+        response = client.get('/about')
+    assert b'User 1' in response.data
+    assert statements == []
+
+
+def test_profile_and_password_changes_refresh_the_principal(app, client, hashing):
+    with app.app_context():
+        login(client, make_user(1))
+    client.get('/about')
+
+    with app.app_context():
+        user = db.session.get(User, 1)
+        user.name = 'Ama Mensah'
+        db.session.commit()
+        assert user.version == 2
+    assert b'Ama Mensah' in client.get('/about').data
+
+    with app.app_context():
+        update_user_password(db.session.get(User, 1), 'new-secret')
+    with count_queries() as statements:
+        client.get('/about')
+    assert len(statements) == 1
+    with app.app_context():
+        assert db.session.get(User, 1).version == 3
@@ -0,0 +1,102 @@
+# Tests for flask items export/import
+import hashlib
+import json
+import os
+from datetime import datetime
+
+import pytest
+
+from app import bulk, db, stats, storage
+from app.models import Blob, ImportCheckpoint, Item, User
+from conftest import make_items, make_user
+
+DIGEST = hashlib.sha256(b'photo').hexdigest()
+PHOTO = DIGEST + '.jpg'
+
+
+@pytest.fixture
+def uploads(tmp_path, monkeypatch):
+    directory = tmp_path / 'uploads'
+    (directory / 'variants').mkdir(parents=True)
+    monkeypatch.setattr(storage, 'upload_dir', lambda: str(directory))
+    monkeypatch.setattr(bulk, 'upload_dir', lambda: str(directory))
+    return directory
+
+
+def run(app, *args):
+    return app.test_cli_runner().invoke(args=['items', *args])
+
+
+def test_users_and_items_round_trip_with_photos(app, tmp_path, uploads):
+    (uploads / PHOTO).write_bytes(b'photo')
+    (uploads / 'variants' / (DIGEST + '-card.jpeg')).write_bytes(b'card')
+    with app.app_context():
+        make_items(3)
+        item = Item.query.first()
+        item.description = 'Brown, "leather"\nwallet'
+        item.photo_filename = PHOTO
+        item.photo_variants = {'card': {'width': 480, 'jpeg': f'variants/{DIGEST}-card.jpeg'}}
+        db.session.commit()
+
+    photos = tmp_path / 'photos'
+    assert run(app, 'export', '--table', 'users', str(tmp_path / 'users.csv')).exit_code == 0
+    result = run(app, 'export', str(tmp_path / 'items.csv'), '--photos', str(photos))
+    assert result.exit_code == 0, result.output
+    assert 'Exported 3 items' in result.output
+
+    # A fresh database and upload directory, as in another environment
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    for path in (uploads / PHOTO, *(uploads / 'variants').iterdir()):
+        os.remove(path)
+
+    assert run(app, 'import', '--table', 'users', str(tmp_path / 'users.csv')).exit_code == 0
+    result = run(app, 'import', str(tmp_path / 'items.csv'), '--photos', str(photos), '--batch-size', '2')
+    assert result.exit_code == 0, result.output
+    assert 'imported 3 items' in result.output
+
+    with app.app_context():
+        assert User.query.count() == 3
+        item = Item.query.filter_by(photo_filename=PHOTO).one()
+        assert item.description == 'Brown, "leather"\nwallet'
+        assert item.user.campus_id == 'ATU00000'
+        assert item.photo_variants['card']['width'] == 480
+        assert db.session.get(Blob, DIGEST).ref_count == 1
+        assert db.session.get(ImportCheckpoint, 'items:items.csv').position == 3
+        assert stats.summary()['totals'] == {'lost': {'active': 1, 'resolved': 0},
+                                             'found': {'active': 2, 'resolved': 0}}
+    assert (uploads / PHOTO).read_bytes() == b'photo'
+    assert (uploads / 'variants' / (DIGEST + '-card.jpeg')).exists()
+
+
+def test_failed_import_resumes_after_last_batch(app, tmp_path, uploads):
+    with app.app_context():
+        for n in range(2):
+            make_user(n)
+    records = [
+        {'user_campus_id': f'ATU0000{n % 2}', 'title': f'Umbrella {n}', 'description': 'Blue',
+         'item_type': 'lost', 'contact_phone': '+233000000000',
+         'date_reported': datetime(2025, 1, 1, n).isoformat()}
+        for n in range(5)
+    ]
+    records[3]['item_type'] = 'stolen'
+    records.append(dict(records[0], user_campus_id='NOBODY'))
+    path = tmp_path / 'items.ndjson'
+    path.write_text(''.join(json.dumps(record) + '\n' for record in records))
+
+    result = run(app, 'import', str(path), '--batch-size', '2')
+    assert result.exit_code == 1
+    assert 'Record 4: item_type' in result.output
+    with app.app_context():
+        assert Item.query.count() == 2  # the first batch only
+
+    records[3]['item_type'] = 'found'
+    path.write_text(''.join(json.dumps(record) + '\n' for record in records))
+    result = run(app, 'import', str(path), '--batch-size', '2')
+    assert result.exit_code == 0, result.output
+    assert 'Resuming items:items.ndjson after record 2' in result.output
+    assert 'skipped 1 (unknown user)' in result.output
+    with app.app_context():
+        titles = [title for (title,) in db.session.query(Item.title).order_by(Item.id)]
+        assert titles == [f'Umbrella {n}' for n in range(5)]
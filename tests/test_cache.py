@@ -0,0 +1,58 @@
+# Tests for page, fragment and query caching
+from itertools import count
+
+from app import cache, db
+from app.models import Item, User
+from conftest import count_queries, login, make_items, make_user
+
+
+def fragment(key, renders, user_id=None):
+    return str(cache.cached_fragment('test', key, caller=lambda: str(next(renders)), user_id=user_id))
+
+
+def test_query_cache_hits_until_its_table_changes(app):
+    calls = count()
+    with app.app_context():
+        make_items(1)
+        assert cache.get_or_set('query', ('q',), lambda: next(calls), tables=('item',)) == 0
+        assert cache.get_or_set('query', ('q',), lambda: next(calls), tables=('item',)) == 0
+        assert cache.CACHE_REQUESTS.value(cache='query', result='hit') >= 1
+
+        Item.query.first().status = 'resolved'
+        db.session.commit()
+        assert cache.get_or_set('query', ('q',), lambda: next(calls), tables=('item',)) == 1
+
+
+def test_fragments_drop_only_for_their_reporters_shown_fields(app):
+    renders = count()
+    with app.app_context():
+        alice, bob = make_user(1), make_user(2)
+        assert fragment(1, renders, alice.id) == fragment(1, renders, alice.id) == '0'
+        assert fragment(2, renders, bob.id) == '1'
+
+        # A login rehash, or any field not shown with items: nothing drops.
+        alice.password_hash = 'rehashed'
+        db.session.commit()
+        assert (fragment(1, renders, alice.id), fragment(2, renders, bob.id)) == ('0', '1')
+
+        bob.name = 'Robert'
+        db.session.commit()
+        assert (fragment(1, renders, alice.id), fragment(2, renders, bob.id)) == ('0', '2')
+
+
+def test_pages_are_cached_for_anonymous_visitors_only(app, client):
+    with app.app_context():
+        make_items(1)
+        item_id = Item.query.first().id
+        user = db.session.get(User, make_user(99).id)
+
+    client.get(f'/item/{item_id}')
+    with count_queries() as statements:
+        assert client.get(f'/item/{item_id}').status_code == 200
+    assert len(statements) == 1  # the ETag validator; the page came from the cache
+
+    login(client, user)
+    hits = cache.CACHE_REQUESTS.value(cache='page', result='hit')
+    client.get(f'/item/{item_id}')
+    client.get(f'/item/{item_id}')
+    assert cache.CACHE_REQUESTS.value(cache='page', result='hit') == hits
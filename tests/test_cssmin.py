@@ -0,0 +1,31 @@
+# Tests for the stylesheet minifier
+import pytest
+
+from app.cssmin import minify
+
+SHARED = '.btn { color: red; }\n.card { padding: 1px; }'
+
+
+def test_whitespace_comments_and_later_duplicates_go():
+    css = '/* page */\n.a { color : red ; }\n.b > .c , .d { margin: 0 }\n.a { color: red; }'
+    assert minify(css) == '.b>.c,.d{margin:0}.a{color:red}'
+
+
+@pytest.mark.parametrize('shared, page, expected', [
+    # Already provided by the shared sheet, and nothing in between touches color.
+    (SHARED, '.btn { color: red; } .x { top: 0 }', '.x{top:0}'),
+    # A later shared rule may match the same element: the page copy wins over it.
+    (SHARED + '\n.primary { color: blue; }', '.btn { color: red; }', '.btn{color:red}'),
+    # So may an earlier page rule, whatever its selector.
+    (SHARED, '.link { color: blue; } .btn { color: red; }', '.link{color:blue}.btn{color:red}'),
+    # Shorthands and longhands count as the same property.
+    ('.btn { margin-top: 1px; } .z { margin: 0; }', '.btn { margin-top: 1px; }', '.btn{margin-top:1px}'),
+    # Not the shared sheet's last word on the selector.
+    (SHARED + '\n.btn { color: green; }', '.btn { color: red; }', '.btn{color:red}'),
+    ('@media (max-width: 600px) { .btn { color: red; } }',
+     '@media (max-width: 600px) { .btn { color: red; } }', ''),
+    ('@media (max-width: 600px) { .btn { color: red; } } .a { color: blue; }',
+     '@media (max-width: 600px) { .btn { color: red; } }', '@media (max-width: 600px){.btn{color:red}}'),
+])
+def test_page_rules_repeating_the_shared_sheet(shared, page, expected):
+    assert minify(page, shared) == expected
@@ -0,0 +1,27 @@
+# Tests for engine options and connection tuning
+from sqlalchemy import create_engine, text
+
+from app import app
+from app.engine import POOL_CHECKOUT_SECONDS, TimedQueuePool, engine_options
+
+
+def options_for(uri, **overrides):
+    return engine_options(dict(app.config, SQLALCHEMY_DATABASE_URI=uri, **overrides))
+
+
+def test_postgres_gets_a_bounded_pre_pinged_pool_with_statement_timeout():
+    options = options_for('postgresql://app@db/lostfound', SQLALCHEMY_ENGINE_OPTIONS={'pool_size': 2})
+    assert options['poolclass'] is TimedQueuePool and options['pool_pre_ping']
+    assert options['pool_size'] == 2  # explicit engine options win
+    assert 'statement_timeout=' in options['connect_args']['options']
+    assert options_for('sqlite://') == {}
+
+
+def test_sqlite_file_connections_use_wal_and_are_timed(tmp_path):
+    engine = create_engine(f'sqlite:///{tmp_path}/app.db', **options_for(f'sqlite:///{tmp_path}/app.db'))
+    before = POOL_CHECKOUT_SECONDS.value()[0]
+    with engine.connect() as connection:
+        assert connection.execute(text('PRAGMA journal_mode')).scalar() == 'wal'
+        assert connection.execute(text('PRAGMA synchronous')).scalar() == 1  # NORMAL
+    assert POOL_CHECKOUT_SECONDS.value()[0] == before + 1
+    engine.dispose()
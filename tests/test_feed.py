@@ -0,0 +1,73 @@
+# Tests for the live item feed (Server-Sent Events)
+import json
+from datetime import datetime
+
+from app import db, feed
+from app.models import Item
+from conftest import make_user
+
+
+def add_item(user_id, title, item_type='lost'):
+    item = Item(title=title, description='Left in the library', item_type=item_type,
+                contact_phone='+233000000000', date_reported=datetime.now(), user_id=user_id)
+    db.session.add(item)
+    db.session.commit()
+    return item.id
+
+
+def open_feed(client, url, **headers):
+    response = client.get(url, headers=headers, buffered=False)
+    assert response.mimetype == 'text/event-stream'
+    frames = (chunk.decode() for chunk in response.response)
+    assert next(frames).startswith('retry:')
+    return response, frames
+
+
+def event_data(frame):
+    lines = dict(line.split(': ', 1) for line in frame.strip().split('\n'))
+    assert lines['event'] == 'item'
+    return json.loads(lines['data'])
+
+
+def test_feed_pushes_matching_new_items(app, client, monkeypatch):
+    with app.app_context():
+        user = make_user(1).id
+        add_item(user, 'Old umbrella')
+    # Filters ignore case; items reported before the first poll still count.
+    response, frames = open_feed(client, '/api/items/feed?type=LOST&search=Umbrel&cards=1')
+    with app.app_context():
+        add_item(user, 'Found umbrella', 'found')
+        add_item(user, 'Black wallet')
+        wanted = add_item(user, 'Red UMBRELLA')
+        assert feed.broker.poll() == 3
+
+    item = event_data(next(frames))
+    assert (item['id'], item['title']) == (wanted, 'Red UMBRELLA')
+    assert f'data-item-id="{wanted}"' in item['html']
+    monkeypatch.setitem(app.config, 'FEED_HEARTBEAT', 0.01)
+    assert next(frames) == ': ping\n\n'
+    response.close()
+    assert not feed.broker._subscriptions
+
+
+def test_reconnect_replays_missed_items_and_slow_clients_are_dropped(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, 'FEED_QUEUE_SIZE', 1)
+    with app.app_context():
+        user = make_user(1).id
+        seen = add_item(user, 'Blue umbrella')
+        missed = [add_item(user, f'Umbrella {n}') for n in range(2)]
+    response, frames = open_feed(client, '/api/items/feed', **{'Last-Event-ID': str(seen)})
+    assert [event_data(next(frames))['id'] for _ in missed] == missed
+
+    with app.app_context():
+        feed.broker.poll()
+        for n in range(2):
+            add_item(user, f'Green umbrella {n}')
+        feed.broker.poll()  # two events for a queue of one
+    assert not feed.broker._subscriptions
+    assert list(frames) == []  # the stream ends; the browser reconnects
+    response.close()
+
+    monkeypatch.setitem(app.config, 'FEED_MAX_SUBSCRIBERS', 0)
+    assert client.get('/api/items/feed').status_code == 503
+    assert client.get('/api/items/feed?type=stolen').status_code == 400
@@ -0,0 +1,62 @@
+# Tests for photo variants
+import pytest
+from PIL import Image
+
+from app import images
+
+
+@pytest.fixture
+def uploads(tmp_path, monkeypatch):
+    monkeypatch.setattr(images, 'upload_dir', lambda: str(tmp_path))
+    return tmp_path
+
+
+def save_photo(path, size, orientation=None):
+    """A landscape JPEG, red above blue, optionally tagged with an EXIF orientation."""
+    width, height = size
+    image = Image.new('RGB', size, (220, 20, 20))
+    image.paste((20, 20, 220), (0, height // 2, width, height))
+    exif = Image.Exif()
+    exif[0x010F] = 'Test Camera'  # Make
+    if orientation:
+        exif[0x0112] = orientation
+    image.save(path, 'JPEG', exif=exif.tobytes())
+
+
+def test_variants_are_resized_and_encoded_without_exif(uploads):
+    save_photo(uploads / 'photo.jpg', (2000, 1000))
+    variants = images.build_variants('photo.jpg')
+
+    assert {name: variant['width'] for name, variant in variants.items()} == {
+        'thumb': 320, 'card': 640, 'full': 1280}
+    for variant in variants.values():
+        for ext, pil_format in (('webp', 'WEBP'), ('jpeg', 'JPEG')):
+            with Image.open(uploads / variant[ext]) as image:
+                assert image.format == pil_format and image.mode == 'RGB'
+                assert image.size == (variant['width'], variant['width'] // 2)
+                assert not image.getexif()
+
+
+def test_small_photos_are_not_enlarged(uploads):
+    save_photo(uploads / 'small.jpg', (200, 100))
+    variants = images.build_variants('small.jpg')
+    assert {variant['width'] for variant in variants.values()} == {200}
+
+
+def test_exif_orientation_is_applied(uploads):
+    # 6: the camera was turned clockwise, so the picture must be too.
+    save_photo(uploads / 'turned.jpg', (2000, 1000), orientation=6)
+    variants = images.build_variants('turned.jpg')
+
+    with Image.open(uploads / variants['card']['jpeg']) as image:
+        assert image.size == (320, 640)
+        red, blue = image.getpixel((300, 320)), image.getpixel((20, 320))
+    assert red[0] > 150 > red[2] and blue[2] > 150 > blue[0]
+
+
+def test_huge_canvas_is_refused_before_decoding(app, uploads, monkeypatch):
+    monkeypatch.setitem(app.config, 'MAX_IMAGE_PIXELS', 1000 * 1000)
+    save_photo(uploads / 'bomb.jpg', (2000, 1000))
+    with pytest.raises(Image.DecompressionBombError):
+        images.build_variants('bomb.jpg')
+    assert not list((uploads / images.VARIANT_DIR).iterdir())
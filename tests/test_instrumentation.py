@@ -0,0 +1,29 @@
+# Tests for request instrumentation
+import logging
+
+from app.instrumentation import REQUEST_QUERIES
+from conftest import make_items
+
+
+def test_server_timing_and_metrics_count_queries(app, client):
+    with app.app_context():
+        make_items(3)
+    before = REQUEST_QUERIES.value(endpoint='api.api_get_items')[0]
+
+    response = client.get('/api/items')
+    assert response.headers['Server-Timing'].startswith('db;dur=')
+    assert REQUEST_QUERIES.value(endpoint='api.api_get_items')[0] == before + 1
+
+    metrics = client.get('/metrics').get_data(as_text=True)
+    assert 'http_requests_total{endpoint="api.api_get_items",method="GET",status="200"}' in metrics
+
+
+def test_slow_requests_are_logged_with_their_sql(app, client, caplog):
+    app.config['SLOW_REQUEST_MS'] = 0
+    try:
+        with caplog.at_level(logging.WARNING, logger='app.slow'):
+            client.get('/api/items')
+    finally:
+        app.config['SLOW_REQUEST_MS'] = 500
+    assert 'Slow request: GET /api/items -> 200' in caplog.text
+    assert 'FROM item' in caplog.text
@@ -0,0 +1,104 @@
+# Tests for the background job queue
+from datetime import datetime
+
+import pytest
+
+from app import db, images, jobs
+from app.models import Item, Job
+from app.notifications import transport
+from conftest import login, make_user
+
+
+@pytest.fixture
+def flaky_handler():
+    calls = []
+
+    def fail(**payload):
+        calls.append(payload)
+        raise RuntimeError('gateway timeout')
+
+    jobs.HANDLERS['flaky'] = fail
+    yield calls
+    del jobs.HANDLERS['flaky']
+
+
+def test_enqueue_is_idempotent_and_worker_delivers(app):
+    with app.app_context():
+        for _ in range(2):
+            jobs.enqueue('email', {'to': 'a@example.com', 'subject': 'Hi', 'body': 'x'}, key='hello')
+        db.session.commit()
+        assert Job.query.count() == 1
+
+        assert jobs.work(once=True) == 1
+        assert Job.query.one().status == 'done'
+    assert [message['to'] for message in transport.outbox] == ['a@example.com']
+
+
+def test_failing_job_backs_off_then_fails(app, flaky_handler):
+    with app.app_context():
+        jobs.enqueue('flaky', {'n': 1}, max_attempts=2)
+        db.session.commit()
+
+        assert jobs.work(once=True) == 1
+        job = Job.query.one()
+        assert (job.status, job.attempts) == ('queued', 1)
+        assert job.run_at > datetime.now() and 'gateway timeout' in job.last_error
+        assert jobs.work(once=True) == 0  # not due yet
+
+        job.run_at = datetime.now()
+        db.session.commit()
+        jobs.work(once=True)
+        assert Job.query.one().status == 'failed'
+    assert len(flaky_handler) == 2
+
+
+def test_failed_photo_job_is_retried(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(images, 'upload_dir', lambda: str(tmp_path))
+    (tmp_path / 'broken.jpg').write_bytes(b'not an image')
+    with app.app_context():
+        user = make_user(1)
+        item = Item(title='Keys', description='Keys', item_type='lost', contact_phone='1',
+                    date_reported=datetime.now(), user_id=user.id, photo_filename='broken.jpg')
+        db.session.add(item)
+        db.session.flush()
+        images.submit_item_photo(item.id)
+        db.session.commit()
+
+        assert jobs.work(once=True) == 1
+        job = Job.query.filter_by(kind='item_photo').one()
+        assert (job.status, job.attempts) == ('queued', 1)
+        assert job.run_at > datetime.now() and 'UnidentifiedImageError' in job.last_error
+        assert db.session.get(Item, item.id).photo_variants is None
+
+
+def test_rolled_back_report_queues_nothing(app):
+    with app.app_context():
+        user = make_user(1)
+        db.session.add(Item(title='Keys', description='Keys', item_type='lost', contact_phone='1',
+                            date_reported=datetime.now(), user_id=user.id))
+        db.session.flush()
+        jobs.enqueue('email', {'to': user.email, 'subject': 's', 'body': 'b'})
+        db.session.rollback()
+        assert Job.query.count() == 0
+
+
+def test_report_notifies_both_reporters_of_a_match(app, client):
+    with app.app_context():
+        finder = make_user(1)
+        db.session.add(Item(title='Black leather wallet', description='Found by the gym',
+                            item_type='found', contact_phone=finder.phone,
+                            date_reported=datetime.now(), user_id=finder.id))
+        db.session.commit()
+        login(client, make_user(2))
+
+    response = client.post('/report_lost', data={
+        'title': 'Black wallet', 'description': 'Leather wallet, lost near the gym',
+        'contact_phone': '+233550000002',
+    })
+    assert response.status_code == 302 and '/item/' in response.location
+    assert transport.outbox == []  # nothing is sent inside the request
+
+    with app.app_context():
+        jobs.work(once=True)
+    assert sorted(message['to'] for message in transport.outbox) == [
+        'user1@example.com', 'user2@example.com']
@@ -0,0 +1,63 @@
+# Tests for lost/found matching
+from datetime import datetime
+
+from app import db, matching
+from app.matching import MatchIndex, find_matches, tokenize
+from app.models import Item
+from conftest import make_user
+
+
+def test_tokenize_drops_stopwords_and_folds_plurals():
+    assert tokenize('Lost my KEYS near the Library!') == ['key', 'library']
+
+
+def test_index_ranks_closest_opposite_item_first():
+    index = MatchIndex()
+    index.add(1, 'found', 'Blue umbrella with wooden handle, cafeteria')
+    index.add(2, 'found', 'Black leather wallet with student ID card')
+    index.add(3, 'found', 'Black backpack in lecture hall')
+    index.add(4, 'lost', 'Black leather wallet')
+    assert [item_id for item_id, _ in index.candidates('found', 'black leather wallet, ID inside')][:1] == [2]
+    assert all(item_id != 4 for item_id, _ in index.candidates('found', 'black leather wallet'))
+
+
+def add_item(user, title, item_type, status='active'):
+    item = Item(title=title, description=title, item_type=item_type, status=status,
+                contact_phone=user.phone, date_reported=datetime(2025, 1, 1), user_id=user.id)
+    db.session.add(item)
+    db.session.commit()
+    return item.id
+
+
+def test_matches_api_returns_active_opposite_items(app, client):
+    with app.app_context():
+        user = make_user(1)
+        lost = add_item(user, 'Black leather wallet', 'lost')
+        found = add_item(user, 'Leather wallet, black', 'found')
+        add_item(user, 'Black leather wallet', 'found', status='resolved')
+        add_item(user, 'Blue umbrella', 'found')
+
+    matches = client.get(f'/api/items/{lost}/matches').get_json()['matches']
+    assert [match['id'] for match in matches] == [found]
+
+    with app.app_context():
+        newer = add_item(make_user(2), 'Black wallet, leather strap', 'found')
+    matches = client.get(f'/api/items/{lost}/matches').get_json()['matches']
+    assert {match['id'] for match in matches} == {found, newer}
+    assert client.get('/api/items/999/matches').status_code == 404
+
+
+def test_stale_items_leave_the_index_instead_of_crowding_out_matches(app):
+    with app.app_context():
+        user = make_user(1)
+        lost = db.session.get(Item, add_item(user, 'Black leather wallet', 'lost'))
+        found = add_item(user, 'Leather wallet', 'found')
+        stale = [add_item(user, 'Black leather wallet', 'found') for _ in range(3)]
+        assert [match.item.id for match in find_matches(lost, k=1)] == [stale[-1]]
+
+        # Resolved or deleted elsewhere: the index only learns at lookup.
+        db.session.execute(db.update(Item).where(Item.id.in_(stale[:2])).values(status='resolved'))
+        db.session.execute(db.delete(Item).where(Item.id == stale[2]))
+        db.session.commit()
+        assert [match.item.id for match in find_matches(lost, k=1)] == [found]
+        assert len(matching.index) == 2
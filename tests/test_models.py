@@ -1 +1,62 @@
 # Tests for models
+import re
+
+import pytest
+from sqlalchemy import event
+
+from app import app as flask_app, db
+from conftest import login, make_items, make_user
+
+# A bare "SCAN item" reads the whole table; "SCAN item USING [COVERING] INDEX"
+# walks an index in order and is what keyset pages over the full list do.
+FULL_SCAN = re.compile(r'\bSCAN (item|user)\b(?! USING)')
+TEMP_SORT = 'USE TEMP B-TREE FOR ORDER BY'
+
+
+def query_plans(client, method, url, **kwargs):
+    """EXPLAIN QUERY PLAN every SELECT that serving ``url`` runs."""
+    captured = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            captured.append((statement, parameters))
+
+    with flask_app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        response = client.open(url, method=method, **kwargs)
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+    assert response.status_code in (200, 302), response.status
+
+    plans = []
+    with flask_app.app_context():
+        connection = db.session.connection()
+        for statement, parameters in captured:
+            rows = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters)
+            plans.append((statement, [row[-1] for row in rows]))
+    return plans
+
+
+@pytest.mark.parametrize('method, url, kwargs, index', [
+    ('GET', '/dashboard', {}, 'ix_item_date_reported_id'),
+    ('GET', '/search?type=lost', {}, 'ix_item_item_type_date_reported_id'),
+    ('GET', '/search?status=resolved', {}, 'ix_item_status_date_reported_id'),
+    ('GET', '/search?type=found&status=active', {}, 'ix_item_'),
+    ('GET', '/item/3', {}, 'INTEGER PRIMARY KEY'),
+    ('GET', '/api/items?limit=5', {}, 'ix_item_date_reported_id'),
+    ('POST', '/login', {'data': {'campus_id': 'ATU00004', 'password': 'wrong'}}, 'sqlite_autoindex_user'),
+])
+def test_hot_queries_use_indexes(app, client, method, url, kwargs, index):
+    with app.app_context():
+        make_items(12)
+        if method == 'GET':
+            login(client, make_user(99))
+
+    plans = query_plans(client, method, url, **kwargs)
+    assert any(index in line for _, plan in plans for line in plan), plans
+    for statement, plan in plans:
+        detail = '\n'.join(plan)
+        assert not FULL_SCAN.search(detail), f'full table scan:\n{statement}\n{detail}'
+        assert TEMP_SORT not in detail, f'sorts instead of reading an index in order:\n{statement}\n{detail}'
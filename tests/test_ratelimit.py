@@ -0,0 +1,51 @@
+# Tests for rate limiting
+import pytest
+
+from app.ratelimit import DatabaseBackend, MemoryBackend, parse_rate
+from conftest import make_user
+
+
+@pytest.mark.parametrize('rate, expected', [
+    ('5/minute', (5, 60)),
+    ('3/10 minutes', (3, 600)),
+    ('20/60', (20, 60)),
+    ('100/day', (100, 86400)),
+])
+def test_parse_rate(rate, expected):
+    assert parse_rate(rate) == expected
+
+
+@pytest.mark.parametrize('make_backend', [MemoryBackend, DatabaseBackend])
+def test_token_bucket_bursts_then_refills(app, make_backend):
+    backend = make_backend()
+    capacity, rate = 3, 3 / 60  # 3/minute: a token every 20 seconds
+    with app.app_context():
+        assert [backend.take('k', capacity, rate, 1000.0) for _ in range(3)] == [0, 0, 0]
+        assert backend.take('k', capacity, rate, 1000.0) == pytest.approx(20)
+        assert backend.take('k', capacity, rate, 1015.0) == pytest.approx(5)
+        assert backend.take('k', capacity, rate, 1020.0) == 0
+        assert backend.take('other', capacity, rate, 1020.0) == 0
+
+
+def test_login_attempts_are_limited_per_account(app, client):
+    with app.app_context():
+        make_user(1)
+        make_user(2)
+    for _ in range(5):
+        assert client.post('/login', data={'campus_id': 'ATU00001', 'password': 'guess'}).status_code == 200
+
+    response = client.post('/login', data={'campus_id': 'ATU00001', 'password': 'guess'})
+    assert response.status_code == 429
+    assert 1 <= int(response.headers['Retry-After']) <= 12
+    # Another account from the same address is still allowed
+    assert client.post('/login', data={'campus_id': 'ATU00002', 'password': 'guess'}).status_code == 200
+
+
+def test_reset_codes_are_limited_per_phone(app, client):
+    with app.app_context():
+        user = make_user(1)
+        phone = user.phone
+    for _ in range(3):
+        assert client.post('/forgot-password', data={'phone': phone}).status_code == 302
+    assert client.post('/forgot-password', data={'phone': phone}).status_code == 429
+    assert client.get('/forgot-password').status_code == 200
@@ -1 +1,134 @@
 # Tests for routes
+import base64
+import json
+
+import pytest
+from werkzeug.http import http_date
+
+from app import cache, db
+from app.models import Item
+from conftest import assert_queries_do_not_scale, count_queries, login, make_items, make_user
+
+LIST_URLS = [
+    '/dashboard',
+    '/search?search=wallet',
+    '/search?type=lost',
+    '/api/items',
+]
+
+
+@pytest.mark.parametrize('url', LIST_URLS)
+def test_list_query_count_is_constant(app, client, url):
+    with app.app_context():
+        login(client, make_user(999))
+    assert_queries_do_not_scale(client, url)
+
+
+def test_item_details_answers_304_until_the_item_changes(app, client):
+    with app.app_context():
+        make_items(1)
+        item_id = Item.query.first().id
+    first = client.get(f'/item/{item_id}')
+    assert first.status_code == 200 and first.headers['ETag'].startswith('W/')
+    assert 'Last-Modified' not in first.headers  # the reporter has no timestamp
+
+    with count_queries() as statements:
+        cached = client.get(f'/item/{item_id}', headers={'If-None-Match': first.headers['ETag']})
+    assert cached.status_code == 304 and cached.data == b''
+    assert len(statements) == 1
+
+    # Another worker, with its own cache versions, computes the same ETag.
+    cache.bump('item', 'user')
+    assert client.get(f'/item/{item_id}', headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+
+    with app.app_context():
+        db.session.get(Item, item_id).status = 'resolved'
+        db.session.commit()
+    changed = client.get(f'/item/{item_id}', headers={'If-None-Match': first.headers['ETag']})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != first.headers['ETag']
+
+
+def test_item_details_etag_changes_with_its_matches(app, client):
+    with app.app_context():
+        make_items(1)  # a found wallet
+        item_id = Item.query.first().id
+    first = client.get(f'/item/{item_id}')
+    assert b'matches-section' not in first.data
+
+    with app.app_context():
+        make_items(1, start=1)  # a lost one like it
+    changed = client.get(f'/item/{item_id}', headers={'If-None-Match': first.headers['ETag']})
+    assert changed.status_code == 200 and b'matches-section' in changed.data
+
+
+def test_api_items_revalidates_with_etag_and_last_modified(app, client):
+    with app.app_context():
+        make_items(3)
+    first = client.get('/api/items?limit=2')
+    assert client.get('/api/items?limit=2', headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+    assert client.get('/api/items?limit=2', headers={
+        'If-Modified-Since': first.headers['Last-Modified']}).status_code == 304
+    assert client.get('/api/items?limit=3', headers={'If-None-Match': first.headers['ETag']}).status_code == 200
+
+    # A status change moves the modification time, not just the report date.
+    with app.app_context():
+        item = Item.query.filter_by(title='Black wallet 0').one()
+        item.status = 'resolved'
+        db.session.commit()
+        updated_at = http_date(item.updated_at)
+    changed = client.get('/api/items?limit=2', headers={'If-None-Match': first.headers['ETag']})
+    assert changed.status_code == 200 and changed.headers['Last-Modified'] == updated_at
+
+    # So does a delete, which leaves the newest id and modification time alone.
+    with count_queries() as statements:
+        assert client.get('/api/items?limit=2', headers={'If-None-Match': changed.headers['ETag']}).status_code == 304
+    assert len(statements) == 1 and 'count(' not in statements[0].lower()  # no table scan
+    with app.app_context():
+        db.session.delete(Item.query.filter_by(title='Black wallet 1').one())
+        db.session.commit()
+    assert client.get('/api/items?limit=2', headers={'If-None-Match': changed.headers['ETag']}).status_code == 200
+
+
+def crafted_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+@pytest.mark.parametrize('cursor', [
+    'not-base64!', crafted_cursor({'x': 1}), crafted_cursor([{'x': 1}, 1]), crafted_cursor([[], []]),
+    crafted_cursor([None, None]), crafted_cursor([{'dt': '2024-01-01T00:00:00'}]),
+    crafted_cursor([{'dt': 'yesterday'}, 1]), crafted_cursor([{'dt': '2024-01-01T00:00:00'}, '1']),
+    crafted_cursor([{'dt': '2024-01-01T00:00:00'}, True]),
+])
+def test_malformed_cursor_is_rejected(app, client, cursor):
+    with app.app_context():
+        login(client, make_user(1))
+    assert client.get(f'/api/items?cursor={cursor}').status_code == 400
+    assert client.get(f'/search?search=wallet&cursor={cursor}').status_code == 400
+
+
+def test_cursor_continues_where_the_page_ended(app, client):
+    with app.app_context():
+        login(client, make_user(99))
+        make_items(3)
+    first = client.get('/api/items?limit=2').get_json()
+    second = client.get(f"/api/items?limit=2&cursor={first['next_cursor']}").get_json()
+    assert [item['title'] for item in first['items'] + second['items']] == [
+        'Black wallet 2', 'Black wallet 1', 'Black wallet 0']
+
+    # Search pages continue from the match score as well.
+    cursor = client.get('/search?search=wallet&limit=2&partial=1').headers['X-Next-Cursor']
+    assert client.get(f'/search?search=wallet&limit=2&cursor={cursor}').status_code == 200
+
+
+def test_api_items_streams_every_item(app, client):
+    with app.app_context():
+        make_items(150)
+    document = client.get('/api/items?stream=1').get_json()
+    assert len(document['items']) == 150 and document['next_cursor'] is None
+    assert document['items'][0]['title'] == 'Black wallet 149'
+
+    response = client.get('/api/items', headers={'Accept': 'application/x-ndjson'})
+    assert response.mimetype == 'application/x-ndjson'
+    lines = response.get_data(as_text=True).splitlines()
+    assert [json.loads(line)['id'] for line in lines] == [item['id'] for item in document['items']]
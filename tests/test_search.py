@@ -0,0 +1,66 @@
+# Tests for full-text search (the SQLite FTS5 backend)
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from app import db, search
+from app.models import Item
+from app.pagination import paginate
+from conftest import make_user
+
+
+def add_item(user_id, title, description, minutes=0):
+    item = Item(title=title, description=description, item_type='lost', contact_phone='+233000000000',
+                date_reported=datetime(2025, 1, 1) + timedelta(minutes=minutes), user_id=user_id)
+    db.session.add(item)
+    db.session.commit()
+    return item
+
+
+def found(search_text):
+    query, sort_keys = search.search_items(Item.query, search_text)
+    return [item.title for item in paginate(query, sort_keys, limit=50)]
+
+
+def indexed(term):
+    """Item ids the FTS table itself returns for ``term``."""
+    return db.session.execute(text('SELECT rowid FROM item_fts WHERE item_fts MATCH :term'),
+                              {'term': term}).scalars().all()
+
+
+def test_title_matches_rank_above_newer_description_matches(app):
+    with app.app_context():
+        assert search.get_backend().name == 'sqlite'
+        user = make_user(1).id
+        add_item(user, 'Wallet', 'Brown leather wallet', minutes=0)
+        add_item(user, 'Blue bag', 'Has a wallet inside', minutes=1)
+        add_item(user, 'Keys', 'Car keys', minutes=2)
+
+        assert found('wallet') == ['Wallet', 'Blue bag']
+        assert found('') == ['Keys', 'Blue bag', 'Wallet']  # no terms: newest first
+
+
+def test_last_term_matches_as_a_prefix(app):
+    with app.app_context():
+        user = make_user(1).id
+        add_item(user, 'Wallet', 'Brown leather wallet')
+        add_item(user, 'Walkman', 'Old cassette player')
+
+        assert sorted(found('wal')) == ['Walkman', 'Wallet']
+        assert found('leather wal') == ['Wallet']
+        assert found('wal leather') == []  # only the last term is a prefix
+
+
+def test_index_follows_updates_and_deletes(app):
+    with app.app_context():
+        user = make_user(1).id
+        item = add_item(user, 'Umbrella', 'Black, folding')
+
+        item.title = 'Raincoat'
+        db.session.commit()
+        assert indexed('umbrella') == [] and indexed('raincoat') == [item.id]
+        assert found('raincoat') == ['Raincoat']
+
+        db.session.delete(item)
+        db.session.commit()
+        assert indexed('raincoat') == [] and indexed('folding') == []
@@ -0,0 +1,112 @@
+# Tests for the upload store
+import io
+import os
+from datetime import datetime
+
+import pytest
+from PIL import Image
+from werkzeug.exceptions import RequestEntityTooLarge, UnsupportedMediaType
+
+from app import db, storage
+from app.models import Blob, Item, ItemArchive
+from conftest import login, make_user
+
+
+@pytest.fixture
+def uploads(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, 'upload_dir', lambda: str(tmp_path))
+    return tmp_path
+
+
+def jpeg_bytes():
+    buffer = io.BytesIO()
+    Image.new('RGB', (32, 32), (200, 30, 30)).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+def report(client, photo, filename):
+    return client.post('/report_lost', data={
+        'title': 'Blue umbrella',
+        'description': 'Left in the library',
+        'contact_phone': '+233000000000',
+        'photo': (io.BytesIO(photo), filename),
+    })
+
+
+def test_photo_is_streamed_into_the_store(app, client, uploads):
+    with app.app_context():
+        login(client, make_user(1))
+    photo = jpeg_bytes()
+    # Stored under the sniffed format, whatever the upload's name says
+    assert report(client, photo, 'IMG_0001.JPEG').status_code == 302
+    with app.app_context():
+        filename = Item.query.one().photo_filename
+    assert filename.endswith('.jpg')
+    assert (uploads / filename).read_bytes() == photo
+    assert os.listdir(uploads) == [filename]
+
+
+def test_non_image_upload_is_rejected_and_discarded(app, client, uploads):
+    with app.app_context():
+        login(client, make_user(1))
+    response = report(client, b'<?php system($_GET["c"]); ?>' * 10, 'shell.jpg')
+    assert response.status_code == 302
+    assert response.headers['Location'].endswith('/report_lost')
+    with app.app_context():
+        assert Item.query.count() == 0
+    assert os.listdir(uploads) == []
+
+
+def test_sink_stops_at_the_size_limit(uploads):
+    sink = storage.UploadSink(max_size=100_000)
+    sink.write(jpeg_bytes()[:64])
+    with pytest.raises(RequestEntityTooLarge):
+        for _ in range(10):
+            sink.write(b'\0' * 16 * 1024)
+    assert sink.size <= 100_000 + 16 * 1024
+    assert os.listdir(uploads) == []
+
+
+def test_sink_sniffs_across_small_chunks(uploads):
+    sink = storage.UploadSink(max_size=1000)
+    for byte in b'GIF89a\x01\x00':
+        sink.write(bytes([byte]))
+    assert sink.ext == 'gif'
+    sink.close()
+
+    sink = storage.UploadSink(max_size=1000)
+    sink.write(b'PK\x03')
+    with pytest.raises(UnsupportedMediaType):
+        sink.write(b'\x04zip file')
+    assert os.listdir(uploads) == []
+
+
+def test_same_photo_twice_shares_one_blob(app, client, uploads):
+    with app.app_context():
+        login(client, make_user(1))
+    photo = jpeg_bytes()
+    report(client, photo, 'a.jpg')
+    report(client, photo, 'b.jpg')
+    with app.app_context():
+        (blob,) = Blob.query.all()
+        assert blob.ref_count == 2
+        assert [path.name for path in uploads.iterdir() if path.is_file()] == [blob.filename]
+        db.session.delete(Item.query.first())
+        db.session.commit()
+        assert db.session.get(Blob, blob.sha256).ref_count == 1
+        # The other item still shows it.
+        assert (uploads / blob.filename).exists()
+        assert storage.orphaned_files(min_age_seconds=0) == []
+
+
+def test_photos_of_archived_items_are_not_orphans(app, uploads):
+    for name in ('archived.jpg', 'stray.jpg'):
+        (uploads / name).write_bytes(jpeg_bytes())
+    with app.app_context():
+        user = make_user(1)
+        db.session.add(ItemArchive(id=1, title='Blue umbrella', description='Left in the library',
+                                   item_type='lost', contact_phone=user.phone, photo_filename='archived.jpg',
+                                   date_reported=datetime(2020, 1, 1), user_id=user.id,
+                                   archived_at=datetime(2021, 1, 1)))
+        db.session.commit()
+        assert storage.orphaned_files(min_age_seconds=0) == ['stray.jpg']